@@ -0,0 +1,31 @@
+-- ========================================
+-- MEVCUT ENVANTER KONTROLÜ (save_to_supabase)
+-- Yüklenecek (Mağaza, Dönem, Depolama Grubu) anahtarlarından hangilerinin
+-- envanter_veri'de zaten olduğunu TEK çağrıda döndürür
+-- Parametreler paralel diziler: i. eleman = i. anahtar
+-- ========================================
+
+-- Anahtar kontrolü index üzerinden (EXISTS ... LIMIT 1 eşdeğeri)
+CREATE INDEX IF NOT EXISTS idx_envanter_veri_env_key
+    ON envanter_veri (magaza_kodu, envanter_donemi, depolama_kosulu_grubu);
+
+CREATE OR REPLACE FUNCTION envanter_mevcut_anahtarlar(
+    p_magaza TEXT[],
+    p_donem TEXT[],
+    p_depolama TEXT[]
+)
+RETURNS TABLE (magaza_kodu TEXT, envanter_donemi TEXT, depolama_kosulu_grubu TEXT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT k.magaza_kodu, k.envanter_donemi, k.depolama_kosulu_grubu
+    FROM unnest(p_magaza, p_donem, p_depolama) AS k(magaza_kodu, envanter_donemi, depolama_kosulu_grubu)
+    WHERE EXISTS (
+        SELECT 1 FROM envanter_veri e
+        WHERE e.magaza_kodu = k.magaza_kodu
+          AND e.envanter_donemi = k.envanter_donemi
+          AND e.depolama_kosulu_grubu = k.depolama_kosulu_grubu
+    );
+$$;
+
+GRANT EXECUTE ON FUNCTION envanter_mevcut_anahtarlar(TEXT[], TEXT[], TEXT[]) TO anon, authenticated;
@@ -0,0 +1,84 @@
+-- ========================================
+-- STAGING ÜZERİNDEN TOPLU YÜKLEME (save_to_supabase, büyük yüklemeler)
+-- 1) İstemci satırları envanter_veri_staging'e yazar (UNLOGGED, index/trigger yok → ucuz)
+-- 2) envanter_staging_birlestir(yukleme_id) TEK transaction'da envanter_veri'ye aktarır,
+--    staging'i temizler ve v_magaza_ozet'i bir kez refresh eder
+-- Yükleme yarıda kalırsa envanter_veri'ye hiçbir satır geçmez
+-- ========================================
+
+-- STEP 1: Staging tablosu (envanter_veri kolonları + yukleme_id)
+CREATE UNLOGGED TABLE IF NOT EXISTS envanter_veri_staging (LIKE envanter_veri);
+ALTER TABLE envanter_veri_staging DROP COLUMN IF EXISTS id;
+ALTER TABLE envanter_veri_staging ADD COLUMN IF NOT EXISTS yukleme_id TEXT NOT NULL;
+ALTER TABLE envanter_veri_staging ADD COLUMN IF NOT EXISTS yukleme_zamani TIMESTAMPTZ DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_envanter_veri_staging_yukleme ON envanter_veri_staging (yukleme_id);
+
+GRANT SELECT, INSERT, DELETE ON envanter_veri_staging TO anon, authenticated;
+
+-- STEP 2: Birleştirme RPC'si
+-- Kolon listesi iki tablonun ortak (generated olmayan) kolonlarından kurulur → şema değişince SQL değişmez
+-- Aynı (Mağaza, Dönem, Depolama Grubu) envanteri envanter_veri'de zaten varsa o satırlar atlanır
+-- (eşzamanlı iki yüklemeye karşı sunucu tarafı kontrol; istemci de existing_inventory_keys ile eler)
+CREATE OR REPLACE FUNCTION envanter_staging_birlestir(
+    p_yukleme_id TEXT,
+    p_refresh BOOLEAN DEFAULT TRUE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET statement_timeout = '300s'
+AS $$
+DECLARE
+    v_kolonlar TEXT;
+    v_eklenen INTEGER;
+BEGIN
+    SELECT string_agg(quote_ident(e.column_name), ', ' ORDER BY e.ordinal_position)
+    INTO v_kolonlar
+    FROM information_schema.columns e
+    JOIN information_schema.columns s
+      ON s.table_schema = e.table_schema
+     AND s.table_name = 'envanter_veri_staging'
+     AND s.column_name = e.column_name
+    WHERE e.table_schema = 'public'
+      AND e.table_name = 'envanter_veri'
+      AND e.is_generated = 'NEVER';
+
+    -- DISTINCT ON: tekrar gönderilen bir staging batch'i aynı yukleme_id altında iki kez yazılmış
+    -- olabilir → her (Mağaza, Dönem, Depolama Grubu, Malzeme) envanter_veri'ye tek satır geçer
+    EXECUTE format(
+        'INSERT INTO envanter_veri (%1$s)
+         SELECT DISTINCT ON (s.magaza_kodu, s.envanter_donemi, s.depolama_kosulu_grubu, s.malzeme_kodu) %1$s
+         FROM envanter_veri_staging s
+         WHERE s.yukleme_id = $1
+           AND NOT EXISTS (
+               SELECT 1 FROM envanter_veri e
+               WHERE e.magaza_kodu = s.magaza_kodu
+                 AND e.envanter_donemi = s.envanter_donemi
+                 AND e.depolama_kosulu_grubu = s.depolama_kosulu_grubu
+           )
+         ORDER BY s.magaza_kodu, s.envanter_donemi, s.depolama_kosulu_grubu, s.malzeme_kodu',
+        v_kolonlar
+    ) USING p_yukleme_id;
+    GET DIAGNOSTICS v_eklenen = ROW_COUNT;
+
+    -- Bu yüklemenin ve 1 günden eski yarım kalmış yüklemelerin staging satırları
+    DELETE FROM envanter_veri_staging
+    WHERE yukleme_id = p_yukleme_id OR yukleme_zamani < NOW() - INTERVAL '1 day';
+
+    IF v_eklenen > 0 AND p_refresh THEN
+        REFRESH MATERIALIZED VIEW v_magaza_ozet;
+    END IF;
+
+    RETURN v_eklenen;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION envanter_staging_birlestir(TEXT, BOOLEAN) TO anon, authenticated;
+
+-- ========================================
+-- Test:
+-- SELECT envanter_staging_birlestir('olmayan-yukleme');  -- 0 dönmeli
+-- Yerel deneme (Supabase olmadan): supabase_yerel.py + benchmarks/toplu_yukleme_benchmark.py
+--   (SQLite taklidi: bu dosyadaki fonksiyonu çalıştırmaz, sadece istemci akışını dener)
+-- ========================================
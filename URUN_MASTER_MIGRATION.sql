@@ -0,0 +1,22 @@
+-- ========================================
+-- ÜRÜN MASTER TABLOSU
+-- Malzeme Kodu bazlı sabit ürün bilgileri (urun_master.py)
+-- Her Excel yüklemesinde sadece yeni/değişen ürünler upsert edilir
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS urun_master (
+    malzeme_kodu TEXT PRIMARY KEY,
+    malzeme_tanimi TEXT,
+    mal_grubu_tanimi TEXT,
+    urun_grubu_tanimi TEXT,
+    sigara BOOLEAN DEFAULT FALSE,
+    kasa_aktivitesi BOOLEAN DEFAULT FALSE,
+    ilk2_kelime TEXT,
+    marka TEXT,
+    gramaj NUMERIC,
+    gramaj_birim TEXT,
+    guncelleme_tarihi TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Sigara ürünleri sık filtrelenir
+CREATE INDEX IF NOT EXISTS idx_urun_master_sigara ON urun_master (sigara) WHERE sigara;
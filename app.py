@@ -10,6 +10,28 @@ import zipfile
 import json
 import os
 from supabase import create_client, Client
+from envanter_engine import (
+    KASA_AKTIVITESI_KODLARI, analyze_inventory, build_feature_frame, normalize_code,
+    detect_internal_theft, detect_chronic_products, detect_chronic_fire,
+    detect_fire_manipulation, detect_external_theft, detect_all_stores,
+    find_product_families, add_name_features,
+    check_kasa_activity_products, kasa_summary_by_store, detect_cigarette_shortage,
+    sigara_mask as sigara_kategori_mask,
+    generate_executive_summary, executive_summaries_by_store,
+    align_store_series, score_stores, risk_level_labels,
+    region_averages, score_relative_to_region,
+    score_region, rescore, risk_config_table, risk_config_from_table,
+    build_rollup_cube, cube_slice, cube_totals,
+    RULE_CONFIG, region_rule_counts,
+    TREND_METRIKLERI, build_trend_frame, deteriorating_stores,
+)
+from urun_master import load_product_master, upsert_product_master
+from supabase_io import (
+    PAGE_SIZE, FETCH_WORKERS, WIRE_FORMAT,
+    fetch_keyset, fetch_keyset_csv, fetch_keyset_frame, fetch_concurrent, id_partitions,
+    existing_inventory_keys, existing_inventory_keys_per_key,
+    serialize_records, write_batches, staged_load, STAGING_MIN_ROWS,
+)
 
 # Mobil uyumlu sayfa ayarı
 st.set_page_config(page_title="Envanter Risk Analizi", layout="wide", page_icon="📊")
@@ -198,9 +220,10 @@ def enrich_internal_theft_with_camera(internal_df, magaza_kodu, envanter_tarihi,
         for _, row in df.iterrows():
             kategori = row.get(kategori_col, '')
             if kategori and kategori not in kategori_urunleri:
-                # Bu kategorideki 100+ TL ürünleri bul
+                # Bu kategorideki 100+ TL ürünleri bul (iç hırsızlık fiyat eşiği, weights.json detection_rules)
                 if kategori_col in full_df.columns and 'Satış Fiyatı' in full_df.columns:
-                    kat_mask = (full_df[kategori_col] == kategori) & (full_df['Satış Fiyatı'] >= 100)
+                    kat_mask = ((full_df[kategori_col] == kategori) &
+                                (full_df['Satış Fiyatı'] >= RULE_CONFIG['ic_hirsizlik']['min_satis_fiyati']))
                     kat_urunler = full_df.loc[kat_mask, 'Malzeme Kodu'].astype(str).unique().tolist()
                     kategori_urunleri[kategori] = kat_urunler
     
@@ -369,6 +392,13 @@ login()
 
 # ==================== SUPABASE FONKSİYONLARI ====================
 
+def get_urun_master():
+    """Ürün master tablosu (oturum başına 1 kez yüklenir)"""
+    if "urun_master" not in st.session_state:
+        st.session_state.urun_master = load_product_master(supabase_client=supabase)
+    return st.session_state.urun_master
+
+
 def save_to_supabase(df_original):
     """
     Excel verisini Supabase'e kaydet
@@ -395,22 +425,20 @@ def save_to_supabase(df_original):
         
         unique_envs = df[['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', '_env_key']].drop_duplicates()
         
-        # Supabase'de hangileri mevcut kontrol et
-        existing_envs = set()
-        for _, env_row in unique_envs.iterrows():
-            try:
-                result = supabase.table('envanter_veri').select('id').eq(
-                    'magaza_kodu', str(env_row['Mağaza Kodu'])
-                ).eq(
-                    'envanter_donemi', str(env_row['Envanter Dönemi'])
-                ).eq(
-                    'depolama_kosulu_grubu', str(env_row['Depolama Koşulu Grubu'])
-                ).limit(1).execute()
-                
-                if result.data and len(result.data) > 0:
-                    existing_envs.add(env_row['_env_key'])
-            except:
-                pass
+        # Supabase'de hangileri mevcut kontrol et - tek RPC çağrısı (anahtar listesi)
+        env_keys = list(zip(
+            unique_envs['Mağaza Kodu'].astype(str),
+            unique_envs['Envanter Dönemi'].astype(str),
+            unique_envs['Depolama Koşulu Grubu'].astype(str),
+        ))
+        # RPC kurulu değilse (ENVANTER_MEVCUT_RPC.sql) anahtar başına kontrole düşülür
+        try:
+            mevcut_keys = existing_inventory_keys(supabase, env_keys)
+        except Exception as e:
+            st.warning(f"⚠️ Toplu envanter kontrolü kullanılamadı, {len(env_keys)} envanter tek tek "
+                       f"kontrol ediliyor: {str(e)[:100]}")
+            mevcut_keys = existing_inventory_keys_per_key(supabase, env_keys)
+        existing_envs = {'|'.join(k) for k in mevcut_keys}
         
         # Sadece yeni envanterler
         new_env_keys = set(unique_envs['_env_key']) - existing_envs
@@ -471,40 +499,39 @@ def save_to_supabase(df_original):
             'İptal Satır Tutarı': 'iptal_satir_tutari',
         }
         
-        # Veriyi hazırla
-        records = []
-        for _, row in df_new.iterrows():
-            record = {}
-            for excel_col, db_col in col_mapping.items():
-                if excel_col in row.index:
-                    val = row[excel_col]
-                    if pd.isna(val):
-                        val = None
-                    elif isinstance(val, pd.Timestamp):
-                        val = val.strftime('%Y-%m-%d')
-                    elif isinstance(val, (np.integer, np.int64)):
-                        val = int(val)
-                    elif isinstance(val, (np.floating, np.float64)):
-                        val = float(val) if not np.isnan(val) else None
-                    record[db_col] = val
-            records.append(record)
+        # Veriyi hazırla - kolon bazlı dönüşüm, tek to_dict('records')
+        records = serialize_records(df_new, col_mapping)
         
-        # Batch insert
-        batch_size = 500
-        inserted = 0
-        
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i+batch_size]
+        # Büyük yüklemeler: staging tablosu + tek RPC ile sunucuda birleştirme ve tek refresh
+        # Staging kurulu değilse (ENVANTER_TOPLU_YUKLEME.sql) doğrudan yazmaya düşülür
+        sonuc = None
+        if len(records) >= STAGING_MIN_ROWS:
             try:
-                supabase.table('envanter_veri').insert(batch).execute()
-                inserted += len(batch)
+                sonuc = staged_load(supabase, records)
             except Exception as e:
-                st.warning(f"Batch {i//batch_size + 1} hatası: {str(e)[:100]}")
+                st.caption(f"ℹ️ Staging yükleme kullanılamadı, doğrudan yazılıyor: {str(e)[:100]}")
+        
+        # Boyut bazlı batch'ler, eşzamanlı insert - hata alan batch tekrar denenir
+        if sonuc is None:
+            sonuc = write_batches(supabase, 'envanter_veri', records)
+            inserted = sonuc['yazilan']
+            view_guncel = False
+        else:
+            inserted = sonuc['birlesen']
+            view_guncel = True  # RPC refresh etti
+        st.caption(f"⚡ {inserted:,} satır {sonuc['sure']:.1f} sn'de yazıldı "
+                   f"({sonuc['hiz']:,.0f} satır/sn, {sonuc['batch']} batch)")
+        if sonuc['hatali_kayitlar']:
+            # Insert tekrar denenmez (çift kayıt riski) - zaman aşımındaki batch yazılmış olabilir
+            st.warning(f"⚠️ {len(sonuc['hatali_kayitlar']):,} satır yazılamadı veya doğrulanamadı "
+                       f"({len(sonuc['hatalar'])} batch): {sonuc['hatalar'][0][:100]}")
+            if view_guncel:
+                st.warning("⚠️ Staging yüklemesi eksik kaldı - hiçbir satır envanter_veri'ye aktarılmadı")
         
         new_list = [k.replace('|', ' / ') for k in new_env_keys]
 
         # ⚡ MATERIALIZED VIEW varsa refresh et
-        if inserted > 0:
+        if inserted > 0 and not view_guncel:
             try:
                 refresh_materialized_view()
             except:
@@ -548,24 +575,11 @@ def get_available_stores_from_supabase():
     """Mevcut mağazaları al - dropdown için"""
     try:
         all_stores = {}
-        offset = 0
-        batch_size = 1000
+        rows = fetch_keyset(supabase, 'envanter_veri', 'magaza_kodu,magaza_tanim', max_rows=51_000)
         
-        while True:
-            result = supabase.table('envanter_veri').select('magaza_kodu,magaza_tanim').range(offset, offset + batch_size - 1).execute()
-            if not result.data:
-                break
-            
-            for r in result.data:
-                if r.get('magaza_kodu'):
-                    all_stores[r['magaza_kodu']] = r.get('magaza_tanim', '')
-            
-            if len(result.data) < batch_size:
-                break
-            offset += batch_size
-            
-            if offset > 50000:
-                break
+        for r in rows:
+            if r.get('magaza_kodu'):
+                all_stores[r['magaza_kodu']] = r.get('magaza_tanim', '')
         
         return all_stores
     except:
@@ -579,10 +593,6 @@ def get_single_store_data(magaza_kodu, donemler=None):
     Sadece belirli mağazanın verisini çeker, tüm bölgeyi değil
     """
     try:
-        all_data = []
-        batch_size = 1000
-        offset = 0
-        
         required_columns = ','.join([
             'magaza_kodu', 'magaza_tanim', 'satis_muduru', 'bolge_sorumlusu',
             'depolama_kosulu_grubu', 'depolama_kosulu', 'envanter_donemi', 'envanter_tarihi', 'envanter_baslangic_tarihi',
@@ -592,30 +602,9 @@ def get_single_store_data(magaza_kodu, donemler=None):
             'satis_miktari', 'satis_hasilati', 'iptal_satir_miktari'
         ])
         
-        for _ in range(50):  # Max 50K satır
-            query = supabase.table('envanter_veri').select(required_columns)
-            query = query.eq('magaza_kodu', str(magaza_kodu))
-            
-            if donemler and len(donemler) > 0:
-                query = query.in_('envanter_donemi', list(donemler))
-            
-            query = query.range(offset, offset + batch_size - 1)
-            result = query.execute()
-            
-            if not result.data:
-                break
-            
-            all_data.extend(result.data)
-            
-            if len(result.data) < batch_size:
-                break
-            
-            offset += batch_size
-        
-        if not all_data:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(all_data)
+        filters = [('eq', 'magaza_kodu', str(magaza_kodu))]
+        if donemler and len(donemler) > 0:
+            filters.append(('in_', 'envanter_donemi', list(donemler)))
         
         reverse_mapping = {
             'magaza_kodu': 'Mağaza Kodu',
@@ -644,7 +633,10 @@ def get_single_store_data(magaza_kodu, donemler=None):
             'iptal_satir_miktari': 'İptal Satır Miktarı'
         }
         
-        df = df.rename(columns=reverse_mapping)
+        # Sayfalar gelir gelmez tipli parçalara çevrilir (json) veya read_csv ile okunur (csv)
+        fetch = fetch_keyset_csv if WIRE_FORMAT == 'csv' else fetch_keyset_frame
+        df = fetch(supabase, 'envanter_veri', required_columns, filters,
+                   max_rows=50_000, column_mapping=reverse_mapping)  # Max 50K satır
         return df
         
     except Exception as e:
@@ -652,13 +644,18 @@ def get_single_store_data(magaza_kodu, donemler=None):
         return pd.DataFrame()
 
 
-def get_data_from_supabase(satis_muduru=None, donemler=None):
-    """Supabase'den veri çek ve DataFrame'e çevir - Optimize edilmiş"""
+def get_data_from_supabase(satis_muduru=None, donemler=None, page_size=None, max_workers=None, progress=None,
+                           wire=None):
+    """
+    Supabase'den veri çek ve DataFrame'e çevir - Optimize edilmiş
+    page_size: keyset sayfa boyutu (varsayılan SUPABASE_PAGE_SIZE / 1000)
+    max_workers: >1 ise id aralıkları eşzamanlı okunur (varsayılan SUPABASE_FETCH_WORKERS)
+    progress: progress(tamamlanan, toplam) - bölüm tamamlandıkça
+    wire: 'json' veya 'csv' (varsayılan SUPABASE_WIRE_FORMAT) - csv'de read_csv + sabit dtype
+    """
     try:
-        all_data = []
-        batch_size = 1000  # Supabase max limit
-        offset = 0
-        max_iterations = 500  # Sonsuz döngü koruması (500K satır max)
+        page_size = page_size or PAGE_SIZE  # Supabase max-rows limiti
+        max_rows = 500_000  # Sonsuz döngü koruması (500K satır max)
         
         # Sadece gerekli sütunları çek
         required_columns = ','.join([
@@ -670,40 +667,13 @@ def get_data_from_supabase(satis_muduru=None, donemler=None):
             'satis_miktari', 'satis_hasilati', 'iptal_satir_miktari'
         ])
         
-        iteration = 0
-        while iteration < max_iterations:
-            iteration += 1
-            
-            # Sorgu oluştur - sadece gerekli sütunlar
-            query = supabase.table('envanter_veri').select(required_columns)
-            
-            if satis_muduru:
-                query = query.eq('satis_muduru', satis_muduru)
-            
-            # Dönem filtresi
-            if donemler and len(donemler) > 0:
-                query = query.in_('envanter_donemi', donemler)
-            
-            # Pagination - limit ve offset
-            query = query.range(offset, offset + batch_size - 1)
-            
-            result = query.execute()
-            
-            if not result.data or len(result.data) == 0:
-                break
-            
-            all_data.extend(result.data)
-            
-            # Son batch'te batch_size'dan az veri geldiyse bitir
-            if len(result.data) < batch_size:
-                break
-            
-            offset += batch_size
-        
-        if not all_data:
-            return pd.DataFrame()
+        filters = []
+        if satis_muduru:
+            filters.append(('eq', 'satis_muduru', satis_muduru))
         
-        df = pd.DataFrame(all_data)
+        # Dönem filtresi
+        if donemler and len(donemler) > 0:
+            filters.append(('in_', 'envanter_donemi', donemler))
         
         # Sütun isimlerini geri çevir
         reverse_mapping = {
@@ -733,7 +703,20 @@ def get_data_from_supabase(satis_muduru=None, donemler=None):
             'iptal_satir_miktari': 'İptal Satır Miktarı',
         }
         
-        df = df.rename(columns=reverse_mapping)
+        # Keyset pagination (id > son_id) - OFFSET taraması yok
+        # Her sayfa gelir gelmez tipli kolonlu parçaya çevrilir (isimler + sayı tipleri), sonda tek concat
+        wire = wire or WIRE_FORMAT
+        max_workers = max_workers or FETCH_WORKERS
+        if max_workers > 1:
+            # id uzayı bölümlere ayrılır, sınırlı thread havuzunda okunur, id sırasıyla birleştirilir
+            partitions = id_partitions(supabase, 'envanter_veri', filters, n=max_workers * 4)
+            df = fetch_concurrent(supabase, 'envanter_veri', required_columns, partitions, filters,
+                                  page_size=page_size, max_rows=max_rows, max_workers=max_workers,
+                                  progress=progress, wire=wire, column_mapping=reverse_mapping)
+        else:
+            fetch = fetch_keyset_csv if wire == 'csv' else fetch_keyset_frame
+            df = fetch(supabase, 'envanter_veri', required_columns, filters,
+                       page_size=page_size, max_rows=max_rows, column_mapping=reverse_mapping)
         
         return df
         
@@ -873,7 +856,7 @@ def get_sm_summary_from_view(satis_muduru=None, donemler=None, tarih_baslangic=N
         try:
             df['Gün'] = (pd.to_datetime(df['Envanter Tarihi']) - 
                         pd.to_datetime(df['Envanter Başlangıç Tarihi'])).dt.days
-            df['Gün'] = df['Gün'].apply(lambda x: max(1, x) if pd.notna(x) else 1)
+            df['Gün'] = df['Gün'].clip(lower=1).fillna(1)
         except:
             df['Gün'] = 1
         
@@ -881,96 +864,11 @@ def get_sm_summary_from_view(satis_muduru=None, donemler=None, tarih_baslangic=N
         df['Günlük Fire'] = df['Fire'] / df['Gün']
         
         # Sigara açığı (negatifse açık var)
-        df['Sigara'] = df['Sigara Net'].apply(lambda x: abs(x) if x < 0 else 0)
+        df['Sigara'] = (-df['Sigara Net']).where(df['Sigara Net'] < 0, 0)
         
-        # Bölge ortalamalarını hesapla (VIEW'den)
-        bolge_ort = {
-            'kayip_oran': df['Toplam %'].mean() if len(df) > 0 else 1,
-            'ic_hirsizlik': df['İç Hırs.'].mean() if len(df) > 0 else 10,
-            'kronik': df['Kronik'].mean() if len(df) > 0 else 50,
-            'sigara': df['Sigara'].mean() if len(df) > 0 else 0,
-        }
-        
-        # Risk puanı hesapla (tam formül)
-        def calc_risk_score(row):
-            """
-            Risk puanı hesaplama (0-100)
-            Ağırlıklar:
-            - Kayıp Oranı: %30 (bölge ortalamasına göre)
-            - Sigara Açığı: %30
-            - İç Hırsızlık: %30 (bölge ortalamasına göre)
-            - Kronik Açık: %5
-            - 10TL Ürünleri: %5
-            """
-            puan = 0
-            
-            # Kayıp Oranı (30 puan) - Bölge ortalamasına göre
-            kayip_oran = row.get('Toplam %', 0)
-            if bolge_ort['kayip_oran'] > 0:
-                kayip_ratio = kayip_oran / bolge_ort['kayip_oran']
-                kayip_puan = min(30, kayip_ratio * 15)
-            else:
-                kayip_puan = min(30, kayip_oran * 20)
-            puan += kayip_puan
-            
-            # Sigara Açığı (30 puan) - Her sigara kritik
-            sigara_count = row.get('Sigara', 0)
-            if sigara_count > 10:
-                sigara_puan = 30
-            elif sigara_count > 5:
-                sigara_puan = 25
-            elif sigara_count > 0:
-                sigara_puan = sigara_count * 4
-            else:
-                sigara_puan = 0
-            puan += sigara_puan
-            
-            # İç Hırsızlık (30 puan) - Bölge ortalamasına göre
-            ic_hirsizlik_count = row.get('İç Hırs.', 0)
-            if bolge_ort['ic_hirsizlik'] > 0:
-                ic_ratio = ic_hirsizlik_count / bolge_ort['ic_hirsizlik']
-                ic_puan = min(30, ic_ratio * 15)
-            else:
-                ic_puan = min(30, ic_hirsizlik_count * 0.5)
-            puan += ic_puan
-            
-            # Kronik Açık (5 puan)
-            kronik_count = row.get('Kronik', 0)
-            if bolge_ort['kronik'] > 0:
-                kronik_ratio = kronik_count / bolge_ort['kronik']
-                kronik_puan = min(5, kronik_ratio * 2.5)
-            else:
-                kronik_puan = min(5, kronik_count * 0.05)
-            puan += kronik_puan
-            
-            # 10TL Ürünleri (5 puan) - Fazla = şüpheli
-            kasa_adet = abs(row.get('Kasa Adet', 0))
-            if kasa_adet > 20:
-                kasa_puan = 5
-            elif kasa_adet > 10:
-                kasa_puan = 3
-            elif kasa_adet > 0:
-                kasa_puan = 1
-            else:
-                kasa_puan = 0
-            puan += kasa_puan
-            
-            return min(100, max(0, puan))
-        
-        df['Risk Puan'] = df.apply(calc_risk_score, axis=1)
-        
-        # Risk seviyesi (puana göre)
-        def get_risk_level(puan):
-            if puan >= 60:
-                return '🔴 KRİTİK'
-            elif puan >= 40:
-                return '🟠 RİSKLİ'
-            elif puan >= 20:
-                return '🟡 DİKKAT'
-            else:
-                return '🟢 TEMİZ'
-        
-        df['Risk'] = df['Risk Puan'].apply(get_risk_level)
+        # Risk puanı (bölge ortalamasına göre, tüm satırlar vektörel)
+        df['Risk Puan'] = score_relative_to_region(df, region_averages(df))
+        df['Risk'] = risk_level_labels(df['Risk Puan'])
         
         # BS kolonu
         df['BS'] = df['Bölge Sorumlusu']
@@ -995,6 +893,21 @@ def get_sm_summary_from_view(satis_muduru=None, donemler=None, tarih_baslangic=N
         return pd.DataFrame()
 
 
+@st.cache_data(ttl=900)  # 15 dakika cache (VIEW ile aynı)
+def get_summary_with_cube(satis_muduru=None, donemler=None, tarih_baslangic=None, tarih_bitis=None):
+    """
+    VIEW özet satırları + bu satırlardan kurulan dönem küpü (mağaza → BS → SM → Bölge, 1 kez hesaplanır)
+    İkisi tek cache girdisinde: ekrandaki mağaza listesi ile küpten gelen toplamlar aynı veriden
+    """
+    region_df = get_sm_summary_from_view(
+        satis_muduru=satis_muduru,
+        donemler=list(donemler) if donemler else None,
+        tarih_baslangic=tarih_baslangic,
+        tarih_bitis=tarih_bitis
+    )
+    return region_df, build_rollup_cube(region_df)
+
+
 # ⚠️ SİLİNDİ: get_store_summary_fast
 # Artık VIEW kullanılıyor: get_sm_summary_from_view()
 # Bu fonksiyon performans katiliydi - mağaza mağaza loop yapıyordu
@@ -1014,6 +927,8 @@ with col_user:
             del st.session_state.df_all
         if "df_all_analyzed" in st.session_state:
             del st.session_state.df_all_analyzed
+        st.session_state.pop('region_features', None)
+        st.session_state.pop('region_cube', None)
         st.session_state.user = None
         st.rerun()
 
@@ -1033,12 +948,17 @@ def load_all_data_once():
         progress_text.text("📊 Veriler yükleniyor...")
         progress_bar.progress(10)
         
-        df_raw = get_data_from_supabase(satis_muduru=None, donemler=None)
+        # Sayfalar eşzamanlı çekilir - ilerleme %10 → %70 aralığında
+        def fetch_progress(tamamlanan, toplam):
+            progress_bar.progress(10 + int(60 * tamamlanan / toplam))
+            progress_text.text(f"📊 Veriler yükleniyor... ({tamamlanan}/{toplam})")
+        
+        df_raw = get_data_from_supabase(satis_muduru=None, donemler=None, progress=fetch_progress)
         progress_bar.progress(70)
         
         if len(df_raw) > 0:
             progress_text.text("🔄 Analiz yapılıyor...")
-            df_analyzed = analyze_inventory(df_raw)
+            df_analyzed = analyze_inventory(df_raw, master=get_urun_master())
             progress_bar.progress(90)
             
             # Duplicate'ları kaldır (aynı mağaza + dönem + depolama + malzeme)
@@ -1054,6 +974,8 @@ def load_all_data_once():
             
             st.session_state.df_all = df_analyzed
             st.session_state.df_all_loaded_at = datetime.now()
+            st.session_state.pop('region_features', None)
+            st.session_state.pop('region_cube', None)
             progress_bar.progress(100)
             progress_text.text(f"✅ {len(df_analyzed):,} kayıt yüklendi")
         else:
@@ -1203,6 +1125,8 @@ with col_refresh:
         if st.button("🔄", help="Verileri yenile"):
             if "df_all" in st.session_state:
                 del st.session_state.df_all
+            st.session_state.pop('region_features', None)
+            st.session_state.pop('region_cube', None)
             st.rerun()
 
 # SM Özet ve GM Özet modları için dosya yükleme gerekmez
@@ -1213,737 +1137,18 @@ else:
     uploaded_file = None
 
 
-def analyze_inventory(df):
-    """Veriyi analiz için hazırla"""
-    df = df.copy()
-    
-    # DUPLICATE TEMİZLEME - Doğru key ile
-    # Aynı mağaza + dönem + depolama + malzeme sadece 1 kez olmalı
-    dup_key = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
-    dup_key = [c for c in dup_key if c in df.columns]
-    if dup_key:
-        # Envanter tarihi varsa en yeniyi tut
-        if 'Envanter Tarihi' in df.columns:
-            df['Envanter Tarihi'] = pd.to_datetime(df['Envanter Tarihi'], errors='coerce')
-            df = df.sort_values('Envanter Tarihi', ascending=False)
-        df = df.drop_duplicates(subset=dup_key, keep='first')
-    
-    col_mapping = {
-        'Mağaza Kodu': 'Mağaza Kodu',
-        'Mağaza Tanım': 'Mağaza Adı',
-        'Malzeme Kodu': 'Malzeme Kodu',
-        'Malzeme Tanımı': 'Malzeme Adı',
-        'Mal Grubu Tanımı': 'Ürün Grubu',
-        'Ürün Grubu Tanımı': 'Ana Grup',
-        'Fark Miktarı': 'Fark Miktarı',
-        'Fark Tutarı': 'Fark Tutarı',
-        'Kısmi Envanter Miktarı': 'Kısmi Envanter Miktarı',
-        'Kısmi Envanter Tutarı': 'Kısmi Envanter Tutarı',
-        'Önceki Fark Miktarı': 'Önceki Fark Miktarı',
-        'Önceki Fark Tutarı': 'Önceki Fark Tutarı',
-        'Önceki Fire Miktarı': 'Önceki Fire Miktarı',
-        'Önceki Fire Tutarı': 'Önceki Fire Tutarı',
-        'İptal Satır Miktarı': 'İptal Satır Miktarı',
-        'İptal Satır Tutarı': 'İptal Satır Tutarı',
-        'Fire Miktarı': 'Fire Miktarı',
-        'Fire Tutarı': 'Fire Tutarı',
-        'Satış Miktarı': 'Satış Miktarı',
-        'Satış Hasılatı': 'Satış Tutarı',
-        'Satış Fiyatı': 'Birim Fiyat',
-        'Fark+Fire+Kısmi Envanter Tutarı': 'NET_ENVANTER_ETKİ_TUTARI',
-        'Envanter Dönemi': 'Envanter Dönemi',
-        'Envanter Tarihi': 'Envanter Tarihi',
-    }
-    
-    for old_col, new_col in col_mapping.items():
-        if old_col in df.columns:
-            df[new_col] = df[old_col]
-    
-    numeric_cols = ['Fark Miktarı', 'Fark Tutarı', 'Kısmi Envanter Miktarı', 'Kısmi Envanter Tutarı',
-                    'Önceki Fark Miktarı', 'Önceki Fark Tutarı', 'İptal Satır Miktarı', 'İptal Satır Tutarı',
-                    'Fire Miktarı', 'Fire Tutarı', 'Satış Miktarı', 'Satış Tutarı', 'Önceki Fire Miktarı', 
-                    'Önceki Fire Tutarı', 'Birim Fiyat']
-    
-    for col in numeric_cols:
-        if col not in df.columns:
-            df[col] = 0
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    if 'NET_ENVANTER_ETKİ_TUTARI' not in df.columns:
-        df['NET_ENVANTER_ETKİ_TUTARI'] = df['Fark Tutarı'] + df['Fire Tutarı'] + df['Kısmi Envanter Tutarı']
-    
-    df['TOPLAM_MIKTAR'] = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
-    
-    return df
-
-
-def is_balanced(row):
-    """Dengelenmiş mi? Fark + Kısmi + Önceki = 0"""
-    toplam = row['Fark Miktarı'] + row['Kısmi Envanter Miktarı'] + row['Önceki Fark Miktarı']
-    return abs(toplam) <= 0.01
-
-
-def get_first_two_words(text):
-    """İlk 2 kelimeyi al"""
-    if pd.isna(text):
-        return ""
-    words = str(text).strip().split()
-    return " ".join(words[:2]).upper() if len(words) >= 2 else str(text).upper()
-
-
-def get_last_word(text):
-    """Son kelimeyi (marka) al"""
-    if pd.isna(text):
-        return ""
-    words = str(text).strip().split()
-    return words[-1].upper() if words else ""
-
-
-def extract_quantity(text):
-    """Gramaj/ML çıkar: '750 ML' → 750, 'ML'"""
-    import re
-    if pd.isna(text):
-        return None, None
-    
-    text = str(text).upper()
-    
-    # Patterns: 750ML, 750 ML, 1.5L, 1,5 LT, 220G, 220 G, 1KG
-    patterns = [
-        r'(\d+[.,]?\d*)\s*(ML|LT|L|G|GR|KG|MG)\b',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            value = float(match.group(1).replace(',', '.'))
-            unit = match.group(2)
-            
-            # Normalize units to base (ML, G)
-            if unit in ['LT', 'L']:
-                value = value * 1000  # to ML
-                unit = 'ML'
-            elif unit == 'KG':
-                value = value * 1000  # to G
-                unit = 'G'
-            elif unit == 'GR':
-                unit = 'G'
-            
-            return value, unit
-    
-    return None, None
-
-
-def is_quantity_similar(qty1, unit1, qty2, unit2, tolerance=0.30):
-    """Gramaj benzer mi? Aynı boyut kategorisinde mi?"""
-    if qty1 is None or qty2 is None:
-        return True  # Gramaj bulunamadıysa benzer say
-    
-    if unit1 != unit2:
-        return False  # Farklı birim (ML vs G) benzer değil
-    
-    if qty1 == 0 or qty2 == 0:
-        return True
-    
-    # Oran kontrolü: max 3x fark olabilir
-    ratio = max(qty1, qty2) / min(qty1, qty2)
-    if ratio > 3:
-        return False  # 3 kattan fazla fark varsa benzer değil
-    
-    # Boyut kategorileri
-    def get_size_category(qty, unit):
-        if unit == 'ML':
-            if qty <= 400: return 'S'      # Küçük: 0-400ml
-            elif qty <= 1000: return 'M'   # Orta: 400-1000ml
-            else: return 'L'               # Büyük: 1000ml+
-        elif unit == 'G':
-            if qty <= 100: return 'S'      # Küçük: 0-100g
-            elif qty <= 400: return 'M'    # Orta: 100-400g
-            else: return 'L'               # Büyük: 400g+
-        return 'M'
-    
-    cat1 = get_size_category(qty1, unit1)
-    cat2 = get_size_category(qty2, unit2)
-    
-    # Sadece aynı kategorideyse benzer
-    return cat1 == cat2
-
-
-def detect_internal_theft(df):
-    """
-    İÇ HIRSIZLIK TESPİTİ:
-    - Satış Fiyatı >= 100 TL
-    - Dengelenmemiş (Fark + Kısmi + Önceki ≠ 0)
-    - |Toplam| ≈ İptal Satır, fark büyüdükçe risk AZALIR
-    """
-    results = []
-    
-    for idx, row in df.iterrows():
-        # Dengelenmiş ise atla
-        if is_balanced(row):
-            continue
-        
-        satis_fiyati = row.get('Birim Fiyat', 0) or 0
-        if satis_fiyati < 100:
-            continue
-        
-        fark = row['Fark Miktarı']
-        kismi = row['Kısmi Envanter Miktarı']
-        onceki = row['Önceki Fark Miktarı']
-        iptal = row['İptal Satır Miktarı']
-        
-        toplam = fark + kismi + onceki
-        
-        if toplam >= 0 or iptal <= 0:
-            continue
-        
-        fark_mutlak = abs(abs(toplam) - iptal)
-        
-        if fark_mutlak == 0:
-            risk = "ÇOK YÜKSEK"
-            esitlik = "TAM EŞİT"
-        elif fark_mutlak <= 2:
-            risk = "YÜKSEK"
-            esitlik = "YAKIN (±2)"
-        elif fark_mutlak <= 5:
-            risk = "ORTA"
-            esitlik = "YAKIN (±5)"
-        elif fark_mutlak <= 10:
-            risk = "DÜŞÜK-ORTA"
-            esitlik = f"FARK: {fark_mutlak}"
-        else:
-            continue
-        
-        results.append({
-            'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-            'Malzeme Adı': row.get('Malzeme Adı', ''),
-            'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-            'Satış Fiyatı': satis_fiyati,
-            'Fark Miktarı': fark,
-            'Kısmi Env.': kismi,
-            'Önceki Fark': onceki,
-            'TOPLAM': toplam,
-            'İptal Satır': iptal,
-            'Fark': fark_mutlak,
-            'Durum': esitlik,
-            'Fark Tutarı (TL)': row['Fark Tutarı'],
-            'Risk': risk
-        })
-    
-    result_df = pd.DataFrame(results)
-    
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME - Aynı malzeme kodu sadece 1 kez görünsün
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        
-        # Risk sıralaması
-        risk_order = {'ÇOK YÜKSEK': 0, 'YÜKSEK': 1, 'ORTA': 2, 'DÜŞÜK-ORTA': 3}
-        result_df['_risk_sort'] = result_df['Risk'].map(risk_order)
-        result_df = result_df.sort_values(['_risk_sort', 'Fark Tutarı (TL)'], ascending=[True, True])
-        result_df = result_df.drop('_risk_sort', axis=1)
-    
-    return result_df
-
-
-def detect_chronic_products(df):
-    """Kronik açık - her iki dönemde de Fark < 0"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        if is_balanced(row):
-            continue
-        
-        if row['Önceki Fark Miktarı'] < 0 and row['Fark Miktarı'] < 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Bu Dönem Fark': row['Fark Miktarı'],
-                'Bu Dönem Tutar': row['Fark Tutarı'],
-                'Önceki Fark': row['Önceki Fark Miktarı'],
-                'Önceki Tutar': row['Önceki Fark Tutarı'],
-                'Toplam Tutar': row['Fark Tutarı'] + row['Önceki Fark Tutarı']
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Bu Dönem Tutar', ascending=True)
-    
-    return result_df
-
-
-def detect_chronic_fire(df):
-    """Kronik Fire - her iki dönemde de fire var VE dengelenmemiş"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        onceki_fire = row.get('Önceki Fire Miktarı', 0) or 0
-        bu_fire = row['Fire Miktarı']
-        
-        # Her iki dönemde de fire varsa
-        if onceki_fire != 0 and bu_fire != 0:
-            # Önceki Fark + Fark = 0 ise dengelenmiş, kronik değil
-            onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
-            bu_fark = row['Fark Miktarı']
-            
-            if abs(onceki_fark + bu_fark) <= 0.01:
-                continue  # Dengelenmiş, kronik fire değil
-            
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Bu Dönem Fire': bu_fire,
-                'Bu Dönem Fire Tutarı': row['Fire Tutarı'],
-                'Önceki Fire': onceki_fire,
-                'Önceki Fire Tutarı': row.get('Önceki Fire Tutarı', 0),
-                'Toplam Fire Tutarı': row['Fire Tutarı'] + row.get('Önceki Fire Tutarı', 0)
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Bu Dönem Fire Tutarı', ascending=True)
-    
-    return result_df
-
-
-def detect_fire_manipulation(df):
-    """Fire manipülasyonu: Fire var AMA Fark+Kısmi > 0 VE dengelenmemiş"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        fark = row['Fark Miktarı']
-        kismi = row['Kısmi Envanter Miktarı']
-        onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
-        fire = row['Fire Miktarı']
-        
-        fark_kismi = fark + kismi
-        
-        # Önceki Fark + Fark = 0 ise dengelenmiş, manipülasyon değil
-        if abs(onceki_fark + fark) <= 0.01:
-            continue
-        
-        if fire < 0 and fark_kismi > 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Fark Miktarı': fark,
-                'Kısmi Env.': kismi,
-                'Önceki Fark': onceki_fark,
-                'Fark + Kısmi': fark_kismi,
-                'Fire Miktarı': fire,
-                'Fire Tutarı': row['Fire Tutarı'],
-                'Sonuç': 'FAZLA FİRE GİRİLMİŞ'
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Fire Tutarı', ascending=True)
-    
-    return result_df
-
-
-def detect_cigarette_shortage(df):
-    """
-    Sigara açığı - Tüm sigaraların TOPLAM (Fark + Kısmi + Önceki) değerine bakılır
-    Eğer toplam < 0 ise sigara açığı var demektir
-    
-    NET = Fark Miktarı + Kısmi Envanter Miktarı + Önceki Fark Miktarı
-    
-    Sigara tespiti kuralları:
-    - Mal Grubu Tanımı veya Ürün Grubu içinde 'SİGARA' veya 'TÜTÜN' geçenler
-    - MAKARON tek başına sigara DEĞİLDİR (bilinçli olarak dışarıda tutulur)
-    - "MAKARON JEL KALEM" gibi ürünler yanlışlıkla yakalanmasın diye MAKARON dahil edilmez
-    """
-    
-    # Sigara kontrolü yapılacak kolonları belirle (öncelik sırasına göre)
-    # NOT: Malzeme Adı dahil değil - sadece kategori bazlı filtre yapılır
-    check_cols = []
-    for col in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup']:
-        if col in df.columns:
-            check_cols.append(col)
-    
-    if not check_cols:
-        return pd.DataFrame()
-    
-    # Sigara mask oluştur - CONTAINS kullan (eşitlik değil!)
-    sigara_mask = pd.Series([False] * len(df), index=df.index)
-    
-    for col in check_cols:
-        # Türkçe karakterleri normalize et
-        col_values = df[col].fillna('').astype(str).str.upper()
-        col_values = col_values.str.replace('İ', 'I', regex=False)
-        col_values = col_values.str.replace('Ş', 'S', regex=False)
-        col_values = col_values.str.replace('Ğ', 'G', regex=False)
-        col_values = col_values.str.replace('Ü', 'U', regex=False)
-        col_values = col_values.str.replace('Ö', 'O', regex=False)
-        col_values = col_values.str.replace('Ç', 'C', regex=False)
-        col_values = col_values.str.replace('ı', 'I', regex=False)
-        
-        # SIGARA veya TUTUN içeren satırları bul
-        # NOT: MAKARON tek başına dahil DEĞİL - sadece SIGARA veya TUTUN varsa
-        mask = col_values.str.contains('SIGARA|TUTUN', case=False, na=False, regex=True)
-        sigara_mask = sigara_mask | mask
-    
-    # MAKARON'u açıkça dışarıda tut (eğer SIGARA/TUTUN yoksa)
-    # Bu satır gereksiz görünebilir ama gelecekte güvenlik sağlar
-    # Şu an mask zaten sadece SIGARA|TUTUN içerenleri yakalar
-    
-    sigara_df = df[sigara_mask].copy()
-    
-    if len(sigara_df) == 0:
-        return pd.DataFrame()
-    
-    # Net hesapla: Fark + Kısmi + Önceki
-    toplam_fark = sigara_df['Fark Miktarı'].fillna(0).sum()
-    toplam_kismi = sigara_df['Kısmi Envanter Miktarı'].fillna(0).sum()
-    toplam_onceki = sigara_df['Önceki Fark Miktarı'].fillna(0).sum()
-    net_toplam = toplam_fark + toplam_kismi + toplam_onceki
-    
-    # Eğer net toplam < 0 ise açık var
-    if net_toplam >= 0:
-        return pd.DataFrame()
-    
-    # Açık varsa, detay göster
-    results = []
-    for idx, row in sigara_df.iterrows():
-        fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
-        kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
-        onceki = row['Önceki Fark Miktarı'] if pd.notna(row['Önceki Fark Miktarı']) else 0
-        urun_net = fark + kismi + onceki
-        
-        # Sadece 0 olmayan kayıtları göster
-        if fark != 0 or kismi != 0 or onceki != 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Fark': fark,
-                'Kısmi': kismi,
-                'Önceki': onceki,
-                'Ürün Toplam': urun_net,
-                'Risk': 'SİGARA'
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Ürün Toplam', ascending=True)
-        # En sona toplam satırı ekle
-        toplam_row = pd.DataFrame([{
-            'Malzeme Kodu': '*** TOPLAM ***',
-            'Malzeme Adı': f'SİGARA AÇIĞI: {abs(net_toplam):.0f} adet',
-            'Fark': toplam_fark,
-            'Kısmi': toplam_kismi,
-            'Önceki': toplam_onceki,
-            'Ürün Toplam': net_toplam,
-            'Risk': '⚠️ AÇIK VAR'
-        }])
-        result_df = pd.concat([result_df, toplam_row], ignore_index=True)
-    
-    return result_df
-
-
-def find_product_families(df):
-    """
-    Benzer ürün ailesi analizi
-    Kural: İlk 2 kelime + Son kelime (marka) + Mal Grubu + Gramaj (±%30) aynıysa = AİLE
-    """
-    df_copy = df.copy()
-    df_copy['İlk2Kelime'] = df_copy['Malzeme Adı'].apply(get_first_two_words)
-    df_copy['Marka'] = df_copy['Malzeme Adı'].apply(get_last_word)
-    df_copy['Gramaj'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[0])
-    df_copy['GramajBirim'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[1])
-    
-    families = []
-    processed_indices = set()
-    
-    # Her ürün için potansiyel aile bul
-    for idx, row in df_copy.iterrows():
-        if idx in processed_indices:
-            continue
-        
-        ilk2 = row['İlk2Kelime']
-        marka = row['Marka']
-        urun_grubu = row['Ürün Grubu']
-        gramaj = row['Gramaj']
-        birim = row['GramajBirim']
-        
-        if not ilk2 or not marka:
-            continue
-        
-        # Aynı grup içinde benzer ürünleri bul
-        family_mask = (
-            (df_copy['İlk2Kelime'] == ilk2) & 
-            (df_copy['Marka'] == marka) & 
-            (df_copy['Ürün Grubu'] == urun_grubu)
-        )
-        
-        potential_family = df_copy[family_mask]
-        
-        if len(potential_family) <= 1:
-            continue
-        
-        # Gramaj kontrolü - benzer gramajlı olanları filtrele
-        family_members = []
-        for fam_idx, fam_row in potential_family.iterrows():
-            if is_quantity_similar(gramaj, birim, fam_row['Gramaj'], fam_row['GramajBirim']):
-                family_members.append(fam_idx)
-                processed_indices.add(fam_idx)
-        
-        if len(family_members) <= 1:
-            continue
-        
-        family_df = df_copy.loc[family_members]
-        
-        toplam_fark = family_df['Fark Miktarı'].sum()
-        toplam_kismi = family_df['Kısmi Envanter Miktarı'].sum()
-        toplam_onceki = family_df['Önceki Fark Miktarı'].sum()
-        aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
-        
-        if family_df['Fark Miktarı'].abs().sum() > 0:
-            if abs(aile_toplami) <= 2:
-                sonuc = "KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL"
-                risk = "DÜŞÜK"
-            elif aile_toplami < -2:
-                sonuc = "AİLEDE NET AÇIK VAR"
-                risk = "ORTA"
-            else:
-                sonuc = "AİLEDE FAZLA VAR"
-                risk = "DÜŞÜK"
-            
-            urunler = family_df['Malzeme Adı'].tolist()
-            farklar = family_df['Fark Miktarı'].tolist()
-            
-            families.append({
-                'Mal Grubu': urun_grubu,
-                'İlk 2 Kelime': ilk2,
-                'Marka': marka,
-                'Ürün Sayısı': len(family_members),
-                'Toplam Fark': toplam_fark,
-                'Toplam Kısmi': toplam_kismi,
-                'Toplam Önceki': toplam_onceki,
-                'AİLE TOPLAMI': aile_toplami,
-                'Sonuç': sonuc,
-                'Risk': risk,
-                'Ürünler': ' | '.join([f"{u[:25]}({f})" for u, f in zip(urunler[:5], farklar[:5])])
-            })
-    
-    result_df = pd.DataFrame(families)
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
-    
-    return result_df
-
-
-def detect_external_theft(df):
-    """Dış hırsızlık - açık var ama fire/iptal yok"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        if is_balanced(row):
-            continue
-        
-        if row['Fark Miktarı'] < 0 and row['Fire Miktarı'] == 0 and row['İptal Satır Miktarı'] == 0:
-            if abs(row['Fark Tutarı']) > 50:
-                results.append({
-                    'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                    'Malzeme Adı': row.get('Malzeme Adı', ''),
-                    'Ürün Grubu': row.get('Ürün Grubu', ''),
-                    'Fark Miktarı': row['Fark Miktarı'],
-                    'Fark Tutarı': row['Fark Tutarı'],
-                    'Önceki Fark': row['Önceki Fark Miktarı'],
-                    'Risk': 'DIŞ HIRSIZLIK / SAYIM HATASI'
-                })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('Fark Tutarı', ascending=True)
-    
-    return result_df
-
-
-def check_kasa_activity_products(df, kasa_kodlari):
-    """
-    10 TL Ürünleri Kontrolü
-    Fiyat değişikliği olan ürünlerde manipülasyon riski
-    Toplam adet ve tutar etkisini hesapla
-    FORMÜL: Fark + Kısmi (Önceki dahil değil)
-    """
-    results = []
-    
-    toplam_adet = 0
-    toplam_tutar = 0
-    eslesen_urun = 0
-    
-    for idx, row in df.iterrows():
-        # Kod eşleştirme - hem string hem int formatını dene
-        kod_raw = row.get('Malzeme Kodu', '')
-        kod_str = str(kod_raw).replace('.0', '').strip()  # Float'tan gelen .0'ı kaldır
-        
-        if kod_str in kasa_kodlari:
-            eslesen_urun += 1
-            fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
-            kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
-            toplam = fark + kismi  # Önceki dahil değil!
-            
-            # Tutar hesabı - Fark + Kısmi tutarları
-            fark_tutari = row.get('Fark Tutarı', 0) or 0
-            kismi_tutari = row.get('Kısmi Envanter Tutarı', 0) or 0
-            urun_toplam_tutar = fark_tutari + kismi_tutari  # Önceki dahil değil!
-            
-            toplam_adet += toplam
-            toplam_tutar += urun_toplam_tutar
-            
-            if toplam != 0:  # Sadece sıfır olmayanları göster
-                if toplam > 0:
-                    durum = "FAZLA (+)"
-                else:
-                    durum = "AÇIK (-)"
-                
-                results.append({
-                    'Malzeme Kodu': kod_str,
-                    'Malzeme Adı': row.get('Malzeme Adı', ''),
-                    'Fark': fark,
-                    'Kısmi': kismi,
-                    'TOPLAM': toplam,
-                    'Tutar': urun_toplam_tutar,
-                    'Durum': durum
-                })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # Önce fazla (+) olanlar, sonra açık (-) olanlar
-        result_df['_sort'] = result_df['TOPLAM'].apply(lambda x: 0 if x > 0 else 1)
-        result_df = result_df.sort_values(['_sort', 'TOPLAM'], ascending=[True, False])
-        result_df = result_df.drop('_sort', axis=1)
-    
-    # Özet bilgileri de döndür
-    summary = {
-        'toplam_urun': eslesen_urun,
-        'sorunlu_urun': len(results),
-        'toplam_adet': toplam_adet,
-        'toplam_tutar': toplam_tutar
-    }
-    
-    return result_df, summary
-
-
-# 10 TL Ürünleri Ürün Kodları (209 adet)
-# Bu ürünlerde fiyat değişikliği olduğu için manipülasyon riski var
-KASA_AKTIVITESI_KODLARI = {
-    '25006448', '12002256', '12002046', '22001972', '12003295', '22002759', '22002500', '11002886', '22002215', '22002214',
-    '22002259', '22002349', '16002163', '22002717', '16001587', '13001073', '30000944', '18002488', '17003609', '22002296',
-    '22002652', '24004136', '24004137', '12003073', '22002328', '24005228', '24006215', '24005232', '24005231', '24006214',
-    '24006212', '16002332', '16002342', '23001397', '16002310', '24001063', '24004020', '13002613', '13002317', '13002506',
-    '16002285', '16002219', '16002286', '16002218', '13000258', '13000257', '13000256', '13000260', '13002533', '22002611',
-    '22002579', '13002559', '13000187', '13002904', '13000189', '13000190', '13002908', '13001872', '13001874', '30000838',
-    '30000926', '22002605', '22002604', '22002603', '12003241', '16002194', '16001734', '25005580', '25000237', '25000049',
-    '16002099', '23001367', '23001510', '23001177', '23001403', '23001278', '22002732', '22002576', '22002577', '25006483',
-    '23001240', '16002317', '30000958', '30000956', '24005155', '24005154', '24005156', '24005157', '24005153', '22000280',
-    '22002773', '22002774', '22002501', '22002225', '22000397', '22001395', '22000396', '16001859', '18002956', '17003542',
-    '16002338', '16002339', '16002341', '16002009', '16000856', '22002715', '16002235', '24006067', '24006069', '24006068',
-    '24006066', '22002686', '22002687', '22002688', '16002220', '24005291', '24005290', '24006078', '24006084', '24005288',
-    '24006082', '24006079', '24005289', '24006085', '22002763', '22002762', '22001032', '18003049', '24006126', '24004420',
-    '24005183', '24005649', '24005650', '14002481', '13002315', '22001229', '13002478', '30000880', '24005798', '24005796',
-    '24005799', '24005797', '24005795', '24006159', '24003492', '24006171', '24006170', '24006174', '24006172', '24006173',
-    '22002640', '22002553', '22002764', '22002223', '22002679', '22002221', '22002224', '22002572', '27002662', '24005441',
-    '24005897', '24005898', '24005900', '24006081', '24006080', '16002087', '22002282', '22002283', '24005893', '24005894',
-    '23001198', '23001439', '23001195', '23001199', '23000843', '23000034', '23001445', '23001444', '23001443', '23001522',
-    '24004381', '24005184', '23001534', '23001533', '18001591', '27002676', '27002677', '16001956', '24003287', '24000005',
-    '24002194', '24002192', '24002764', '24003872', '16001983', '18002969', '27001340', '27001148', '27001563', '24004354',
-    '24004196', '24004115', '14002424', '24003641', '24004972', '13001481', '24003327', '24000004', '23000122',
-}
-
-
 def load_kasa_activity_codes():
     """Kasa aktivitesi ürün kodlarını döndür"""
     return KASA_AKTIVITESI_KODLARI
 
 
-def generate_executive_summary(df, kasa_activity_df=None, kasa_summary=None):
-    """Yönetici özeti - mal grubu bazlı yorumlar"""
-    comments = []
-    
-    # Önce toplam tutarı hesapla (Fark + Kısmi + Önceki)
-    df_copy = df.copy()
-    df_copy['Kısmi Envanter Tutarı'] = df_copy.get('Kısmi Envanter Tutarı', 0).fillna(0)
-    df_copy['Önceki Fark Tutarı'] = df_copy.get('Önceki Fark Tutarı', 0).fillna(0)
-    df_copy['Toplam Tutar'] = df_copy['Fark Tutarı'] + df_copy['Kısmi Envanter Tutarı'] + df_copy['Önceki Fark Tutarı']
-    
-    # Mal grubu bazlı analiz
-    group_stats = df_copy.groupby('Ürün Grubu').agg({
-        'Toplam Tutar': 'sum',
-        'Fire Tutarı': 'sum',
-        'Satış Tutarı': 'sum',
-        'Fark Miktarı': lambda x: (x < 0).sum()
-    }).reset_index()
-    
-    group_stats.columns = ['Ürün Grubu', 'Toplam Fark', 'Toplam Fire', 'Toplam Satış', 'Açık Ürün Sayısı']
-    group_stats['Açık Oranı'] = abs(group_stats['Toplam Fark']) / group_stats['Toplam Satış'].replace(0, 1) * 100
-    
-    # En yüksek açık
-    top_acik = group_stats.nsmallest(3, 'Toplam Fark')
-    for _, row in top_acik.iterrows():
-        if row['Toplam Fark'] < -500:
-            comments.append(f"⚠️ {row['Ürün Grubu']}: {row['Toplam Fark']:,.0f} TL açık ({row['Açık Ürün Sayısı']} ürün)")
-    
-    # En yüksek fire
-    top_fire = group_stats.nsmallest(3, 'Toplam Fire')
-    for _, row in top_fire.iterrows():
-        if row['Toplam Fire'] < -500:
-            comments.append(f"🔥 {row['Ürün Grubu']}: {row['Toplam Fire']:,.0f} TL fire")
-    
-    # 10 TL ürünleri yorumu - TOPLAM ADET VE TUTAR
-    if kasa_summary is not None:
-        toplam_adet = kasa_summary.get('toplam_adet', 0)
-        toplam_tutar = kasa_summary.get('toplam_tutar', 0)
-        
-        if toplam_adet > 0:
-            comments.append(f"💰 10 TL ÜRÜNLERİ: NET +{toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL FAZLA")
-            comments.append(f"   ⚠️ Bu fazlalık gerçek envanter açığını gizliyor olabilir!")
-        elif toplam_adet < 0:
-            comments.append(f"💰 10 TL ÜRÜNLERİ: NET {toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL AÇIK")
-    
-    return comments, group_stats
-
-
 def compute_sigara_acik_by_store(df: pd.DataFrame) -> pd.Series:
     """
     Sigara açığını mağaza bazında vektörel hesapla (10x hızlı)
     Loop yerine tek seferde tüm mağazalar için hesaplama yapar
     """
-    # Sigara kontrol kolonları
-    cols = [c for c in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup'] if c in df.columns]
-    if not cols:
-        return pd.Series(dtype=float)
-    
-    def norm_turkish(s: pd.Series) -> pd.Series:
-        """Türkçe karakterleri normalize et"""
-        s = s.fillna('').astype(str).str.upper()
-        return (s.str.replace('İ', 'I', regex=False)
-                 .str.replace('Ş', 'S', regex=False)
-                 .str.replace('Ğ', 'G', regex=False)
-                 .str.replace('Ü', 'U', regex=False)
-                 .str.replace('Ö', 'O', regex=False)
-                 .str.replace('Ç', 'C', regex=False)
-                 .str.replace('ı', 'I', regex=False))
-    
-    # Sigara mask oluştur
-    masks = []
-    for c in cols:
-        v = norm_turkish(df[c])
-        masks.append(v.str.contains(r'SIGARA|TUTUN', regex=True, na=False))
-    
-    sig_mask = masks[0]
-    for m in masks[1:]:
-        sig_mask = sig_mask | m
+    # Sigara mask - feature frame'den veya kategori bazlı cache'li normalize ile
+    sig_mask = df['SIGARA'] if 'SIGARA' in df.columns else sigara_kategori_mask(df)
     
     # Sigara ürünlerini filtrele
     required_cols = ['Mağaza Kodu', 'Fark Miktarı', 'Kısmi Envanter Miktarı', 'Önceki Fark Miktarı']
@@ -1973,8 +1178,11 @@ def compute_sigara_acik_by_store(df: pd.DataFrame) -> pd.Series:
     return sigara_acik
 
 
-def analyze_region(df, kasa_kodlari):
-    """Bölge geneli analiz - HIZLI VERSİYON (vektörel işlemler)"""
+def build_region_features(df, kasa_kodlari):
+    """
+    Bölge geneli mağaza özellik matrisi (metrikler + risk sayıları, puansız)
+    Puanlama ayrı yapılır (score_region) - ağırlık değişince bu adım tekrarlanmaz
+    """
     
     magazalar = df['Mağaza Kodu'].dropna().unique().tolist()
     
@@ -2023,264 +1231,181 @@ def analyze_region(df, kasa_kodlari):
     
     # ===== HIZLI RİSK ANALİZLERİ (vektörel) =====
     
-    # 1. İç Hırsızlık - Satış Fiyatı >= 100 ve Fark < 0 olan ürün sayısı
-    if 'Satış Fiyatı' in df.columns:
-        ic_hirsizlik = df[(df['Satış Fiyatı'] >= 100) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size()
-    else:
-        ic_hirsizlik = pd.Series(0, index=magazalar)
-    
-    # 2. Kronik Açık - Önceki Fark < 0 ve Fark < 0 olan ürün sayısı
-    kronik = df[(df['Önceki Fark Miktarı'] < 0) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size()
-    
-    # 3. Kronik Fire - Önceki Fire < 0 ve Fire < 0 olan ürün sayısı  
-    if 'Önceki Fire Miktarı' in df.columns:
-        kronik_fire = df[(df['Önceki Fire Miktarı'] < 0) & (df['Fire Miktarı'] < 0)].groupby('Mağaza Kodu').size()
-    else:
-        kronik_fire = pd.Series(0, index=magazalar)
+    # 1-3, 5. İç Hırsızlık, Kronik Açık, Kronik Fire, Fire Manipülasyonu - kural motorundan (eşikler
+    # weights.json detection_rules), tüm mağazalar tek geçişte
+    kural_sayilari = region_rule_counts(df)
     
     # 4. Sigara Açığı - VEKTÖREL HESAPLAMA (10x hızlı)
     sigara_acik_series = compute_sigara_acik_by_store(df)
     
-    # 5. Fire Manipülasyonu - Fire > |Fark| olan ürün sayısı
-    fire_manip = df[abs(df['Fire Miktarı']) > abs(df['Fark Miktarı'].fillna(0) + df['Kısmi Envanter Miktarı'].fillna(0))].groupby('Mağaza Kodu').size()
-    
-    # 6. 10TL Ürünleri - Kasa aktivitesi kodları
-    kasa_set = set(str(k) for k in kasa_kodlari) if kasa_kodlari else set()
-    if len(kasa_set) > 0:
-        kasa_mask = df['Malzeme Kodu'].astype(str).isin(kasa_set)
-        kasa_agg = df[kasa_mask].groupby('Mağaza Kodu').agg({
-            'Fark Miktarı': 'sum',
-            'Kısmi Envanter Miktarı': 'sum',
-            'Fark Tutarı': 'sum',
-            'Kısmi Envanter Tutarı': 'sum'
-        })
-        if len(kasa_agg) > 0:
-            kasa_agg['10TL Adet'] = kasa_agg['Fark Miktarı'].fillna(0) + kasa_agg['Kısmi Envanter Miktarı'].fillna(0)
-            kasa_agg['10TL Tutar'] = kasa_agg['Fark Tutarı'].fillna(0) + kasa_agg['Kısmi Envanter Tutarı'].fillna(0)
-        else:
-            kasa_agg = pd.DataFrame({'10TL Adet': [], '10TL Tutar': []})
-    else:
-        kasa_agg = pd.DataFrame({'10TL Adet': [], '10TL Tutar': []})
-    
-    # Sonuçları birleştir
-    results = []
-    
-    # Risk config'i al
-    rw = RISK_CONFIG.get('risk_weights', {})
-    rl = RISK_CONFIG.get('risk_levels', {})
-    max_score = RISK_CONFIG.get('max_risk_score', 100)
-    
-    for _, row in store_metrics.iterrows():
-        mag = row['Mağaza Kodu']
-        
-        # Risk değerlerini al
-        ic_hrs = ic_hirsizlik.get(mag, 0)
-        kr_acik = kronik.get(mag, 0)
-        kr_fire = kronik_fire.get(mag, 0)
-        sig_acik = sigara_acik_series.get(mag, 0)
-        fire_man = fire_manip.get(mag, 0)
-        kasa_adet = kasa_agg.loc[mag, '10TL Adet'] if mag in kasa_agg.index else 0
-        kasa_tutar = kasa_agg.loc[mag, '10TL Tutar'] if mag in kasa_agg.index else 0
-        
-        # Risk puanı hesapla (config'den ağırlıklar)
-        risk_puan = 0
-        risk_nedenler = []
-        toplam_oran = row['Toplam %']
-        
-        # Toplam oran bazlı risk
-        to = rw.get('toplam_oran', {})
-        if toplam_oran > to.get('high', {}).get('threshold', 2):
-            risk_puan += to.get('high', {}).get('points', 40)
-            risk_nedenler.append(f"Toplam %{toplam_oran:.1f}")
-        elif toplam_oran > to.get('medium', {}).get('threshold', 1.5):
-            risk_puan += to.get('medium', {}).get('points', 25)
-            risk_nedenler.append(f"Toplam %{toplam_oran:.1f}")
-        elif toplam_oran > to.get('low', {}).get('threshold', 1):
-            risk_puan += to.get('low', {}).get('points', 15)
-        
-        # İç hırsızlık
-        ih = rw.get('ic_hirsizlik', {})
-        if ic_hrs > ih.get('high', {}).get('threshold', 50):
-            risk_puan += ih.get('high', {}).get('points', 30)
-            risk_nedenler.append(f"İç hırs. {ic_hrs}")
-        elif ic_hrs > ih.get('medium', {}).get('threshold', 30):
-            risk_puan += ih.get('medium', {}).get('points', 20)
-            risk_nedenler.append(f"İç hırs. {ic_hrs}")
-        elif ic_hrs > ih.get('low', {}).get('threshold', 15):
-            risk_puan += ih.get('low', {}).get('points', 10)
-        
-        # Sigara açığı
-        sg = rw.get('sigara', {})
-        if sig_acik > sg.get('high', {}).get('threshold', 5):
-            risk_puan += sg.get('high', {}).get('points', 35)
-            risk_nedenler.append(f"🚬 SİGARA {sig_acik:.0f}")
-        elif sig_acik > sg.get('low', {}).get('threshold', 0):
-            risk_puan += sg.get('low', {}).get('points', 20)
-            risk_nedenler.append(f"🚬 Sigara {sig_acik:.0f}")
-        
-        # Kronik açık
-        kr = rw.get('kronik', {})
-        if kr_acik > kr.get('high', {}).get('threshold', 100):
-            risk_puan += kr.get('high', {}).get('points', 15)
-            risk_nedenler.append(f"Kronik {kr_acik}")
-        elif kr_acik > kr.get('low', {}).get('threshold', 50):
-            risk_puan += kr.get('low', {}).get('points', 10)
-        
-        # Fire manipülasyonu
-        fm = rw.get('fire_manipulasyon', {})
-        if fire_man > fm.get('high', {}).get('threshold', 10):
-            risk_puan += fm.get('high', {}).get('points', 20)
-            risk_nedenler.append(f"Fire man. {fire_man}")
-        elif fire_man > fm.get('low', {}).get('threshold', 5):
-            risk_puan += fm.get('low', {}).get('points', 10)
-        
-        # 10 TL ürünleri
-        kt = rw.get('kasa_10tl', {})
-        if kasa_adet > kt.get('high', {}).get('threshold', 20):
-            risk_puan += kt.get('high', {}).get('points', 15)
-            risk_nedenler.append(f"10TL +{kasa_adet:.0f}")
-        elif kasa_adet > kt.get('low', {}).get('threshold', 10):
-            risk_puan += kt.get('low', {}).get('points', 10)
-        
-        # Risk puanını sınırla
-        risk_puan = min(risk_puan, max_score)
-        
-        # Risk seviyesi (config'den eşikler)
-        if risk_puan >= rl.get('kritik', 60):
-            risk_seviye = "🔴 KRİTİK"
-        elif risk_puan >= rl.get('riskli', 40):
-            risk_seviye = "🟠 RİSKLİ"
-        elif risk_puan >= rl.get('dikkat', 20):
-            risk_seviye = "🟡 DİKKAT"
-        else:
-            risk_seviye = "🟢 TEMİZ"
-        
-        results.append({
-            'Mağaza Kodu': mag,
-            'Mağaza Adı': row['Mağaza Adı'],
-            'SM': row.get('Satış Müdürü', ''),
-            'BS': row['Bölge Sorumlusu'],
-            'Satış': row['Satış'],
-            'Fark': row['Fark'],
-            'Fire': row['Fire'],
-            'Toplam Açık': row['Toplam Açık'],
-            'Fark %': row['Fark %'],
-            'Fire %': row['Fire %'],
-            'Toplam %': row['Toplam %'],
-            'Gün': row['Gün'],
-            'Günlük Fark': row['Günlük Fark'],
-            'Günlük Fire': row['Günlük Fire'],
-            'İç Hırs.': ic_hrs,
-            'Kr.Açık': kr_acik,
-            'Kr.Fire': kr_fire,
-            'Sigara': sig_acik,
-            'Fire Man.': fire_man,
-            '10TL Adet': kasa_adet,
-            '10TL Tutar': kasa_tutar,
-            'Risk Puan': risk_puan,
-            'Risk': risk_seviye,
-            'Risk Nedenleri': " | ".join(risk_nedenler) if risk_nedenler else "-"
-        })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('Risk Puan', ascending=False)
-    
-    return result_df
+    # 6. 10TL Ürünleri - Kasa aktivitesi kodları (tüm mağazalar tek groupby)
+    kasa_ozet = kasa_summary_by_store(df, kasa_kodlari)
+    kasa_agg = pd.DataFrame({'10TL Adet': kasa_ozet['toplam_adet'], '10TL Tutar': kasa_ozet['toplam_tutar']})
+    
+    # Sonuçları birleştir - tüm risk sayıları mağaza sırasına hizalanır (eksik → 0)
+    mags = store_metrics['Mağaza Kodu']
+    risk_sayilari = pd.DataFrame({
+        'İç Hırs.': align_store_series(kural_sayilari['İç Hırs.'], mags),
+        'Kr.Açık': align_store_series(kural_sayilari['Kr.Açık'], mags),
+        'Kr.Fire': align_store_series(kural_sayilari['Kr.Fire'], mags),
+        'Sigara': align_store_series(sigara_acik_series, mags),
+        'Fire Man.': align_store_series(kural_sayilari['Fire Man.'], mags),
+        '10TL Adet': align_store_series(kasa_agg['10TL Adet'], mags),
+        '10TL Tutar': align_store_series(kasa_agg['10TL Tutar'], mags),
+    }).reset_index(drop=True)
+    
+    results = pd.DataFrame({
+        'Mağaza Kodu': mags,
+        'Mağaza Adı': store_metrics['Mağaza Adı'],
+        'SM': store_metrics['Satış Müdürü'],
+        'BS': store_metrics['Bölge Sorumlusu'],
+        'Satış': store_metrics['Satış'],
+        'Fark': store_metrics['Fark'],
+        'Fire': store_metrics['Fire'],
+        'Toplam Açık': store_metrics['Toplam Açık'],
+        'Fark %': store_metrics['Fark %'],
+        'Fire %': store_metrics['Fire %'],
+        'Toplam %': store_metrics['Toplam %'],
+        'Gün': store_metrics['Gün'],
+        'Günlük Fark': store_metrics['Günlük Fark'],
+        'Günlük Fire': store_metrics['Günlük Fire'],
+    })
+    return pd.concat([results, risk_sayilari], axis=1)
 
 
-def aggregate_by_group(store_df, group_col):
-    """SM veya BS bazında gruplama - Satış Ağırlıklı Ortalama Risk"""
-    if group_col not in store_df.columns:
-        return pd.DataFrame()
-    
-    # Kolon isimlerini kontrol et (VIEW vs analyze_region uyumu)
-    kronik_col = 'Kronik' if 'Kronik' in store_df.columns else 'Kr.Açık'
-    kasa_adet_col = 'Kasa Adet' if 'Kasa Adet' in store_df.columns else '10TL Adet'
-    kasa_tutar_col = 'Kasa Tutar' if 'Kasa Tutar' in store_df.columns else '10TL Tutar'
-    
-    # Eksik kolonları 0 ile doldur
-    if kronik_col not in store_df.columns:
-        store_df[kronik_col] = 0
-    if kasa_adet_col not in store_df.columns:
-        store_df[kasa_adet_col] = 0
-    if kasa_tutar_col not in store_df.columns:
-        store_df[kasa_tutar_col] = 0
-    if 'Gün' not in store_df.columns:
-        store_df['Gün'] = 1
-    
-    # Temel metrikler
-    agg_dict = {
-        'Mağaza Kodu': 'count',
-        'Satış': 'sum',
-        'Fark': 'sum',
-        'Fire': 'sum',
-        'Toplam Açık': 'sum',
-        'İç Hırs.': 'sum',
-        kronik_col: 'sum',
-        'Sigara': 'sum',
-        kasa_adet_col: 'sum',
-        kasa_tutar_col: 'sum',
-        'Gün': 'sum',
-    }
-    
-    grouped = store_df.groupby(group_col).agg(agg_dict).reset_index()
-    
-    grouped.columns = [group_col, 'Mağaza Sayısı', 'Satış', 'Fark', 'Fire', 'Toplam Açık',
-                       'İç Hırs.', 'Kronik', 'Sigara', '10TL Adet', '10TL Tutar', 'Toplam Gün']
-    
-    # Satış Ağırlıklı Ortalama Risk Puanı hesapla
-    for idx, row in grouped.iterrows():
-        grup_magazalar = store_df[store_df[group_col] == row[group_col]]
-        
-        # Ağırlıklı ortalama
-        toplam_agirlik = grup_magazalar['Satış'].sum()
-        if toplam_agirlik > 0:
-            agirlikli_risk = (grup_magazalar['Risk Puan'] * grup_magazalar['Satış']).sum() / toplam_agirlik
-        else:
-            agirlikli_risk = grup_magazalar['Risk Puan'].mean()
-        
-        grouped.at[idx, 'Risk Puan'] = agirlikli_risk
+def analyze_region(df, kasa_kodlari, risk_config=None):
+    """Bölge geneli analiz - HIZLI VERSİYON (vektörel işlemler)"""
+    features = build_region_features(df, kasa_kodlari)
+    # Risk puanı (config'den kademeler, np.select ile tüm mağazalar tek seferde)
+    return score_region(features, risk_config or RISK_CONFIG)
+
+
+def get_region_features(df, kasa_kodlari, veri_damgasi=None, filtre=()):
+    """
+    Özellik matrisini session_state'te sakla (aynı veri için tekrar hesaplanmaz)
+    What-if puanlamada sadece score_region / rescore çalışır
+    veri_damgasi: verinin yüklenme anı (yeni yükleme → yeni damga), filtre: aktif filtre parametreleri
+    Damga yoksa cache kullanılmaz
+    """
+    if veri_damgasi is None:
+        return build_region_features(df, kasa_kodlari)
+
+    anahtar = (veri_damgasi, tuple(filtre), tuple(sorted(map(str, kasa_kodlari))))
+    cache = st.session_state.get('region_features')
+    if cache is None or cache[0] != anahtar:
+        cache = (anahtar, build_region_features(df, kasa_kodlari))
+        st.session_state.region_features = cache
+    return cache[1]
+
+
+def get_region_cube(features, region_df, risk_config):
+    """
+    Bölge dönem küpünü özellik matrisinin yanında sakla (rerun'da tekrar kurulmaz)
+    Anahtar: özellik cache anahtarı (veri damgası + filtreler) + aktif risk config (what-if)
+    features cache'ten gelmediyse küp de cache'lenmez
+    """
+    cache = st.session_state.get('region_features')
+    if cache is None or cache[1] is not features:
+        return build_rollup_cube(region_df)
+
+    anahtar = (cache[0], json.dumps(risk_config, sort_keys=True, default=str))
+    kup = st.session_state.get('region_cube')
+    if kup is None or kup[0] != anahtar:
+        kup = (anahtar, build_rollup_cube(region_df))
+        st.session_state.region_cube = kup
+    return kup[1]
+
+
+def get_active_risk_config():
+    """What-if ağırlıkları varsa onları, yoksa weights.json'u döndür"""
+    return st.session_state.get('risk_config_override') or RISK_CONFIG
+
+
+def render_risk_weight_editor(features):
+    """
+    ⚖️ What-if: risk ağırlık/eşiklerini düzenle, tüm mağazaları (mağaza/BS/SM) anında yeniden puanla
+    Veri yeniden çekilmez/analiz edilmez - sadece özellik matrisi puanlanır
+    Dönüş: aktif risk config
+    """
+    aktif = get_active_risk_config()
+    with st.expander("⚖️ Risk Ağırlıkları (What-if)", expanded=False):
+        st.caption("Eşik ve puanları değiştirin - tüm mağazalar anında yeniden puanlanır (weights.json değişmez)")
+        tablo = st.data_editor(
+            risk_config_table(aktif),
+            disabled=['Kriter', 'Kolon', 'Seviye'],
+            hide_index=True,
+            use_container_width=True,
+            key="risk_weight_table",
+        )
+        rl = aktif.get('risk_levels', {})
+        c1, c2, c3, c4 = st.columns(4)
+        kritik = c1.number_input("🔴 Kritik ≥", value=int(rl.get('kritik', 60)), step=5, key="rl_kritik")
+        riskli = c2.number_input("🟠 Riskli ≥", value=int(rl.get('riskli', 40)), step=5, key="rl_riskli")
+        dikkat = c3.number_input("🟡 Dikkat ≥", value=int(rl.get('dikkat', 20)), step=5, key="rl_dikkat")
+        max_puan = c4.number_input("Maks. Puan", value=int(aktif.get('max_risk_score', 100)), step=10, key="rl_max")
+
+        yeni = risk_config_from_table(tablo, aktif)
+        yeni['risk_levels'] = {'kritik': kritik, 'riskli': riskli, 'dikkat': dikkat}
+        yeni['max_risk_score'] = max_puan
+        if yeni != aktif:
+            st.session_state.risk_config_override = yeni
+            aktif = yeni
+
+        if st.button("↩️ weights.json'a dön", key="risk_weight_reset"):
+            st.session_state.pop('risk_config_override', None)
+            for k in ['risk_weight_table', 'rl_kritik', 'rl_riskli', 'rl_dikkat', 'rl_max']:
+                st.session_state.pop(k, None)
+            st.rerun()
+
+        # Karşılaştırma: weights.json vs what-if (mağaza/SM/BS)
+        if len(features) > 0 and aktif is not RISK_CONFIG:
+            _, sm_df, bs_df = rescore(features, aktif)
+            once = score_region(features, RISK_CONFIG)['Risk']
+            sonra = score_region(features, aktif)['Risk']
+            m1, m2 = st.columns(2)
+            m1.metric("🔴 Kritik Mağaza", int((sonra == "🔴 KRİTİK").sum()),
+                      int((sonra == "🔴 KRİTİK").sum() - (once == "🔴 KRİTİK").sum()))
+            m2.metric("🟠 Riskli Mağaza", int((sonra == "🟠 RİSKLİ").sum()),
+                      int((sonra == "🟠 RİSKLİ").sum() - (once == "🟠 RİSKLİ").sum()))
+            ozet_kolonlar = ['Mağaza Sayısı', 'Risk Puan', 'Risk', 'Kritik Mağaza', 'Riskli Mağaza']
+            t1, t2 = st.tabs(["👔 SM", "📋 BS"])
+            with t1:
+                st.dataframe(sm_df[['SM'] + ozet_kolonlar], hide_index=True, use_container_width=True)
+            with t2:
+                st.dataframe(bs_df[['BS'] + ozet_kolonlar], hide_index=True, use_container_width=True)
+    return aktif
+
+
+def render_trend_section(region_df, selected_periods):
+    """📈 Çok dönem seçiliyse: mağaza bazlı dönem trendi ve en hızlı kötüleşen mağazalar"""
+    if len(selected_periods) < 2 or 'Envanter Dönemi' not in region_df.columns:
+        return
+    
+    trend = build_trend_frame(region_df)
+    kotulesen = deteriorating_stores(trend, top=20)
+    
+    with st.expander(f"📈 Dönem Trendi ({len(selected_periods)} dönem)", expanded=False):
+        if len(kotulesen) == 0:
+            st.info("Birden fazla dönemde verisi olan mağaza yok")
+            return
+        
+        st.markdown("**⚠️ En Hızlı Kötüleşen Mağazalar** (Risk Eğilim = dönem başına risk puanı artışı)")
+        gosterim = ['Mağaza Kodu', 'Mağaza Adı', 'Dönem Sayısı', 'Risk Puan', 'Risk Puan Δ', 'Risk Eğilim',
+                    'Fark %', 'Fark % Δ', 'Fire %', 'Fire % Δ', 'Sigara Δ', 'İç Hırs. Δ']
+        st.dataframe(
+            kotulesen[[c for c in gosterim if c in kotulesen.columns]].round(2),
+            hide_index=True, use_container_width=True
+        )
         
-        # Kritik ve Riskli mağaza sayıları
-        kritik_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('KRİTİK')])
-        riskli_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('RİSKLİ')])
-        grouped.at[idx, 'Kritik Mağaza'] = kritik_count
-        grouped.at[idx, 'Riskli Mağaza'] = riskli_count
-    
-    # Oranlar
-    grouped['Fark %'] = abs(grouped['Fark']) / grouped['Satış'] * 100
-    grouped['Fark %'] = grouped['Fark %'].fillna(0)
-    
-    grouped['Fire %'] = abs(grouped['Fire']) / grouped['Satış'] * 100
-    grouped['Fire %'] = grouped['Fire %'].fillna(0)
-    
-    grouped['Toplam %'] = abs(grouped['Toplam Açık']) / grouped['Satış'] * 100
-    grouped['Toplam %'] = grouped['Toplam %'].fillna(0)
-    
-    # Günlük fark ve fire
-    grouped['Günlük Fark'] = grouped['Fark'] / grouped['Toplam Gün']
-    grouped['Günlük Fark'] = grouped['Günlük Fark'].fillna(0)
-    grouped['Günlük Fire'] = grouped['Fire'] / grouped['Toplam Gün']
-    grouped['Günlük Fire'] = grouped['Günlük Fire'].fillna(0)
-    
-    # Risk seviyesi (ağırlıklı ortalama risk puanına göre)
-    def get_risk_level(puan):
-        if puan >= 60:
-            return "🔴 KRİTİK"
-        elif puan >= 40:
-            return "🟠 RİSKLİ"
-        elif puan >= 20:
-            return "🟡 DİKKAT"
-        else:
-            return "🟢 TEMİZ"
-    
-    grouped['Risk'] = grouped['Risk Puan'].apply(get_risk_level)
-    
-    # Risk puanına göre sırala (yüksekten düşüğe)
-    grouped = grouped.sort_values('Risk Puan', ascending=False)
-    
-    return grouped
+        magaza = st.selectbox(
+            "Mağaza trendi",
+            kotulesen['Mağaza Kodu'].tolist() + sorted(set(trend['Mağaza Kodu']) - set(kotulesen['Mağaza Kodu'])),
+            key=f"trend_magaza_{'_'.join(map(str, selected_periods))}"
+        )
+        secili = trend[trend['Mağaza Kodu'] == magaza].set_index('Dönem')
+        st.line_chart(secili[['Risk Puan', 'Risk Puan Ort']])
+        st.dataframe(secili[[c for c in secili.columns if any(c.startswith(m) for m in TREND_METRIKLERI)]].round(2),
+                     use_container_width=True)
 
 
 def create_gm_excel_report(store_df, sm_df, bs_df, params):
@@ -2624,7 +1749,7 @@ def create_top_20_risky(df, internal_codes, chronic_codes, family_balanced_codes
     # Dengelenmişleri ve aile dengelenmişlerini çıkar
     risky_df = df[
         (df['NET_ENVANTER_ETKİ_TUTARI'] < 0) & 
-        (~df.apply(is_balanced, axis=1)) &
+        (~df['DENGELENMIS']) &
         (~df['Malzeme Kodu'].astype(str).isin(family_balanced_codes))
     ].copy()
     
@@ -2634,20 +1759,17 @@ def create_top_20_risky(df, internal_codes, chronic_codes, family_balanced_codes
     # DUPLICATE TEMİZLEME - önce yap
     risky_df = risky_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
     
-    def classify(row):
-        kod = str(row.get('Malzeme Kodu', ''))
-        
-        if kod in internal_codes:
-            return "İÇ HIRSIZLIK", "Kasa kamera incelemesi"
-        elif kod in chronic_codes:
-            return "KRONİK AÇIK", "Raf kontrolü, Sayım eğitimi"
-        elif row['Fire Miktarı'] < 0:
-            return "OPERASYONEL", "Fire kayıt kontrolü"
-        else:
-            return "DIŞ HIRSIZLIK/SAYIM", "Sayım ve kod kontrolü"
-    
-    risky_df['Risk Türü'] = risky_df.apply(lambda x: classify(x)[0], axis=1)
-    risky_df['Aksiyon'] = risky_df.apply(lambda x: classify(x)[1], axis=1)
+    kod = risky_df['Malzeme Kodu'].astype(str)
+    kosullar = [
+        kod.isin(internal_codes),
+        kod.isin(chronic_codes),
+        risky_df['Fire Miktarı'] < 0,
+    ]
+    risky_df['Risk Türü'] = np.select(kosullar, ["İÇ HIRSIZLIK", "KRONİK AÇIK", "OPERASYONEL"],
+                                      default="DIŞ HIRSIZLIK/SAYIM")
+    risky_df['Aksiyon'] = np.select(kosullar, ["Kasa kamera incelemesi", "Raf kontrolü, Sayım eğitimi",
+                                               "Fire kayıt kontrolü"],
+                                    default="Sayım ve kod kontrolü")
     
     risky_df = risky_df.sort_values('NET_ENVANTER_ETKİ_TUTARI', ascending=True).head(20)
     
@@ -3030,12 +2152,7 @@ if analysis_mode == "👔 SM Özet":
     
     if selected_sm_option and selected_periods:
         # ⚡ SÜPER HIZLI - Supabase VIEW'den direkt özet veri
-        region_df = get_sm_summary_from_view(
-            satis_muduru=selected_sm, 
-            donemler=selected_periods,
-            tarih_baslangic=tarih_baslangic,
-            tarih_bitis=tarih_bitis
-        )
+        region_df, rollup_cube = get_summary_with_cube(selected_sm, tuple(selected_periods), tarih_baslangic, tarih_bitis)
         
         if len(region_df) == 0:
             st.warning("Seçilen kriterlere uygun veri bulunamadı")
@@ -3063,25 +2180,14 @@ if analysis_mode == "👔 SM Özet":
             if len(region_df) == 0:
                 st.warning("Analiz edilecek mağaza bulunamadı!")
             else:
-                # Bölge toplamları
-                toplam_satis = region_df['Satış'].sum()
-                toplam_fark = region_df['Fark'].sum()
-                toplam_fire = region_df['Fire'].sum()
-                toplam_acik = region_df['Toplam Açık'].sum()
-                toplam_gun = region_df['Gün'].sum()
-                
-                # Oranlar
-                fark_oran = abs(toplam_fark) / toplam_satis * 100 if toplam_satis > 0 else 0
-                fire_oran = abs(toplam_fire) / toplam_satis * 100 if toplam_satis > 0 else 0
-                toplam_oran = abs(toplam_acik) / toplam_satis * 100 if toplam_satis > 0 else 0
-                gunluk_fark = toplam_fark / toplam_gun if toplam_gun > 0 else 0
-                gunluk_fire = toplam_fire / toplam_gun if toplam_gun > 0 else 0
-                
-                # Risk dağılımı
-                kritik_sayisi = len(region_df[region_df['Risk'] == '🔴 KRİTİK'])
-                riskli_sayisi = len(region_df[region_df['Risk'] == '🟠 RİSKLİ'])
-                dikkat_sayisi = len(region_df[region_df['Risk'] == '🟡 DİKKAT'])
-                temiz_sayisi = len(region_df[region_df['Risk'] == '🟢 TEMİZ'])
+                # Bölge toplamları ve risk dağılımı (dönem küpünden)
+                toplamlar = cube_totals(rollup_cube)
+                toplam_satis, toplam_fark = toplamlar['satis'], toplamlar['fark']
+                toplam_fire, toplam_acik = toplamlar['fire'], toplamlar['acik']
+                fark_oran, fire_oran, toplam_oran = toplamlar['fark_oran'], toplamlar['fire_oran'], toplamlar['toplam_oran']
+                gunluk_fark, gunluk_fire = toplamlar['gunluk_fark'], toplamlar['gunluk_fire']
+                kritik_sayisi, riskli_sayisi = toplamlar['kritik'], toplamlar['riskli']
+                dikkat_sayisi, temiz_sayisi = toplamlar['dikkat'], toplamlar['temiz']
                 
                 # Üst metrikler
                 st.markdown("### 💰 Özet Metrikler")
@@ -3151,6 +2257,9 @@ if analysis_mode == "👔 SM Özet":
                 
                 # Sekmeler - Bölge Özeti ile aynı
                 st.markdown("---")
+                # 📈 Çok dönemli trend (VIEW satırlarından, ek sorgu yok)
+                render_trend_section(region_df, selected_periods)
+                
                 tabs = st.tabs(["📋 Sıralama", "🔴 Kritik", "🟠 Riskli", "🚬 Sigara", "🔍 Mağaza Detay", "📥 İndir"])
                 
                 with tabs[0]:
@@ -3449,12 +2558,7 @@ elif analysis_mode == "🌍 GM Özet":
     
     if selected_periods:
         # ⚡ SÜPER HIZLI - Supabase VIEW'den direkt özet veri (TÜM SM'ler)
-        region_df = get_sm_summary_from_view(
-            satis_muduru=None, 
-            donemler=selected_periods,
-            tarih_baslangic=gm_tarih_baslangic,
-            tarih_bitis=gm_tarih_bitis
-        )
+        region_df, rollup_cube = get_summary_with_cube(None, tuple(selected_periods), gm_tarih_baslangic, gm_tarih_bitis)
         
         if len(region_df) == 0:
             st.warning("Seçilen döneme ait veri bulunamadı")
@@ -3473,9 +2577,9 @@ elif analysis_mode == "🌍 GM Özet":
             if 'SM' not in region_df.columns:
                 region_df['SM'] = region_df['Satış Müdürü']
             
-            # SM ve BS agregasyonları
-            sm_df = aggregate_by_group(region_df, 'SM') if 'SM' in region_df.columns else pd.DataFrame()
-            bs_df = aggregate_by_group(region_df, 'BS') if 'BS' in region_df.columns else pd.DataFrame()
+            # SM ve BS agregasyonları (dönem küpünden dilim)
+            sm_df = cube_slice(rollup_cube, 'SM')
+            bs_df = cube_slice(rollup_cube, 'BS')
             
             # ⚡ Risk puanına göre sırala (yüksekten düşüğe)
             region_df = region_df.sort_values('Risk Puan', ascending=False)
@@ -3483,31 +2587,17 @@ elif analysis_mode == "🌍 GM Özet":
             if len(region_df) == 0:
                 st.error("Analiz edilecek mağaza bulunamadı!")
             else:
-                # Bölge toplamları
-                toplam_satis = region_df['Satış'].sum()
-                toplam_fark = region_df['Fark'].sum()
-                toplam_fire = region_df['Fire'].sum()
-                toplam_acik = region_df['Toplam Açık'].sum()
-                toplam_gun = region_df['Gün'].sum()
+                # Bölge toplamları ve risk dağılımı (dönem küpünden)
+                toplamlar = cube_totals(rollup_cube)
+                toplam_satis, toplam_fark = toplamlar['satis'], toplamlar['fark']
+                toplam_fire, toplam_acik = toplamlar['fire'], toplamlar['acik']
+                fark_oran, fire_oran, toplam_oran = toplamlar['fark_oran'], toplamlar['fire_oran'], toplamlar['toplam_oran']
+                gunluk_fark, gunluk_fire = toplamlar['gunluk_fark'], toplamlar['gunluk_fire']
+                kritik_sayisi, riskli_sayisi = toplamlar['kritik'], toplamlar['riskli']
+                dikkat_sayisi, temiz_sayisi = toplamlar['dikkat'], toplamlar['temiz']
                 
-                # Oranlar
-                fark_oran = abs(toplam_fark) / toplam_satis * 100 if toplam_satis > 0 else 0
-                fire_oran = abs(toplam_fire) / toplam_satis * 100 if toplam_satis > 0 else 0
-                toplam_oran = abs(toplam_acik) / toplam_satis * 100 if toplam_satis > 0 else 0
-                gunluk_fark = toplam_fark / toplam_gun if toplam_gun > 0 else 0
-                gunluk_fire = toplam_fire / toplam_gun if toplam_gun > 0 else 0
-                
-                # Risk sayıları
-                kritik_sayisi = len(region_df[region_df['Risk'].str.contains('KRİTİK')])
-                riskli_sayisi = len(region_df[region_df['Risk'].str.contains('RİSKLİ')])
-                dikkat_sayisi = len(region_df[region_df['Risk'].str.contains('DİKKAT')])
-                temiz_sayisi = len(region_df[region_df['Risk'].str.contains('TEMİZ')])
-                
-                # 10TL Özet (VIEW: Kasa Adet/Tutar, analyze_region: 10TL Adet/Tutar)
-                kasa_adet_col = 'Kasa Adet' if 'Kasa Adet' in region_df.columns else '10TL Adet'
-                kasa_tutar_col = 'Kasa Tutar' if 'Kasa Tutar' in region_df.columns else '10TL Tutar'
-                toplam_10tl_adet = region_df[kasa_adet_col].sum() if kasa_adet_col in region_df.columns else 0
-                toplam_10tl_tutar = region_df[kasa_tutar_col].sum() if kasa_tutar_col in region_df.columns else 0
+                # 10TL Özet
+                toplam_10tl_adet, toplam_10tl_tutar = toplamlar['kasa_adet'], toplamlar['kasa_tutar']
                 
                 # ========== GÖRÜNÜM ==========
                 st.markdown("---")
@@ -3534,6 +2624,9 @@ elif analysis_mode == "🌍 GM Özet":
                 r4.markdown(f'<div class="risk-temiz">🟢 TEMİZ: {temiz_sayisi}</div>', unsafe_allow_html=True)
                 
                 # Sekmeler
+                # 📈 Çok dönemli trend (VIEW satırlarından, ek sorgu yok)
+                render_trend_section(region_df, selected_periods)
+                
                 tabs = st.tabs(["👔 SM Özet", "📋 BS Özet", "🏪 Mağazalar", "📊 Top 10", "🚬 Sigara", "🔍 Mağaza Detay", "📥 İndir"])
                 
                 with tabs[0]:
@@ -3832,6 +2925,14 @@ elif uploaded_file is not None:
         df_raw = pd.read_excel(uploaded_file, sheet_name=best_sheet)
         st.success(f"✅ {len(df_raw)} satır, {len(df_raw.columns)} sütun ({best_sheet})")
         
+        # Yeni dosya → yeni veri damgası (bölge özellik cache'i bu damgaya bağlı)
+        dosya_kimligi = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('upload_file_key') != dosya_kimligi:
+            st.session_state.upload_file_key = dosya_kimligi
+            st.session_state.df_upload_loaded_at = datetime.now()
+            st.session_state.pop('region_features', None)
+            st.session_state.pop('region_cube', None)
+        
         # ===== ARKA PLANDA SUPABASE'E KAYIT =====
         with st.spinner("Veritabanına kaydediliyor..."):
             try:
@@ -3844,7 +2945,19 @@ elif uploaded_file is not None:
                 # Supabase hatası analizi engellemesin
                 st.warning(f"⚠️ Veritabanı kaydı atlandı: {str(e)[:50]}")
         
-        df = analyze_inventory(df_raw)
+        # ===== ÜRÜN MASTER GÜNCELLEME =====
+        # Sigara/kasa bayrakları ve ürün adı parse'ı kod başına 1 kez, analiz master'dan okur
+        try:
+            master_yazim = {}
+            st.session_state.urun_master = upsert_product_master(df_raw, get_urun_master(), supabase_client=supabase,
+                                                                 sonuc=master_yazim)
+            if master_yazim.get('hatali_kayitlar'):
+                st.warning(f"⚠️ {len(master_yazim['hatali_kayitlar']):,} ürün master satırı Supabase'e yazılamadı: "
+                           f"{master_yazim['hatalar'][0][:100]}")
+        except Exception as e:
+            st.warning(f"⚠️ Ürün master güncellenemedi: {str(e)[:50]}")
+        
+        df = analyze_inventory(df_raw, master=st.session_state.get('urun_master'))
         
         # Mağaza bilgisi
         if 'Mağaza Kodu' in df.columns:
@@ -3869,6 +2982,7 @@ elif uploaded_file is not None:
         
         # ========== BÖLGE ÖZETİ MODU ==========
         if analysis_mode == "🌍 Bölge Özeti":
+            bolge_filtre = ()
             # Tarih aralığı filtresi (opsiyonel)
             if 'Envanter Tarihi' in df.columns:
                 try:
@@ -3903,6 +3017,7 @@ elif uploaded_file is not None:
                                 df = df[(df['Envanter Tarihi'].dt.date >= bolge_tarih_bas) & 
                                        (df['Envanter Tarihi'].dt.date <= bolge_tarih_bit)]
                                 magazalar = df['Mağaza Kodu'].dropna().unique().tolist()
+                                bolge_filtre = (bolge_tarih_bas, bolge_tarih_bit)
                                 st.info(f"📆 Filtre: {bolge_tarih_bas.strftime('%d.%m.%Y')} - {bolge_tarih_bit.strftime('%d.%m.%Y')} | {len(magazalar)} mağaza")
                 except:
                     pass
@@ -3910,7 +3025,13 @@ elif uploaded_file is not None:
             st.subheader(f"🌍 Bölge Özeti - {len(magazalar)} Mağaza")
             
             with st.spinner("Tüm mağazalar analiz ediliyor..."):
-                region_df = analyze_region(df, kasa_kodlari)
+                region_features = get_region_features(
+                    df, kasa_kodlari, st.session_state.get('df_upload_loaded_at'), bolge_filtre
+                )
+            
+            # ⚖️ What-if: ağırlık değişince sadece puanlama tekrarlanır
+            risk_config = render_risk_weight_editor(region_features)
+            region_df = score_region(region_features, risk_config)
             
             # ⚡ Risk puanına göre sırala (yüksekten düşüğe)
             if len(region_df) > 0:
@@ -3919,25 +3040,15 @@ elif uploaded_file is not None:
             if len(region_df) == 0:
                 st.warning("Analiz edilecek mağaza bulunamadı!")
             else:
-                # Bölge toplamları
-                toplam_satis = region_df['Satış'].sum()
-                toplam_fark = region_df['Fark'].sum()  # Fark + Kısmi
-                toplam_fire = region_df['Fire'].sum()
-                toplam_acik = region_df['Toplam Açık'].sum()  # Fark + Fire
-                toplam_gun = region_df['Gün'].sum()
-                
-                # Oranlar
-                fark_oran = abs(toplam_fark) / toplam_satis * 100 if toplam_satis > 0 else 0
-                fire_oran = abs(toplam_fire) / toplam_satis * 100 if toplam_satis > 0 else 0
-                toplam_oran = abs(toplam_acik) / toplam_satis * 100 if toplam_satis > 0 else 0
-                gunluk_fark = toplam_fark / toplam_gun if toplam_gun > 0 else 0
-                gunluk_fire = toplam_fire / toplam_gun if toplam_gun > 0 else 0
-                
-                # Risk dağılımı
-                kritik_sayisi = len(region_df[region_df['Risk'].str.contains('KRİTİK')])
-                riskli_sayisi = len(region_df[region_df['Risk'].str.contains('RİSKLİ')])
-                dikkat_sayisi = len(region_df[region_df['Risk'].str.contains('DİKKAT')])
-                temiz_sayisi = len(region_df[region_df['Risk'].str.contains('TEMİZ')])
+                # Bölge toplamları (Fark = Fark + Kısmi, Toplam = Fark + Fire) - puanlanmış mağazaların küpünden
+                rollup_cube = get_region_cube(region_features, region_df, risk_config)
+                toplamlar = cube_totals(rollup_cube)
+                toplam_satis, toplam_fark = toplamlar['satis'], toplamlar['fark']
+                toplam_fire, toplam_acik = toplamlar['fire'], toplamlar['acik']
+                fark_oran, fire_oran, toplam_oran = toplamlar['fark_oran'], toplamlar['fire_oran'], toplamlar['toplam_oran']
+                gunluk_fark, gunluk_fire = toplamlar['gunluk_fark'], toplamlar['gunluk_fire']
+                kritik_sayisi, riskli_sayisi = toplamlar['kritik'], toplamlar['riskli']
+                dikkat_sayisi, temiz_sayisi = toplamlar['dikkat'], toplamlar['temiz']
                 
                 # Üst metrikler
                 col1, col2, col3, col4 = st.columns(4)
@@ -4367,12 +3478,18 @@ elif uploaded_file is not None:
                     if st.button("🗜️ Tüm Mağazaları Hazırla (ZIP)"):
                         with st.spinner("Raporlar hazırlanıyor..."):
                             zip_buffer = BytesIO()
+                            # Tüm mağazaların tespitleri tek geçişte, veri mağaza bazında 1 kez bölünür
+                            # Ürün adları da tüm dosya için 1 kez parse edilir (aile analizi için)
+                            store_results = detect_all_stores(df, kasa_kodlari=kasa_kodlari)
+                            store_groups = dict(tuple(add_name_features(df).groupby('Mağaza Kodu', sort=False)))
+                            store_summaries = executive_summaries_by_store(df, kasa_summary_by_store(df, kasa_kodlari))
                             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
                                 for mag in magazalar:
-                                    df_mag = df[df['Mağaza Kodu'] == mag].copy()
+                                    df_mag = store_groups[mag]
                                     mag_adi = df_mag['Mağaza Adı'].iloc[0] if 'Mağaza Adı' in df_mag.columns and len(df_mag) > 0 else ''
+                                    mag_sonuc = store_results[mag]
                                 
-                                    int_df = detect_internal_theft(df_mag)
+                                    int_df = mag_sonuc['internal_df']
                                     
                                     # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
                                     if len(int_df) > 0:
@@ -4382,19 +3499,22 @@ elif uploaded_file is not None:
                                         except:
                                             pass
                                     
-                                    chr_df = detect_chronic_products(df_mag)
-                                    chr_fire_df = detect_chronic_fire(df_mag)
-                                    cig_df = detect_cigarette_shortage(df_mag)
-                                    ext_df = detect_external_theft(df_mag)
-                                    fam_df = find_product_families(df_mag)
-                                    fire_df = detect_fire_manipulation(df_mag)
-                                    kasa_df, kasa_sum = check_kasa_activity_products(df_mag, kasa_kodlari)
+                                    chr_df = mag_sonuc['chronic_df']
+                                    chr_fire_df = mag_sonuc['chronic_fire_df']
+                                    cig_df = mag_sonuc['cigarette_df']
+                                    ext_df = mag_sonuc['external_df']
+                                    fam_df = mag_sonuc['family_df']
+                                    fire_df = mag_sonuc['fire_manip_df']
+                                    kasa_df, kasa_sum = mag_sonuc['kasa_df'], mag_sonuc['kasa_summary']
                                 
                                     int_codes = set(int_df['Malzeme Kodu'].astype(str).tolist()) if len(int_df) > 0 else set()
                                     chr_codes = set(chr_df['Malzeme Kodu'].astype(str).tolist()) if len(chr_df) > 0 else set()
                                 
                                     t20_df = create_top_20_risky(df_mag, int_codes, chr_codes, set())
-                                    exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
+                                    if mag in store_summaries:
+                                        exec_c, grp_s = store_summaries[mag]
+                                    else:
+                                        exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
                                 
                                     excel_data = create_excel_report(
                                         df_mag, int_df, chr_df, chr_fire_df, cig_df,
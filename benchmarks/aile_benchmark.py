@@ -0,0 +1,157 @@
+# ==================== ÜRÜN AİLESİ BENCHMARK ====================
+# find_product_families: eski satır satır tarama vs blok indeksi
+# Kullanım: python benchmarks/aile_benchmark.py [satır_sayısı]
+# Aynı sentetik mağaza verisinde iki sürümün sonucu birebir karşılaştırılır
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from envanter_engine import (
+    find_product_families, get_first_two_words, get_last_word,
+    extract_quantity, is_quantity_similar,
+)
+
+
+def eski_find_product_families(df):
+    """Blok indeksinden önceki sürüm (her satır için tam tablo mask + iterrows)"""
+    df_copy = df.copy()
+    df_copy['İlk2Kelime'] = df_copy['Malzeme Adı'].apply(get_first_two_words)
+    df_copy['Marka'] = df_copy['Malzeme Adı'].apply(get_last_word)
+    df_copy['Gramaj'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[0])
+    df_copy['GramajBirim'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[1])
+
+    families = []
+    processed_indices = set()
+
+    for idx, row in df_copy.iterrows():
+        if idx in processed_indices:
+            continue
+
+        ilk2 = row['İlk2Kelime']
+        marka = row['Marka']
+        urun_grubu = row['Ürün Grubu']
+        gramaj = row['Gramaj']
+        birim = row['GramajBirim']
+
+        if not ilk2 or not marka:
+            continue
+
+        family_mask = (
+            (df_copy['İlk2Kelime'] == ilk2) &
+            (df_copy['Marka'] == marka) &
+            (df_copy['Ürün Grubu'] == urun_grubu)
+        )
+        potential_family = df_copy[family_mask]
+
+        if len(potential_family) <= 1:
+            continue
+
+        family_members = []
+        for fam_idx, fam_row in potential_family.iterrows():
+            if is_quantity_similar(gramaj, birim, fam_row['Gramaj'], fam_row['GramajBirim']):
+                family_members.append(fam_idx)
+                processed_indices.add(fam_idx)
+
+        if len(family_members) <= 1:
+            continue
+
+        family_df = df_copy.loc[family_members]
+
+        toplam_fark = family_df['Fark Miktarı'].sum()
+        toplam_kismi = family_df['Kısmi Envanter Miktarı'].sum()
+        toplam_onceki = family_df['Önceki Fark Miktarı'].sum()
+        aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
+
+        if family_df['Fark Miktarı'].abs().sum() > 0:
+            if abs(aile_toplami) <= 2:
+                sonuc = "KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL"
+                risk = "DÜŞÜK"
+            elif aile_toplami < -2:
+                sonuc = "AİLEDE NET AÇIK VAR"
+                risk = "ORTA"
+            else:
+                sonuc = "AİLEDE FAZLA VAR"
+                risk = "DÜŞÜK"
+
+            urunler = family_df['Malzeme Adı'].tolist()
+            farklar = family_df['Fark Miktarı'].tolist()
+
+            families.append({
+                'Mal Grubu': urun_grubu,
+                'İlk 2 Kelime': ilk2,
+                'Marka': marka,
+                'Ürün Sayısı': len(family_members),
+                'Toplam Fark': toplam_fark,
+                'Toplam Kısmi': toplam_kismi,
+                'Toplam Önceki': toplam_onceki,
+                'AİLE TOPLAMI': aile_toplami,
+                'Sonuç': sonuc,
+                'Risk': risk,
+                'Ürünler': ' | '.join([f"{u[:25]}({f})" for u, f in zip(urunler[:5], farklar[:5])])
+            })
+
+    result_df = pd.DataFrame(families)
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
+
+    return result_df
+
+
+def ornek_magaza(satir=40000, seed=42):
+    """Sentetik tek mağaza verisi - gerçekçi aile yoğunluğu (aynı ürünün renk/gramaj varyantları)"""
+    rng = np.random.default_rng(seed)
+    kelimeler = ['SIVI', 'TOZ', 'ULTRA', 'KREM', 'JEL', 'GOFRET', 'KOLA', 'SABUN', 'ŞAMPUAN', 'ÇİKOLATA',
+                 'DETERJAN', 'YUMUŞATICI', 'MAKARNA', 'BİSKÜVİ', 'SU', 'MEYVE', 'SÜT', 'PEYNİR']
+    markalar = ['PRIL', 'DOMESTOS', 'ÜLKER', 'ETİ', 'COCA', 'FAIRY', 'OMO', 'ELVAN', 'PINAR', 'SEK',
+                'TORKU', 'DALAN', 'ARKO', 'NESTLE', 'SOLO']
+    varyantlar = ['MAVİ', 'LİMON', 'ELMA', 'LAVANTA', 'SADE', 'KAKAOLU', 'ÇİLEK', '']
+    gramajlar = ['250ML', '500 ML', '750ML', '1L', '1,5 LT', '2.5L', '90G', '220 GR', '400G', '1KG', '3 KG', '']
+    gruplar = [f'GRUP {i}' for i in range(40)]
+
+    n_sablon = max(satir // 6, 1)
+    sablon = pd.DataFrame({
+        'ilk2': [f"{a} {b}" for a, b in zip(rng.choice(kelimeler, n_sablon), rng.choice(kelimeler, n_sablon))],
+        'marka': rng.choice(markalar, n_sablon),
+        'grup': rng.choice(gruplar, n_sablon),
+    })
+    s = sablon.iloc[rng.integers(0, n_sablon, satir)].reset_index(drop=True)
+    adlar = (s['ilk2'] + ' ' + pd.Series(rng.choice(varyantlar, satir)) + ' ' +
+             pd.Series(rng.choice(gramajlar, satir)) + ' ' + s['marka']).str.replace(r'\s+', ' ', regex=True)
+
+    return pd.DataFrame({
+        'Malzeme Kodu': np.arange(10000000, 10000000 + satir).astype(str),
+        'Malzeme Adı': adlar,
+        'Ürün Grubu': s['grup'],
+        'Fark Miktarı': rng.integers(-6, 5, satir).astype(float),
+        'Kısmi Envanter Miktarı': rng.integers(-2, 2, satir).astype(float),
+        'Önceki Fark Miktarı': rng.integers(-3, 3, satir).astype(float),
+    })
+
+
+def main():
+    satir = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    df = ornek_magaza(satir)
+    print(f"Satır: {len(df):,}")
+
+    t = time.perf_counter()
+    yeni = find_product_families(df)
+    t_yeni = time.perf_counter() - t
+    print(f"Blok indeksi : {t_yeni:8.2f} sn  ({len(yeni):,} aile)")
+
+    t = time.perf_counter()
+    eski = eski_find_product_families(df)
+    t_eski = time.perf_counter() - t
+    print(f"Eski tarama  : {t_eski:8.2f} sn  ({len(eski):,} aile)")
+
+    pd.testing.assert_frame_equal(eski, yeni)
+    print(f"Sonuçlar birebir aynı - {t_eski / t_yeni:.0f}x hızlı")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# ==================== KAYIT SERİLEŞTİRME BENCHMARK ====================
+# save_to_supabase kayıt hazırlığı: eski iterrows + isinstance döngüsü vs serialize_records
+# Kullanım: python benchmarks/kayit_serilestirme_benchmark.py [satır_sayısı]
+# Excel'den okunmuş gibi sentetik veri: tarih, NaN'lı tutarlar, Türkçe ondalık metinler (sürekli)
+
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import serialize_records
+
+METIN = ['Mağaza Kodu', 'Mağaza Tanım', 'Satış Müdürü', 'Bölge Sorumlusu', 'Depolama Koşulu Grubu',
+         'Envanter Dönemi', 'Mal Grubu Tanımı', 'Malzeme Kodu', 'Malzeme Tanımı']
+TARIH = ['Envanter Tarihi', 'Envanter Başlangıç Tarihi']
+SAYI = ['Satış Fiyatı', 'Sayım Miktarı', 'Sayım Tutarı', 'Kaydi Miktar', 'Kaydi Tutar', 'Fark Miktarı',
+        'Fark Tutarı', 'Fire Miktarı', 'Fire Tutarı', 'Satış Miktarı', 'Satış Hasılatı', 'İptal Satır Miktarı']
+ONDALIK = ['İade Miktarı', 'İade Tutarı']  # Excel'den metin olarak gelen "12,5" gibi değerler
+MAPPING = {c: c.lower().replace(' ', '_') for c in METIN + TARIH + SAYI + ONDALIK}
+
+
+def veri(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: np.array([f"{c[:3]}-{i}" for i in range(5000)], dtype=object)[rng.integers(0, 5000, n)]
+                       for c in METIN})
+    for c in TARIH:
+        df[c] = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    for c in SAYI:
+        x = rng.normal(size=n) * 100
+        x[rng.random(n) < 0.2] = np.nan
+        df[c] = x
+    for c in ONDALIK:
+        df[c] = np.array([' 0,0', '12,5 ', '-3,25', '7', ''], dtype=object)[rng.integers(0, 5, n)]
+    return df
+
+
+def eski_kayitlar(df, mapping, parse_decimals=False):
+    """Önceki sürüm: satır satır iterrows + değer bazlı isinstance (sürekli'de değer başına regex)"""
+    records = []
+    for _, row in df.iterrows():
+        record = {}
+        for excel_col, db_col in mapping.items():
+            if excel_col in row.index:
+                val = row[excel_col]
+                if pd.isna(val):
+                    val = None
+                elif isinstance(val, pd.Timestamp):
+                    val = val.strftime('%Y-%m-%d')
+                elif isinstance(val, (np.integer, np.int64)):
+                    val = int(val)
+                elif isinstance(val, (np.floating, np.float64)):
+                    val = float(val) if not np.isnan(val) else None
+                elif parse_decimals and isinstance(val, str):
+                    val = val.strip()
+                    if re.match(r'^-?\d+,\d+$', val):
+                        val = float(val.replace(',', '.'))
+                record[db_col] = val
+        records.append(record)
+    return records
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = veri(n)
+    print(f"{n:,} satır, {len(MAPPING)} kolon")
+    for etiket, parse in (('envanter (app)', False), ('sürekli (Türkçe ondalık)', True)):
+        t = time.perf_counter()
+        eski = eski_kayitlar(df, MAPPING, parse)
+        t_eski = time.perf_counter() - t
+        t = time.perf_counter()
+        yeni = serialize_records(df, MAPPING, parse_decimals=parse)
+        t_yeni = time.perf_counter() - t
+        assert eski == yeni, "çıktılar farklı"
+        print(f"{etiket:26s}: iterrows {t_eski:6.2f} sn  serialize_records {t_yeni:5.2f} sn  "
+              f"({t_eski / t_yeni:.0f}x)")
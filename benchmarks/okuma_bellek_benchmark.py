@@ -0,0 +1,105 @@
+# ==================== TOPLU OKUMA BELLEK BENCHMARK ====================
+# get_data_from_supabase birikimi: eski dict listesi + tek DataFrame vs sayfa başına tipli parça
+# Kullanım: python benchmarks/okuma_bellek_benchmark.py [satır_sayısı]
+# Her yöntem ayrı süreçte çalışır, tepe RSS (ru_maxrss) karşılaştırılır
+# Sayfalar sahte bir PostgREST istemcisinden JSON decode edilmiş gibi (dict listesi) üretilir
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import fetch_keyset, fetch_keyset_frame
+
+KOLONLAR = [
+    'magaza_kodu', 'magaza_tanim', 'satis_muduru', 'bolge_sorumlusu',
+    'depolama_kosulu_grubu', 'depolama_kosulu', 'envanter_donemi', 'envanter_tarihi', 'envanter_baslangic_tarihi',
+    'mal_grubu_tanimi', 'malzeme_kodu', 'malzeme_tanimi', 'satis_fiyati',
+    'fark_miktari', 'fark_tutari', 'kismi_envanter_miktari', 'kismi_envanter_tutari',
+    'fire_miktari', 'fire_tutari', 'onceki_fark_miktari', 'onceki_fire_miktari',
+    'satis_miktari', 'satis_hasilati', 'iptal_satir_miktari',
+]
+SAYI = set(KOLONLAR[12:])
+MAPPING = {c: c.upper() for c in KOLONLAR}
+
+
+class _Sonuc:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Sorgu:
+    """id > son_id ORDER BY id LIMIT n sorgusunu taklit eder; satırlar istek anında üretilir"""
+
+    def __init__(self, n):
+        self.n, self.alt, self.limit_ = n, 0, 1000
+
+    def select(self, cols):
+        return self
+
+    def gt(self, col, value):
+        self.alt = value
+        return self
+
+    def order(self, col):
+        return self
+
+    def limit(self, n):
+        self.limit_ = n
+        return self
+
+    def execute(self):
+        ids = range(self.alt + 1, min(self.alt + self.limit_, self.n) + 1)
+        return _Sonuc([_satir(i) for i in ids])
+
+
+class _Istemci:
+    def __init__(self, n):
+        self.n = n
+
+    def table(self, name):
+        return _Sorgu(self.n)
+
+
+def _satir(i):
+    row = {c: (float(i % 97) * 1.5 if c in SAYI else f"{c[:4]}-{i % 5000}") for c in KOLONLAR}
+    row['id'] = i
+    return row
+
+
+def eski_okuma(client):
+    """Önceki sürüm: tüm sayfalar dict listesinde birikir, sonda DataFrame + rename"""
+    all_data = fetch_keyset(client, 'envanter_veri', ','.join(KOLONLAR))
+    return pd.DataFrame(all_data).rename(columns=MAPPING)
+
+
+def yeni_okuma(client):
+    return fetch_keyset_frame(client, 'envanter_veri', ','.join(KOLONLAR), column_mapping=MAPPING)
+
+
+def _calistir(yontem, n):
+    client = _Istemci(n)
+    t = time.perf_counter()
+    df = (eski_okuma if yontem == 'eski' else yeni_okuma)(client)
+    sure = time.perf_counter() - t
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB → MB
+    print(f"{len(df)} {sure:.2f} {rss:.0f} {df.memory_usage(deep=True).sum() / 1e6:.0f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] in ('eski', 'yeni'):
+        _calistir(sys.argv[1], int(sys.argv[2]))
+        sys.exit(0)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    print(f"{n:,} satır, {len(KOLONLAR)} kolon")
+    for yontem in ('eski', 'yeni'):
+        out = subprocess.run([sys.executable, __file__, yontem, str(n)], capture_output=True, text=True, check=True)
+        satir, sure, rss, boyut = out.stdout.split()
+        print(f"{yontem:5s}: {int(satir):,} satır  {float(sure):.2f} sn  tepe RSS {rss} MB  (tablo {boyut} MB)")
@@ -0,0 +1,74 @@
+# ==================== TOPLU YAZMA BENCHMARK ====================
+# save_to_supabase yazma: eski sıralı 500'lük batch vs write_batches (boyut bazlı, eşzamanlı)
+# Kullanım: python benchmarks/toplu_yazma_benchmark.py [satır_sayısı] [rtt_ms]
+# Sahte istemci: istek başına rtt + gövde boyutuyla orantılı aktarım süresi (sleep, GIL'i bırakır)
+# Not: eşzamanlı istekler bant genişliğini paylaşmıyor varsayılır - hızlı bağlantıda gerçekçi
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import write_batches
+
+MB_SN = 10.0  # simüle edilen bant genişliği (MB/sn)
+
+
+class _Sorgu:
+    def __init__(self, istemci):
+        self.istemci, self.batch = istemci, None
+
+    def insert(self, batch, **kwargs):
+        self.batch = batch
+        return self
+
+    def execute(self):
+        boyut = len(json.dumps(self.batch))
+        time.sleep(self.istemci.rtt + boyut / (MB_SN * 1e6))
+        self.istemci.istek += 1
+        return self
+
+
+class _Istemci:
+    def __init__(self, rtt):
+        self.rtt, self.istek = rtt, 0
+
+    def table(self, name):
+        return _Sorgu(self)
+
+
+def kayitlar(n):
+    return [{
+        'magaza_kodu': str(5000 + i % 300), 'envanter_donemi': '202406', 'depolama_kosulu_grubu': 'Kuru',
+        'malzeme_kodu': str(10_000_000 + i), 'malzeme_tanimi': f"URUN {i % 9000} 500 G",
+        'envanter_tarihi': '2024-06-15', 'fark_tutari': round(i * 0.37 % 250, 2), 'fire_tutari': None,
+        'satis_hasilati': round(i * 1.7 % 9000, 2), 'satis_miktari': float(i % 40),
+    } for i in range(n)]
+
+
+def eski_yazma(client, records, batch_size=500):
+    """Önceki sürüm: sabit 500 satır, sıralı; hata alan batch atlanır"""
+    for i in range(0, len(records), batch_size):
+        try:
+            client.table('envanter_veri').insert(records[i:i + batch_size]).execute()
+        except Exception:
+            pass
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    records = kayitlar(n)
+    print(f"{n:,} satır, rtt {rtt * 1000:.0f} ms, {MB_SN:.0f} MB/sn")
+
+    client = _Istemci(rtt)
+    t = time.perf_counter()
+    eski_yazma(client, records)
+    sure = time.perf_counter() - t
+    print(f"eski : {sure:6.1f} sn  {client.istek:4d} istek  {n / sure:8,.0f} satır/sn")
+
+    client = _Istemci(rtt)
+    sonuc = write_batches(client, 'envanter_veri', records)
+    print(f"yeni : {sonuc['sure']:6.1f} sn  {client.istek:4d} istek  {sonuc['hiz']:8,.0f} satır/sn")
@@ -0,0 +1,77 @@
+# ==================== STAGING TOPLU YÜKLEME BENCHMARK ====================
+# Büyük yükleme: doğrudan write_batches(envanter_veri) + refresh vs staged_load (staging + tek RPC)
+# Kullanım: python benchmarks/toplu_yukleme_benchmark.py [satır_sayısı] [rtt_ms]
+# Supabase yerine supabase_yerel.YerelSupabase (SQLite) kullanılır; istek başına rtt simüle edilir
+# Sonuçların aynı olduğu, refresh'in bir kez yapıldığı ve tekrar yüklemenin atlandığı da kontrol edilir
+# Not: SQLite sunucu tarafı kazancı (UNLOGGED staging, index/trigger yok, ara refresh yok) göstermez,
+# süreler sadece istemci tarafı maliyetini karşılaştırır
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import write_batches, staged_load
+from supabase_yerel import YerelSupabase
+
+
+def kayitlar(n, n_magaza=200):
+    return [{
+        'magaza_kodu': str(5000 + i % n_magaza), 'envanter_donemi': '202406', 'depolama_kosulu_grubu': 'Kuru',
+        'malzeme_kodu': str(10_000_000 + i), 'malzeme_tanimi': f"URUN {i % 9000} 500 G",
+        'envanter_tarihi': '2024-06-15', 'fark_tutari': round(i * 0.37 % 250, 2), 'fire_tutari': None,
+        'satis_hasilati': round(i * 1.7 % 9000, 2), 'satis_miktari': float(i % 40),
+    } for i in range(n)]
+
+
+def icerik(client):
+    return sorted(
+        tuple(r.values()) for r in client.table('envanter_veri').select(
+            'magaza_kodu,malzeme_kodu,fark_tutari,fire_tutari,satis_hasilati'
+        ).execute().data
+    )
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    records = kayitlar(n)
+    print(f"{n:,} satır, rtt {rtt * 1000:.0f} ms")
+
+    # Doğrudan: batch'ler envanter_veri'ye, sonra refresh RPC'si
+    dogrudan = YerelSupabase(latency=rtt)
+    t = time.perf_counter()
+    sonuc = write_batches(dogrudan, 'envanter_veri', records)
+    dogrudan.rpc('refresh_magaza_ozet').execute()
+    print(f"doğrudan: {time.perf_counter() - t:6.1f} sn  {dogrudan.istek:4d} istek  "
+          f"{sonuc['yazilan']:,} satır")
+
+    # Staging: batch'ler staging'e, tek RPC ile birleştirme + refresh
+    staging = YerelSupabase(latency=rtt)
+    sonuc = staged_load(staging, records)
+    print(f"staging : {sonuc['sure']:6.1f} sn  {staging.istek:4d} istek  {sonuc['birlesen']:,} satır  "
+          f"(refresh {staging.refresh_sayisi}x)")
+
+    assert icerik(dogrudan) == icerik(staging), "envanter_veri içerikleri farklı"
+    assert staging.refresh_sayisi == 1
+    assert not staging.table('envanter_veri_staging').select('yukleme_id').limit(1).execute().data
+
+    # Tekrar gönderilen staging batch'i (aynı yukleme_id altında çift satır) tek kez birleşir
+    cift = YerelSupabase()
+    parca = [{**r, 'yukleme_id': 'cift'} for r in records[:500]]
+    cift.table('envanter_veri_staging').insert(parca).execute()
+    cift.table('envanter_veri_staging').insert(parca).execute()
+    assert cift.rpc('envanter_staging_birlestir', {'p_yukleme_id': 'cift'}).execute().data == 500
+
+    # Aynı envanterler tekrar yüklenirse sunucu tarafı kontrol hepsini atlar
+    assert staged_load(staging, records[:1000])['birlesen'] == 0
+
+    # Staging kurulu değilse staged_load hata verir (app.py doğrudan yazmaya düşer)
+    try:
+        staged_load(YerelSupabase(staging=False), records[:10])
+        hata = None
+    except Exception as e:
+        hata = e
+    assert hata is not None, "staging yokken hata beklenirdi"
+    print("kontroller tamam")
@@ -0,0 +1,1615 @@
+# ==================== ENVANTER TESPİT MOTORU ====================
+# Tek mağaza envanter risk tespitleri - kolon bazlı (vektörel) hesaplama
+# analyze_inventory → feature frame (1 kez) → dedektörler (boolean mask + np.select)
+# Çıktı tabloları app.py'deki eski dedektörlerle birebir aynıdır
+# (aynı kolonlar, aynı sıralama, aynı drop_duplicates davranışı)
+
+import copy
+import json
+import os
+import re
+
+import pandas as pd
+import numpy as np
+
+# ==================== SABİTLER ====================
+
+# 10 TL Ürünleri Ürün Kodları (209 adet)
+# Bu ürünlerde fiyat değişikliği olduğu için manipülasyon riski var
+KASA_AKTIVITESI_KODLARI = {
+    '25006448', '12002256', '12002046', '22001972', '12003295', '22002759', '22002500', '11002886', '22002215', '22002214',
+    '22002259', '22002349', '16002163', '22002717', '16001587', '13001073', '30000944', '18002488', '17003609', '22002296',
+    '22002652', '24004136', '24004137', '12003073', '22002328', '24005228', '24006215', '24005232', '24005231', '24006214',
+    '24006212', '16002332', '16002342', '23001397', '16002310', '24001063', '24004020', '13002613', '13002317', '13002506',
+    '16002285', '16002219', '16002286', '16002218', '13000258', '13000257', '13000256', '13000260', '13002533', '22002611',
+    '22002579', '13002559', '13000187', '13002904', '13000189', '13000190', '13002908', '13001872', '13001874', '30000838',
+    '30000926', '22002605', '22002604', '22002603', '12003241', '16002194', '16001734', '25005580', '25000237', '25000049',
+    '16002099', '23001367', '23001510', '23001177', '23001403', '23001278', '22002732', '22002576', '22002577', '25006483',
+    '23001240', '16002317', '30000958', '30000956', '24005155', '24005154', '24005156', '24005157', '24005153', '22000280',
+    '22002773', '22002774', '22002501', '22002225', '22000397', '22001395', '22000396', '16001859', '18002956', '17003542',
+    '16002338', '16002339', '16002341', '16002009', '16000856', '22002715', '16002235', '24006067', '24006069', '24006068',
+    '24006066', '22002686', '22002687', '22002688', '16002220', '24005291', '24005290', '24006078', '24006084', '24005288',
+    '24006082', '24006079', '24005289', '24006085', '22002763', '22002762', '22001032', '18003049', '24006126', '24004420',
+    '24005183', '24005649', '24005650', '14002481', '13002315', '22001229', '13002478', '30000880', '24005798', '24005796',
+    '24005799', '24005797', '24005795', '24006159', '24003492', '24006171', '24006170', '24006174', '24006172', '24006173',
+    '22002640', '22002553', '22002764', '22002223', '22002679', '22002221', '22002224', '22002572', '27002662', '24005441',
+    '24005897', '24005898', '24005900', '24006081', '24006080', '16002087', '22002282', '22002283', '24005893', '24005894',
+    '23001198', '23001439', '23001195', '23001199', '23000843', '23000034', '23001445', '23001444', '23001443', '23001522',
+    '24004381', '24005184', '23001534', '23001533', '18001591', '27002676', '27002677', '16001956', '24003287', '24000005',
+    '24002194', '24002192', '24002764', '24003872', '16001983', '18002969', '27001340', '27001148', '27001563', '24004354',
+    '24004196', '24004115', '14002424', '24003641', '24004972', '13001481', '24003327', '24000004', '23000122',
+}
+
+
+SIGARA_KOLONLARI = ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup']
+
+# Gramaj/ML kalıbı: 750ML, 750 ML, 1.5L, 1,5 LT, 220G, 220 G, 1KG
+GRAMAJ_PATTERN = re.compile(r'(\d+[.,]?\d*)\s*(ML|LT|L|G|GR|KG|MG)\b')
+
+# Ürün adından türetilen kolonlar (parse_product_names)
+ISIM_COLS = ['İlk2Kelime', 'Marka', 'Gramaj', 'GramajBirim']
+
+# Feature frame kolonları (analyze_inventory sonunda 1 kez hesaplanır)
+FEATURE_COLS = ['DENGELENMIS', 'FARK_KISMI_MIKTAR', 'FARK_ONCEKI_MIKTAR', 'FARK_KISMI_TUTAR',
+                'TOPLAM_TUTAR', 'SIGARA', 'KASA_AKTIVITESI', 'YUKSEK_FIYAT', 'KOD']
+
+# ==================== KURAL KONFİGÜRASYONU ====================
+# Tespit eşikleri weights.json → "detection_rules" altından okunur, eksik anahtarlar varsayılandan gelir
+
+DEFAULT_RULE_CONFIG = {
+    'dengelenme_toleransi': 0.01,
+    'ic_hirsizlik': {'min_satis_fiyati': 100, 'max_iptal_farki': 10, 'yuksek_fark': 2, 'orta_fark': 5},
+    'kronik_acik': {},
+    'kronik_fire': {},
+    'fire_manipulasyon': {},
+    'dis_hirsizlik': {'min_fark_tutari': 50},
+}
+
+
+def load_rule_config(path=None):
+    """Tespit kuralı eşiklerini yükle (varsayılanlar + weights.json detection_rules)"""
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.json')
+    config = copy.deepcopy(DEFAULT_RULE_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            dosya = json.load(f).get('detection_rules', {})
+    except Exception:
+        dosya = {}
+
+    for key, value in dosya.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+RULE_CONFIG = load_rule_config()
+
+# ==================== YARDIMCI FONKSİYONLAR ====================
+
+def _col(df, col, default=0):
+    """Kolonu döndür, yoksa default değerle dolu Series"""
+    if col in df.columns:
+        return df[col]
+    return pd.Series(default, index=df.index)
+
+
+def _urun_grubu(df):
+    """Ürün grubu: önce Mal Grubu Tanımı, yoksa Ürün Grubu"""
+    if 'Mal Grubu Tanımı' in df.columns:
+        return df['Mal Grubu Tanımı']
+    return _col(df, 'Ürün Grubu', '')
+
+
+def _build_result(columns):
+    """Kolon sözlüğünden sonuç tablosu oluştur (0..n index, tip çıkarımı ile)"""
+    data = {name: np.asarray(values) if not isinstance(values, pd.Series) else values.to_numpy()
+            for name, values in columns.items()}
+    return pd.DataFrame(data).infer_objects()
+
+
+def normalize_turkish(s):
+    """Türkçe karakterleri normalize et (büyük harf, İ→I, Ş→S ...)"""
+    s = s.fillna('').astype(str).str.upper()
+    return (s.str.replace('İ', 'I', regex=False)
+             .str.replace('Ş', 'S', regex=False)
+             .str.replace('Ğ', 'G', regex=False)
+             .str.replace('Ü', 'U', regex=False)
+             .str.replace('Ö', 'O', regex=False)
+             .str.replace('Ç', 'C', regex=False)
+             .str.replace('ı', 'I', regex=False))
+
+
+# Kategori değeri → SIGARA/TÜTÜN bayrağı (tüm çağrılar ve mağazalar arasında paylaşılır)
+# Kategori kolonlarında birkaç yüz tekil değer var, normalize işlemi sadece bunlara yapılır
+_SIGARA_KATEGORI_CACHE = {}
+
+
+def sigara_kategori_flags(values):
+    """Kategori kolonunun her satırı için SIGARA/TÜTÜN bayrağı (tekil değer bazlı, cache'li)"""
+    codes, uniq = pd.factorize(values)
+    yeni = [v for v in uniq if v not in _SIGARA_KATEGORI_CACHE]
+    if yeni:
+        flags = normalize_turkish(pd.Series(yeni, dtype=object)).str.contains(
+            'SIGARA|TUTUN', case=False, regex=True, na=False)
+        _SIGARA_KATEGORI_CACHE.update(zip(yeni, flags.tolist()))
+
+    # NaN (kod -1) → boş string → sigara değil
+    lookup = np.array([_SIGARA_KATEGORI_CACHE[v] for v in uniq] + [False], dtype=bool)
+    return lookup[codes]
+
+
+def sigara_mask(df):
+    """Kategori kolonlarında SIGARA veya TUTUN geçen satırlar (MAKARON tek başına dahil DEĞİL)"""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in SIGARA_KOLONLARI:
+        if col in df.columns:
+            mask |= sigara_kategori_flags(df[col])
+    return pd.Series(mask, index=df.index)
+
+
+def normalize_code(s):
+    """Malzeme kodunu string'e çevir, float'tan gelen .0'ı kaldır"""
+    return s.astype(str).str.replace('.0', '', regex=False).str.strip()
+
+
+# ==================== FEATURE FRAME ====================
+
+def build_feature_frame(df, kasa_kodlari=None, master=None):
+    """
+    Mağaza verisine dedektörlerin ortak kullandığı kolonları ekle
+    - DENGELENMIS: |Fark + Kısmi + Önceki| <= tolerans (0.01)
+    - FARK_KISMI_MIKTAR / FARK_ONCEKI_MIKTAR: net miktarlar
+    - FARK_KISMI_TUTAR / TOPLAM_TUTAR: net tutarlar
+    - SIGARA, KASA_AKTIVITESI, YUKSEK_FIYAT (>= 100 TL, config): bayraklar
+    - KOD: normalize malzeme kodu
+    master (urun_master) verilirse ürün adı kolonları oradan okunur (sadece master'da olmayan kodlar
+    için string işlemi yapılır); SIGARA satırın kategorisinden, kategori boşsa master'dan
+    """
+    if kasa_kodlari is None:
+        kasa_kodlari = KASA_AKTIVITESI_KODLARI
+
+    fark = df['Fark Miktarı']
+    onceki = df['Önceki Fark Miktarı']
+
+    toplam = df['TOPLAM_MIKTAR'] if 'TOPLAM_MIKTAR' in df.columns else fark + df['Kısmi Envanter Miktarı'] + onceki
+    kod = normalize_code(_col(df, 'Malzeme Kodu', ''))
+
+    features = pd.DataFrame({
+        'DENGELENMIS': toplam.abs() <= RULE_CONFIG['dengelenme_toleransi'],
+        'FARK_KISMI_MIKTAR': fark + df['Kısmi Envanter Miktarı'],
+        'FARK_ONCEKI_MIKTAR': fark + onceki,
+        'FARK_KISMI_TUTAR': df['Fark Tutarı'] + df['Kısmi Envanter Tutarı'],
+        'TOPLAM_TUTAR': df['Fark Tutarı'] + df['Kısmi Envanter Tutarı'] + df['Önceki Fark Tutarı'],
+        'SIGARA': _master_sigara(df, kod, master),
+        'KASA_AKTIVITESI': kod.isin(kasa_kodlari),
+        'YUKSEK_FIYAT': _col(df, 'Birim Fiyat').fillna(0) >= RULE_CONFIG['ic_hirsizlik']['min_satis_fiyati'],
+        'KOD': kod,
+    }, index=df.index)
+
+    if master is not None and 'Malzeme Adı' in df.columns:
+        features = pd.concat([features, _master_isim(df, kod, master)], axis=1)
+
+    df = df.drop(columns=[c for c in features.columns if c in df.columns])
+    return pd.concat([df, features], axis=1)
+
+
+def _master_sigara(df, kod, master):
+    """
+    SIGARA bayrağı: satırın kendi kategorisinden (sigara_mask, kategori değeri bazlı cache'li)
+    Master değeri sadece kategori kolonları boş olan satırlarda kullanılır - kategorisi değişen
+    ürün master'daki eski bayrağı taşımaz
+    """
+    sigara = sigara_mask(df).to_numpy()
+    if master is None or len(master) == 0:
+        return sigara
+
+    kategori_yok = np.ones(len(df), dtype=bool)
+    for col in SIGARA_KOLONLARI:
+        if col in df.columns:
+            kategori_yok &= (df[col].isna() | (df[col].astype(str).str.strip() == '')).to_numpy()
+    bos = kategori_yok & kod.isin(master.index).to_numpy()
+    if bos.any():
+        sigara[bos] = master['SIGARA'].reindex(kod[bos]).fillna(False).to_numpy(dtype=bool)
+    return sigara
+
+
+def _master_isim(df, kod, master):
+    """Ürün adı kolonları: master'dan, eksik kodlar için parse_product_names"""
+    bilinen = kod.isin(master.index).to_numpy() if len(master) else np.zeros(len(df), dtype=bool)
+    isim = master.reindex(kod.to_numpy())[ISIM_COLS].set_axis(df.index)
+    if not bilinen.all():
+        isim[~bilinen] = parse_product_names(df.loc[~bilinen, 'Malzeme Adı']).to_numpy()
+
+    # Satırın kendi adı boşsa master değeri kullanılmaz - parse_product_names ile aynı boş değerler
+    bos = df['Malzeme Adı'].isna().to_numpy() & bilinen
+    if bos.any():
+        isim.loc[bos, ['İlk2Kelime', 'Marka']] = ''
+        isim.loc[bos, 'Gramaj'] = np.nan
+        isim.loc[bos, 'GramajBirim'] = None
+    return isim
+
+
+def _ensure_features(df):
+    """Feature kolonları yoksa (analyze_inventory'den geçmemiş veri) hesapla"""
+    if all(c in df.columns for c in FEATURE_COLS):
+        return df
+    return build_feature_frame(df)
+
+
+# ==================== VERİ HAZIRLAMA ====================
+
+def analyze_inventory(df, master=None):
+    """Veriyi analiz için hazırla (master: opsiyonel ürün master tablosu)"""
+    df = df.copy()
+    
+    # DUPLICATE TEMİZLEME - Doğru key ile
+    # Aynı mağaza + dönem + depolama + malzeme sadece 1 kez olmalı
+    dup_key = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
+    dup_key = [c for c in dup_key if c in df.columns]
+    if dup_key:
+        # Envanter tarihi varsa en yeniyi tut
+        if 'Envanter Tarihi' in df.columns:
+            df['Envanter Tarihi'] = pd.to_datetime(df['Envanter Tarihi'], errors='coerce')
+            df = df.sort_values('Envanter Tarihi', ascending=False)
+        df = df.drop_duplicates(subset=dup_key, keep='first')
+    
+    col_mapping = {
+        'Mağaza Kodu': 'Mağaza Kodu',
+        'Mağaza Tanım': 'Mağaza Adı',
+        'Malzeme Kodu': 'Malzeme Kodu',
+        'Malzeme Tanımı': 'Malzeme Adı',
+        'Mal Grubu Tanımı': 'Ürün Grubu',
+        'Ürün Grubu Tanımı': 'Ana Grup',
+        'Fark Miktarı': 'Fark Miktarı',
+        'Fark Tutarı': 'Fark Tutarı',
+        'Kısmi Envanter Miktarı': 'Kısmi Envanter Miktarı',
+        'Kısmi Envanter Tutarı': 'Kısmi Envanter Tutarı',
+        'Önceki Fark Miktarı': 'Önceki Fark Miktarı',
+        'Önceki Fark Tutarı': 'Önceki Fark Tutarı',
+        'Önceki Fire Miktarı': 'Önceki Fire Miktarı',
+        'Önceki Fire Tutarı': 'Önceki Fire Tutarı',
+        'İptal Satır Miktarı': 'İptal Satır Miktarı',
+        'İptal Satır Tutarı': 'İptal Satır Tutarı',
+        'Fire Miktarı': 'Fire Miktarı',
+        'Fire Tutarı': 'Fire Tutarı',
+        'Satış Miktarı': 'Satış Miktarı',
+        'Satış Hasılatı': 'Satış Tutarı',
+        'Satış Fiyatı': 'Birim Fiyat',
+        'Fark+Fire+Kısmi Envanter Tutarı': 'NET_ENVANTER_ETKİ_TUTARI',
+        'Envanter Dönemi': 'Envanter Dönemi',
+        'Envanter Tarihi': 'Envanter Tarihi',
+    }
+    
+    for old_col, new_col in col_mapping.items():
+        if old_col in df.columns:
+            df[new_col] = df[old_col]
+    
+    numeric_cols = ['Fark Miktarı', 'Fark Tutarı', 'Kısmi Envanter Miktarı', 'Kısmi Envanter Tutarı',
+                    'Önceki Fark Miktarı', 'Önceki Fark Tutarı', 'İptal Satır Miktarı', 'İptal Satır Tutarı',
+                    'Fire Miktarı', 'Fire Tutarı', 'Satış Miktarı', 'Satış Tutarı', 'Önceki Fire Miktarı', 
+                    'Önceki Fire Tutarı', 'Birim Fiyat']
+    
+    for col in numeric_cols:
+        if col not in df.columns:
+            df[col] = 0
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    
+    if 'NET_ENVANTER_ETKİ_TUTARI' not in df.columns:
+        df['NET_ENVANTER_ETKİ_TUTARI'] = df['Fark Tutarı'] + df['Fire Tutarı'] + df['Kısmi Envanter Tutarı']
+    
+    df['TOPLAM_MIKTAR'] = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
+    
+    # Feature kolonları - tüm dedektörler bunları okur, satır bazlı tekrar hesap yok
+    df = build_feature_frame(df, master=master)
+    
+    return df
+
+
+# ==================== KURAL MOTORU ====================
+# Her kural: feature frame üzerinde vektörel bir ifade (df, eşikler) → boolean mask
+# Kurallar @kural ile kaydedilir, compile_rules() eşikleri config'den bağlar (1 kez)
+# Yeni kural = yeni fonksiyon; satır bazlı döngü eklenmez
+
+RULES = {}
+
+
+def kural(ad):
+    """Tespit kuralını registry'ye kaydet"""
+    def kaydet(fn):
+        RULES[ad] = fn
+        return fn
+    return kaydet
+
+
+def _dengesiz_fark_onceki(df, config):
+    """Önceki Fark + Fark dengelenmemiş (NaN dahil)"""
+    return ~(df['FARK_ONCEKI_MIKTAR'].abs() <= config['dengelenme_toleransi'])
+
+
+def _ic_hirsizlik_degerleri(df):
+    """İç hırsızlık kuralı ve sonuç tablosunun ortak değerleri: (Toplam, ||Toplam| - İptal|)"""
+    toplam = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
+    return toplam, (toplam.abs() - df['İptal Satır Miktarı']).abs()
+
+
+@kural('ic_hirsizlik')
+def _kural_ic_hirsizlik(df, config):
+    """Satış Fiyatı yüksek, dengelenmemiş açık ve |Toplam| ≈ İptal Satır"""
+    c = config['ic_hirsizlik']
+    toplam, fark_mutlak = _ic_hirsizlik_degerleri(df)
+    iptal = df['İptal Satır Miktarı']
+    return (
+        ~df['DENGELENMIS'] & (_col(df, 'Birim Fiyat').fillna(0) >= c['min_satis_fiyati']) &
+        ~(toplam >= 0) & ~(iptal <= 0) &
+        (fark_mutlak <= c['max_iptal_farki'])
+    )
+
+
+@kural('kronik_acik')
+def _kural_kronik_acik(df, config):
+    """Her iki dönemde de Fark < 0 ve dengelenmemiş"""
+    return ~df['DENGELENMIS'] & (df['Önceki Fark Miktarı'] < 0) & (df['Fark Miktarı'] < 0)
+
+
+@kural('kronik_fire')
+def _kural_kronik_fire(df, config):
+    """Her iki dönemde de fire var, Önceki Fark + Fark dengelenmemiş (eski `or 0` gibi NaN fire sayılır)"""
+    onceki_fire = _col(df, 'Önceki Fire Miktarı')
+    return (onceki_fire != 0) & (df['Fire Miktarı'] != 0) & _dengesiz_fark_onceki(df, config)
+
+
+@kural('fire_manipulasyon')
+def _kural_fire_manipulasyon(df, config):
+    """Fire var AMA Fark + Kısmi > 0 ve dengelenmemiş"""
+    return _dengesiz_fark_onceki(df, config) & (df['Fire Miktarı'] < 0) & (df['FARK_KISMI_MIKTAR'] > 0)
+
+
+@kural('dis_hirsizlik')
+def _kural_dis_hirsizlik(df, config):
+    """Açık var ama fire/iptal yok"""
+    c = config['dis_hirsizlik']
+    return (
+        ~df['DENGELENMIS'] &
+        (df['Fark Miktarı'] < 0) & (df['Fire Miktarı'] == 0) & (df['İptal Satır Miktarı'] == 0) &
+        (df['Fark Tutarı'].abs() > c['min_fark_tutari'])
+    )
+
+
+# Bölge özeti tarama kuralları: mağaza başına hızlı sayım (risk puanı eşikleri bu sayımlara göre)
+# Dedektör kurallarından gevşek (dengelenme / iptal kontrolü yok), eşikler aynı config'den
+
+@kural('bolge_ic_hirsizlik')
+def _kural_bolge_ic_hirsizlik(df, config):
+    """Satış Fiyatı yüksek ve Fark < 0"""
+    return (_col(df, 'Birim Fiyat').fillna(0) >= config['ic_hirsizlik']['min_satis_fiyati']) & (df['Fark Miktarı'] < 0)
+
+
+@kural('bolge_kronik_acik')
+def _kural_bolge_kronik_acik(df, config):
+    """Önceki Fark < 0 ve Fark < 0"""
+    return (df['Önceki Fark Miktarı'] < 0) & (df['Fark Miktarı'] < 0)
+
+
+@kural('bolge_kronik_fire')
+def _kural_bolge_kronik_fire(df, config):
+    """Önceki Fire < 0 ve Fire < 0"""
+    return (_col(df, 'Önceki Fire Miktarı') < 0) & (df['Fire Miktarı'] < 0)
+
+
+@kural('bolge_fire_manipulasyon')
+def _kural_bolge_fire_manipulasyon(df, config):
+    """|Fire| > |Fark + Kısmi|"""
+    return df['Fire Miktarı'].abs() > (df['Fark Miktarı'].fillna(0) + df['Kısmi Envanter Miktarı'].fillna(0)).abs()
+
+
+# Bölge özeti kolonu → tarama kuralı
+BOLGE_SAYIM_KURALLARI = {
+    'İç Hırs.': 'bolge_ic_hirsizlik',
+    'Kr.Açık': 'bolge_kronik_acik',
+    'Kr.Fire': 'bolge_kronik_fire',
+    'Fire Man.': 'bolge_fire_manipulasyon',
+}
+
+
+def compile_rules(config=None):
+    """
+    Kuralları eşiklerle bağla: {kural_adı: fn(df) → mask}
+    DENGELENMIS feature frame'de RULE_CONFIG toleransıyla hesaplanır - farklı config'le derlenen
+    kuralları, aynı config'le kurulmuş frame üzerinde çalıştırın
+    """
+    config = config or RULE_CONFIG
+    return {ad: (lambda df, fn=fn: fn(df, config)) for ad, fn in RULES.items()}
+
+
+COMPILED_RULES = compile_rules()
+
+
+def evaluate_rules(df, rules=None):
+    """Tüm kuralları tüm satırlar (tüm mağazalar) için tek seferde değerlendir → kural başına bool kolon"""
+    df = _ensure_features(df)
+    rules = rules or COMPILED_RULES
+    return pd.DataFrame({ad: fn(df) for ad, fn in rules.items()}, index=df.index)
+
+
+def rule_counts_by_store(df, rules=None, magaza_col='Mağaza Kodu'):
+    """Mağaza bazında kural başına eşleşen satır sayısı"""
+    masks = evaluate_rules(df, rules)
+    return masks.groupby(df[magaza_col].to_numpy()).sum()
+
+
+def region_rule_counts(df, magaza_col='Mağaza Kodu'):
+    """Bölge özeti risk sayıları (İç Hırs., Kr.Açık, Kr.Fire, Fire Man.) - tüm mağazalar tek geçişte"""
+    rules = {kolon: COMPILED_RULES[ad] for kolon, ad in BOLGE_SAYIM_KURALLARI.items()}
+    return rule_counts_by_store(df, rules, magaza_col)
+
+
+# ==================== TESPİT FONKSİYONLARI ====================
+# Her dedektör 2 adımdan oluşur:
+#   _xxx_rows(df)   → (mask, tablo): satır bazlı eşleşme, tek geçişte tüm mağazalar için çalışabilir
+#   _xxx_finish(t)  → mağaza bazında duplicate temizleme + sıralama
+
+def _run_detector(rows_fn, finish_fn, df):
+    """Tek mağaza için dedektörü çalıştır"""
+    mask, result_df = rows_fn(_ensure_features(df))
+    if result_df is None:
+        return pd.DataFrame()
+    return finish_fn(result_df)
+
+
+def detect_internal_theft(df):
+    """
+    İÇ HIRSIZLIK TESPİTİ:
+    - Satış Fiyatı >= 100 TL
+    - Dengelenmemiş (Fark + Kısmi + Önceki ≠ 0)
+    - |Toplam| ≈ İptal Satır, fark büyüdükçe risk AZALIR
+    """
+    return _run_detector(_internal_theft_rows, _internal_theft_finish, df)
+
+
+def _internal_theft_rows(df):
+    """İç hırsızlık eşleşen satırları (mask, sıralanmamış tablo)"""
+    fark = df['Fark Miktarı']
+    kismi = df['Kısmi Envanter Miktarı']
+    onceki = df['Önceki Fark Miktarı']
+    iptal = df['İptal Satır Miktarı']
+    satis_fiyati = _col(df, 'Birim Fiyat').fillna(0)
+
+    # Kuralla aynı hesap: kural maskesi ve tablodaki Toplam / Fark aynı değerlerden
+    toplam, fark_mutlak = _ic_hirsizlik_degerleri(df)
+    mask = COMPILED_RULES['ic_hirsizlik'](df)
+
+    if not mask.any():
+        return mask, None
+
+    sub = df[mask]
+    fm = fark_mutlak[mask].to_numpy()
+
+    # Risk kademeleri: eşit → ±2 → ±5 → ±10 (eşikler config'den)
+    c = RULE_CONFIG['ic_hirsizlik']
+    conditions = [fm == 0, fm <= c['yuksek_fark'], fm <= c['orta_fark']]
+    risk = np.select(conditions, ['ÇOK YÜKSEK', 'YÜKSEK', 'ORTA'], default='DÜŞÜK-ORTA')
+    esitlik = np.select(conditions, ['TAM EŞİT', f"YAKIN (±{c['yuksek_fark']})", f"YAKIN (±{c['orta_fark']})"],
+                        default='')
+    esitlik = np.array([e if e else f"FARK: {v}" for e, v in zip(esitlik, fm)], dtype=object)
+
+    result_df = _build_result({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(sub),
+        'Satış Fiyatı': satis_fiyati[mask],
+        'Fark Miktarı': fark[mask],
+        'Kısmi Env.': kismi[mask],
+        'Önceki Fark': onceki[mask],
+        'TOPLAM': toplam[mask],
+        'İptal Satır': iptal[mask],
+        'Fark': fm,
+        'Durum': esitlik,
+        'Fark Tutarı (TL)': sub['Fark Tutarı'],
+        'Risk': risk,
+    })
+    return mask, result_df
+
+
+def _internal_theft_finish(result_df):
+    # DUPLICATE TEMİZLEME - Aynı malzeme kodu sadece 1 kez görünsün
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+
+    # Risk sıralaması
+    risk_order = {'ÇOK YÜKSEK': 0, 'YÜKSEK': 1, 'ORTA': 2, 'DÜŞÜK-ORTA': 3}
+    result_df = result_df.assign(_risk_sort=result_df['Risk'].map(risk_order))
+    result_df = result_df.sort_values(['_risk_sort', 'Fark Tutarı (TL)'], ascending=[True, True])
+    result_df = result_df.drop('_risk_sort', axis=1)
+
+    return result_df
+
+
+def detect_chronic_products(df):
+    """Kronik açık - her iki dönemde de Fark < 0"""
+    return _run_detector(_chronic_products_rows, _chronic_products_finish, df)
+
+
+def _chronic_products_rows(df):
+    mask = COMPILED_RULES['kronik_acik'](df)
+
+    if not mask.any():
+        return mask, None
+
+    sub = df[mask]
+    result_df = _build_result({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(sub),
+        'Bu Dönem Fark': sub['Fark Miktarı'],
+        'Bu Dönem Tutar': sub['Fark Tutarı'],
+        'Önceki Fark': sub['Önceki Fark Miktarı'],
+        'Önceki Tutar': sub['Önceki Fark Tutarı'],
+        'Toplam Tutar': sub['Fark Tutarı'] + sub['Önceki Fark Tutarı'],
+    })
+    return mask, result_df
+
+
+def _chronic_products_finish(result_df):
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Bu Dönem Tutar', ascending=True)
+
+    return result_df
+
+
+def detect_chronic_fire(df):
+    """Kronik Fire - her iki dönemde de fire var VE dengelenmemiş"""
+    return _run_detector(_chronic_fire_rows, _chronic_fire_finish, df)
+
+
+def _chronic_fire_rows(df):
+    onceki_fire = _col(df, 'Önceki Fire Miktarı')
+    bu_fire = df['Fire Miktarı']
+
+    # Her iki dönemde de fire var, Önceki Fark + Fark = 0 ise dengelenmiş (kronik değil)
+    mask = COMPILED_RULES['kronik_fire'](df)
+
+    if not mask.any():
+        return mask, None
+
+    sub = df[mask]
+    onceki_fire_tutari = _col(sub, 'Önceki Fire Tutarı')
+    result_df = _build_result({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(sub),
+        'Bu Dönem Fire': bu_fire[mask],
+        'Bu Dönem Fire Tutarı': sub['Fire Tutarı'],
+        'Önceki Fire': onceki_fire[mask],
+        'Önceki Fire Tutarı': onceki_fire_tutari,
+        'Toplam Fire Tutarı': sub['Fire Tutarı'] + onceki_fire_tutari,
+    })
+    return mask, result_df
+
+
+def _chronic_fire_finish(result_df):
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Bu Dönem Fire Tutarı', ascending=True)
+
+    return result_df
+
+
+def detect_fire_manipulation(df):
+    """Fire manipülasyonu: Fire var AMA Fark+Kısmi > 0 VE dengelenmemiş"""
+    return _run_detector(_fire_manipulation_rows, _fire_manipulation_finish, df)
+
+
+def _fire_manipulation_rows(df):
+    fark = df['Fark Miktarı']
+    kismi = df['Kısmi Envanter Miktarı']
+    onceki_fark = df['Önceki Fark Miktarı']
+    fire = df['Fire Miktarı']
+    fark_kismi = df['FARK_KISMI_MIKTAR']
+
+    # Önceki Fark + Fark = 0 ise dengelenmiş, manipülasyon değil
+    mask = COMPILED_RULES['fire_manipulasyon'](df)
+
+    if not mask.any():
+        return mask, None
+
+    sub = df[mask]
+    result_df = _build_result({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(sub),
+        'Fark Miktarı': fark[mask],
+        'Kısmi Env.': kismi[mask],
+        'Önceki Fark': onceki_fark[mask],
+        'Fark + Kısmi': fark_kismi[mask],
+        'Fire Miktarı': fire[mask],
+        'Fire Tutarı': sub['Fire Tutarı'],
+        'Sonuç': np.full(int(mask.sum()), 'FAZLA FİRE GİRİLMİŞ', dtype=object),
+    })
+    return mask, result_df
+
+
+def _fire_manipulation_finish(result_df):
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Fire Tutarı', ascending=True)
+
+    return result_df
+
+
+def detect_external_theft(df):
+    """Dış hırsızlık - açık var ama fire/iptal yok"""
+    return _run_detector(_external_theft_rows, _external_theft_finish, df)
+
+
+def _external_theft_rows(df):
+    mask = COMPILED_RULES['dis_hirsizlik'](df)
+
+    if not mask.any():
+        return mask, None
+
+    sub = df[mask]
+    result_df = _build_result({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+        'Ürün Grubu': _col(sub, 'Ürün Grubu', ''),
+        'Fark Miktarı': sub['Fark Miktarı'],
+        'Fark Tutarı': sub['Fark Tutarı'],
+        'Önceki Fark': sub['Önceki Fark Miktarı'],
+        'Risk': np.full(int(mask.sum()), 'DIŞ HIRSIZLIK / SAYIM HATASI', dtype=object),
+    })
+    return mask, result_df
+
+
+def _external_theft_finish(result_df):
+    result_df = result_df.sort_values('Fark Tutarı', ascending=True)
+
+    return result_df
+
+
+# ==================== SİGARA AÇIĞI ====================
+
+def detect_cigarette_shortage(df):
+    """
+    Sigara açığı - Tüm sigaraların TOPLAM (Fark + Kısmi + Önceki) değerine bakılır
+    Eğer toplam < 0 ise sigara açığı var demektir
+
+    NET = Fark Miktarı + Kısmi Envanter Miktarı + Önceki Fark Miktarı
+
+    Sigara tespiti kuralları:
+    - Mal Grubu Tanımı veya Ürün Grubu içinde 'SİGARA' veya 'TÜTÜN' geçenler
+    - MAKARON tek başına sigara DEĞİLDİR (bilinçli olarak dışarıda tutulur)
+    - "MAKARON JEL KALEM" gibi ürünler yanlışlıkla yakalanmasın diye MAKARON dahil edilmez
+    """
+    # Sigara bayrağı feature frame'de hazır; yoksa kategori bazlı filtre (Malzeme Adı dahil değil)
+    mask = df['SIGARA'] if 'SIGARA' in df.columns else sigara_mask(df)
+    sigara_df = df[np.asarray(mask, dtype=bool)]
+
+    if len(sigara_df) == 0:
+        return pd.DataFrame()
+
+    fark = sigara_df['Fark Miktarı'].fillna(0)
+    kismi = sigara_df['Kısmi Envanter Miktarı'].fillna(0)
+    onceki = sigara_df['Önceki Fark Miktarı'].fillna(0)
+    toplam_fark, toplam_kismi, toplam_onceki = fark.sum(), kismi.sum(), onceki.sum()
+    net_toplam = toplam_fark + toplam_kismi + toplam_onceki
+
+    # Eğer net toplam < 0 ise açık var
+    if net_toplam >= 0:
+        return pd.DataFrame()
+
+    # Sadece 0 olmayan kayıtları göster
+    hareketli = ((fark != 0) | (kismi != 0) | (onceki != 0)).to_numpy()
+    if not hareketli.any():
+        return pd.DataFrame()
+
+    sub = sigara_df[hareketli]
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _col(sub, 'Malzeme Kodu', '').to_numpy(dtype=object),
+        'Malzeme Adı': _col(sub, 'Malzeme Adı', '').to_numpy(dtype=object),
+        'Fark': fark[hareketli].to_numpy(),
+        'Kısmi': kismi[hareketli].to_numpy(),
+        'Önceki': onceki[hareketli].to_numpy(),
+        'Ürün Toplam': (fark + kismi + onceki)[hareketli].to_numpy(),
+        'Risk': 'SİGARA',
+    })
+
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Ürün Toplam', ascending=True)
+    # En sona toplam satırı ekle
+    toplam_row = pd.DataFrame([{
+        'Malzeme Kodu': '*** TOPLAM ***',
+        'Malzeme Adı': f'SİGARA AÇIĞI: {abs(net_toplam):.0f} adet',
+        'Fark': toplam_fark,
+        'Kısmi': toplam_kismi,
+        'Önceki': toplam_onceki,
+        'Ürün Toplam': net_toplam,
+        'Risk': '⚠️ AÇIK VAR'
+    }])
+    return pd.concat([result_df, toplam_row], ignore_index=True)
+
+
+# ==================== 10 TL ÜRÜNLERİ (KASA AKTİVİTESİ) ====================
+
+def _kasa_rows(df, kasa_kodlari):
+    """Kasa aktivitesi kodlarıyla eşleşen satırlar: (mask, adet, tutar) - Önceki dahil değil"""
+    df = _ensure_features(df)
+    eslesen = df['KOD'].isin(kasa_kodlari)
+    adet = df['Fark Miktarı'].fillna(0) + df['Kısmi Envanter Miktarı'].fillna(0)
+    return df, eslesen, adet, df['FARK_KISMI_TUTAR']
+
+
+def check_kasa_activity_products(df, kasa_kodlari):
+    """
+    10 TL Ürünleri Kontrolü
+    Fiyat değişikliği olan ürünlerde manipülasyon riski
+    Toplam adet ve tutar etkisini hesapla
+    FORMÜL: Fark + Kısmi (Önceki dahil değil)
+    """
+    df, eslesen, adet, tutar = _kasa_rows(df, kasa_kodlari)
+    sorunlu = eslesen & (adet != 0)  # Sadece sıfır olmayanları göster
+
+    result_df = pd.DataFrame()
+    if sorunlu.any():
+        sub = df[sorunlu]
+        toplam = adet[sorunlu]
+        result_df = _build_result({
+            'Malzeme Kodu': sub['KOD'],
+            'Malzeme Adı': _col(sub, 'Malzeme Adı', ''),
+            'Fark': sub['Fark Miktarı'].fillna(0),
+            'Kısmi': sub['Kısmi Envanter Miktarı'].fillna(0),
+            'TOPLAM': toplam,
+            'Tutar': tutar[sorunlu],
+            'Durum': np.where(toplam > 0, "FAZLA (+)", "AÇIK (-)"),
+        })
+        # Önce fazla (+) olanlar, sonra açık (-) olanlar
+        result_df['_sort'] = np.where(result_df['TOPLAM'] > 0, 0, 1)
+        result_df = result_df.sort_values(['_sort', 'TOPLAM'], ascending=[True, False])
+        result_df = result_df.drop('_sort', axis=1)
+
+    # Özet bilgileri de döndür
+    summary = {
+        'toplam_urun': int(eslesen.sum()),
+        'sorunlu_urun': int(sorunlu.sum()),
+        'toplam_adet': adet[eslesen].sum(),
+        'toplam_tutar': tutar[eslesen].sum()
+    }
+
+    return result_df, summary
+
+
+def kasa_summary_by_store(df, kasa_kodlari, magaza_col='Mağaza Kodu'):
+    """
+    check_kasa_activity_products özetini tüm mağazalar için tek groupby ile hesapla
+    Dönüş: mağaza kodu index'li toplam_urun / sorunlu_urun / toplam_adet / toplam_tutar
+    """
+    df, eslesen, adet, tutar = _kasa_rows(df, kasa_kodlari)
+    ozet = pd.DataFrame({
+        magaza_col: df[magaza_col],
+        'toplam_urun': 1,
+        'sorunlu_urun': (adet != 0).astype(int),
+        'toplam_adet': adet,
+        'toplam_tutar': tutar,
+    })[eslesen.to_numpy()]
+    return ozet.groupby(magaza_col).sum()
+
+
+# ==================== YÖNETİCİ ÖZETİ ====================
+
+def _group_stats(df, keys):
+    """Mal grubu istatistikleri - named aggregation, store frame kopyalanmaz"""
+    df = _ensure_features(df)
+    gruplar = [df[k] for k in keys]
+    stats = df.groupby(gruplar).agg(**{
+        'Toplam Fark': ('TOPLAM_TUTAR', 'sum'),
+        'Toplam Fire': ('Fire Tutarı', 'sum'),
+        'Toplam Satış': ('Satış Tutarı', 'sum'),
+    })
+    stats['Açık Ürün Sayısı'] = (df['Fark Miktarı'] < 0).groupby(gruplar).sum()
+    stats['Açık Oranı'] = stats['Toplam Fark'].abs() / stats['Toplam Satış'].replace(0, 1) * 100
+    return stats
+
+
+def _summary_comments(group_stats, kasa_summary=None):
+    """Mal grubu istatistiklerinden yönetici yorumları"""
+    comments = []
+
+    # En yüksek açık
+    top_acik = group_stats.nsmallest(3, 'Toplam Fark')
+    for grup, fark, adet in zip(top_acik['Ürün Grubu'], top_acik['Toplam Fark'], top_acik['Açık Ürün Sayısı']):
+        if fark < -500:
+            comments.append(f"⚠️ {grup}: {fark:,.0f} TL açık ({adet} ürün)")
+
+    # En yüksek fire
+    top_fire = group_stats.nsmallest(3, 'Toplam Fire')
+    for grup, fire in zip(top_fire['Ürün Grubu'], top_fire['Toplam Fire']):
+        if fire < -500:
+            comments.append(f"🔥 {grup}: {fire:,.0f} TL fire")
+
+    # 10 TL ürünleri yorumu - TOPLAM ADET VE TUTAR
+    if kasa_summary is not None:
+        toplam_adet = kasa_summary.get('toplam_adet', 0)
+        toplam_tutar = kasa_summary.get('toplam_tutar', 0)
+
+        if toplam_adet > 0:
+            comments.append(f"💰 10 TL ÜRÜNLERİ: NET +{toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL FAZLA")
+            comments.append(f"   ⚠️ Bu fazlalık gerçek envanter açığını gizliyor olabilir!")
+        elif toplam_adet < 0:
+            comments.append(f"💰 10 TL ÜRÜNLERİ: NET {toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL AÇIK")
+
+    return comments
+
+
+def generate_executive_summary(df, kasa_activity_df=None, kasa_summary=None):
+    """Yönetici özeti - mal grubu bazlı yorumlar"""
+    group_stats = _group_stats(df, ['Ürün Grubu']).reset_index()
+    return _summary_comments(group_stats, kasa_summary), group_stats
+
+
+def executive_summaries_by_store(df, kasa_ozet=None, magaza_col='Mağaza Kodu'):
+    """
+    Tüm mağazaların yönetici özeti tek groupby ile
+    kasa_ozet: kasa_summary_by_store() çıktısı (opsiyonel)
+    Dönüş: {mağaza_kodu: (comments, group_stats)}
+    """
+    stats = _group_stats(df, [magaza_col, 'Ürün Grubu'])
+    sonuc = {}
+    for mag, group_stats in stats.groupby(level=0, sort=False):
+        group_stats = group_stats.droplevel(0).reset_index()
+        kasa_summary = None
+        if kasa_ozet is not None and mag in kasa_ozet.index:
+            kasa_summary = kasa_ozet.loc[mag].to_dict()
+        sonuc[mag] = (_summary_comments(group_stats, kasa_summary), group_stats)
+    return sonuc
+
+
+# ==================== MAĞAZA RİSK PUANLAMA ====================
+# weights.json risk_weights kademeleri → np.select ile tüm mağazalar tek seferde
+# (config anahtarı, metrik kolonu, [(seviye, varsayılan eşik, varsayılan puan, neden formatı), ...])
+# Neden formatı None ise o kademede puan eklenir ama "Risk Nedenleri"ne yazılmaz
+
+RISK_KADEMELERI = [
+    ('toplam_oran', 'Toplam %', [('high', 2, 40, "Toplam %{:.1f}"), ('medium', 1.5, 25, "Toplam %{:.1f}"),
+                                 ('low', 1, 15, None)]),
+    ('ic_hirsizlik', 'İç Hırs.', [('high', 50, 30, "İç hırs. {}"), ('medium', 30, 20, "İç hırs. {}"),
+                                  ('low', 15, 10, None)]),
+    ('sigara', 'Sigara', [('high', 5, 35, "🚬 SİGARA {:.0f}"), ('low', 0, 20, "🚬 Sigara {:.0f}")]),
+    ('kronik', 'Kr.Açık', [('high', 100, 15, "Kronik {}"), ('low', 50, 10, None)]),
+    ('fire_manipulasyon', 'Fire Man.', [('high', 10, 20, "Fire man. {}"), ('low', 5, 10, None)]),
+    ('kasa_10tl', '10TL Adet', [('high', 20, 15, "10TL +{:.0f}"), ('low', 10, 10, None)]),
+]
+
+RISK_SEVIYELERI = [('kritik', 60, "🔴 KRİTİK"), ('riskli', 40, "🟠 RİSKLİ"), ('dikkat', 20, "🟡 DİKKAT")]
+
+
+def risk_level_labels(puan, risk_levels=None):
+    """Puan dizisi → risk seviyesi etiketleri (eşikler risk_levels'tan, yoksa varsayılan)"""
+    rl = risk_levels or {}
+    puan = np.asarray(puan)
+    return np.select([puan >= rl.get(ad, esik) for ad, esik, _ in RISK_SEVIYELERI],
+                     [etiket for _, _, etiket in RISK_SEVIYELERI], default="🟢 TEMİZ")
+
+
+def align_store_series(s, index):
+    """Mağaza bazlı Series'i mağaza listesine hizala, olmayan mağaza → 0 (s.get(mag, 0) ile aynı tipler)"""
+    hizali = s.reindex(index)
+    if hizali.isna().all():
+        return pd.Series(0, index=index)
+    hizali = hizali.fillna(0)
+    return hizali.astype(s.dtype) if s.dtype.kind in 'iub' else hizali
+
+
+def score_stores(metrics, risk_config):
+    """
+    Mağaza risk puanı (vektörel)
+    metrics: RISK_KADEMELERI'ndeki metrik kolonlarını içeren mağaza tablosu
+    Dönüş: aynı index'li 'Risk Puan', 'Risk', 'Risk Nedenleri'
+    """
+    rw = risk_config.get('risk_weights', {})
+    rl = risk_config.get('risk_levels', {})
+    max_score = risk_config.get('max_risk_score', 100)
+
+    puan = np.zeros(len(metrics), dtype=int)
+    nedenler = []
+    for anahtar, kolon, kademeler in RISK_KADEMELERI:
+        cfg = rw.get(anahtar, {})
+        values = metrics[kolon]
+        kosullar = [values.to_numpy() > cfg.get(seviye, {}).get('threshold', esik)
+                    for seviye, esik, _, _ in kademeler]
+        puanlar = [cfg.get(seviye, {}).get('points', p) for seviye, _, p, _ in kademeler]
+        puan = puan + np.select(kosullar, puanlar, default=0)
+
+        # Neden metni: ilk sağlanan kademenin formatı (eşik sırası if/elif ile aynı)
+        secilen = np.select(kosullar, list(range(len(kademeler))), default=-1)
+        nedenler.append([
+            kademeler[k][3].format(v) if k >= 0 and kademeler[k][3] else None
+            for k, v in zip(secilen, values.tolist() if values.dtype == object else values.to_numpy())
+        ])
+
+    puan = np.minimum(puan, max_score)
+    seviye = risk_level_labels(puan, rl)
+    neden_metni = [" | ".join(n for n in satir if n) or "-" for satir in zip(*nedenler)] if nedenler else []
+
+    return pd.DataFrame({
+        'Risk Puan': puan,
+        'Risk': seviye,
+        'Risk Nedenleri': neden_metni,
+    }, index=metrics.index)
+
+
+# ==================== BÖLGE ORTALAMASINA GÖRE PUANLAMA ====================
+# SM/GM özet ekranı (v_magaza_ozet): kayıp oranı ve iç hırsızlık bölge ortalamasına göre
+# Ağırlıklar: Kayıp %30, Sigara %30, İç Hırsızlık %30, Kronik %5, 10TL %5
+
+def _ust_sinir(x, sinir):
+    """min(sinir, x) ile aynı: NaN → sinir"""
+    return np.where(x < sinir, x, sinir)
+
+
+def region_averages(df):
+    """Bölge ortalamaları (özet tablosundan)"""
+    if len(df) == 0:
+        return {'kayip_oran': 1, 'ic_hirsizlik': 10, 'kronik': 50, 'sigara': 0}
+    return {
+        'kayip_oran': df['Toplam %'].mean(),
+        'ic_hirsizlik': df['İç Hırs.'].mean(),
+        'kronik': df['Kronik'].mean(),
+        'sigara': df['Sigara'].mean(),
+    }
+
+
+def score_relative_to_region(df, bolge_ort=None):
+    """
+    Risk puanı (0-100) - bölge ortalamasına göre, tüm satırlar tek seferde
+    df: 'Toplam %', 'Sigara', 'İç Hırs.', 'Kronik', 'Kasa Adet' kolonları
+    Dönüş: aynı index'li 'Risk Puan' Series
+    """
+    if bolge_ort is None:
+        bolge_ort = region_averages(df)
+
+    def kolon(ad):
+        if ad not in df.columns:
+            return np.zeros(len(df))
+        return pd.to_numeric(df[ad], errors='coerce').to_numpy(dtype=float)
+
+    # Kayıp Oranı (30 puan)
+    kayip_oran = kolon('Toplam %')
+    if bolge_ort['kayip_oran'] > 0:
+        puan = _ust_sinir(kayip_oran / bolge_ort['kayip_oran'] * 15, 30)
+    else:
+        puan = _ust_sinir(kayip_oran * 20, 30)
+
+    # Sigara Açığı (30 puan) - her sigara kritik
+    sigara = kolon('Sigara')
+    puan = puan + np.select([sigara > 10, sigara > 5, sigara > 0], [30, 25, sigara * 4], default=0)
+
+    # İç Hırsızlık (30 puan)
+    ic = kolon('İç Hırs.')
+    if bolge_ort['ic_hirsizlik'] > 0:
+        puan = puan + _ust_sinir(ic / bolge_ort['ic_hirsizlik'] * 15, 30)
+    else:
+        puan = puan + _ust_sinir(ic * 0.5, 30)
+
+    # Kronik Açık (5 puan)
+    kronik = kolon('Kronik')
+    if bolge_ort['kronik'] > 0:
+        puan = puan + _ust_sinir(kronik / bolge_ort['kronik'] * 2.5, 5)
+    else:
+        puan = puan + _ust_sinir(kronik * 0.05, 5)
+
+    # 10TL Ürünleri (5 puan) - fazla = şüpheli
+    kasa = np.abs(kolon('Kasa Adet'))
+    puan = puan + np.select([kasa > 20, kasa > 10, kasa > 0], [5, 3, 1], default=0)
+
+    puan = _ust_sinir(np.where(puan > 0, puan, 0), 100)
+    return pd.Series(puan, index=df.index, name='Risk Puan')
+
+
+# ==================== SM / BS TOPLAMLARI ====================
+# Toplanabilir kolonlar (_rollup_sums) ve oranlar/seviye (_rollup_finish) ayrı:
+# küpteki dönem satırları tekrar toplanıp aynı finish ile bitirilebilir
+
+RISK_SAYI_KOLONLARI = [('Kritik Mağaza', 'KRİTİK'), ('Riskli Mağaza', 'RİSKLİ'),
+                       ('Dikkat Mağaza', 'DİKKAT'), ('Temiz Mağaza', 'TEMİZ')]
+
+
+def _rollup_sums(store_df, keys):
+    """Mağaza satırlarını keys bazında topla (ağırlıklı risk bileşenleri ve seviye sayıları dahil)"""
+    def kolon(*adlar, varsayilan=0):
+        for ad in adlar:
+            if ad in store_df.columns:
+                return store_df[ad]
+        return pd.Series(varsayilan, index=store_df.index)
+
+    # VIEW ('Kronik', 'Kasa Adet') ve analyze_region ('Kr.Açık', '10TL Adet') kolon adları
+    risk = store_df['Risk'].astype(str)
+    satis = store_df['Satış']
+    calisma = pd.DataFrame({
+        **{key: store_df[key] for key in keys},
+        'Mağaza Kodu': store_df['Mağaza Kodu'],
+        'Satış': satis,
+        'Fark': store_df['Fark'],
+        'Fire': store_df['Fire'],
+        'Toplam Açık': store_df['Toplam Açık'],
+        'İç Hırs.': store_df['İç Hırs.'],
+        'Kronik': kolon('Kronik', 'Kr.Açık'),
+        'Sigara': store_df['Sigara'],
+        '10TL Adet': kolon('Kasa Adet', '10TL Adet'),
+        '10TL Tutar': kolon('Kasa Tutar', '10TL Tutar'),
+        'Gün': kolon('Gün', varsayilan=1),
+        'Risk Puan': store_df['Risk Puan'],
+        '_agirlikli': store_df['Risk Puan'] * satis,
+        **{ad: risk.str.contains(etiket).astype(int) for ad, etiket in RISK_SAYI_KOLONLARI},
+    })
+
+    return calisma.groupby(keys).agg(**{
+        'Mağaza Sayısı': ('Mağaza Kodu', 'count'),
+        'Satış': ('Satış', 'sum'),
+        'Fark': ('Fark', 'sum'),
+        'Fire': ('Fire', 'sum'),
+        'Toplam Açık': ('Toplam Açık', 'sum'),
+        'İç Hırs.': ('İç Hırs.', 'sum'),
+        'Kronik': ('Kronik', 'sum'),
+        'Sigara': ('Sigara', 'sum'),
+        '10TL Adet': ('10TL Adet', 'sum'),
+        '10TL Tutar': ('10TL Tutar', 'sum'),
+        'Toplam Gün': ('Gün', 'sum'),
+        '_agirlikli': ('_agirlikli', 'sum'),
+        '_puan_toplam': ('Risk Puan', 'sum'),
+        '_puan_sayisi': ('Risk Puan', 'count'),
+        **{ad: (ad, 'sum') for ad, _ in RISK_SAYI_KOLONLARI},
+    }).reset_index()
+
+
+def _rollup_finish(grouped):
+    """Toplamlardan ağırlıklı risk, oranlar ve risk seviyesi"""
+    # Satış ağırlıklı ortalama risk (satış yoksa düz ortalama)
+    ortalama = grouped['_puan_toplam'] / grouped['_puan_sayisi'].where(grouped['_puan_sayisi'] > 0)
+    agirlikli_risk = np.where(grouped['Satış'] > 0,
+                              grouped['_agirlikli'] / grouped['Satış'].where(grouped['Satış'] > 0),
+                              ortalama)
+    grouped = grouped.drop(columns=['_agirlikli', '_puan_toplam', '_puan_sayisi'])
+    grouped.insert(grouped.columns.get_loc('Kritik Mağaza'), 'Risk Puan', agirlikli_risk)
+
+    # Oranlar
+    grouped['Fark %'] = (grouped['Fark'].abs() / grouped['Satış'] * 100).fillna(0)
+    grouped['Fire %'] = (grouped['Fire'].abs() / grouped['Satış'] * 100).fillna(0)
+    grouped['Toplam %'] = (grouped['Toplam Açık'].abs() / grouped['Satış'] * 100).fillna(0)
+
+    # Günlük fark ve fire
+    grouped['Günlük Fark'] = (grouped['Fark'] / grouped['Toplam Gün']).fillna(0)
+    grouped['Günlük Fire'] = (grouped['Fire'] / grouped['Toplam Gün']).fillna(0)
+
+    # Risk seviyesi (ağırlıklı ortalama risk puanına göre)
+    grouped['Risk'] = risk_level_labels(grouped['Risk Puan'])
+
+    # Risk puanına göre sırala (yüksekten düşüğe)
+    return grouped.sort_values('Risk Puan', ascending=False)
+
+
+def aggregate_by_group(store_df, group_col):
+    """
+    SM veya BS bazında gruplama - Satış Ağırlıklı Ortalama Risk
+    Tek groupby, store_df değiştirilmez
+    """
+    if group_col not in store_df.columns:
+        return pd.DataFrame()
+    return _rollup_finish(_rollup_sums(store_df, [group_col]))
+
+
+# ==================== DÖNEM KÜPÜ ====================
+# Mağaza → BS → SM → Bölge toplamları dönem bazında bir kez hesaplanır
+# Her ekran (Bölge/SM/GM) küpten dilim alır: seçilen dönemler tekrar toplanıp bitirilir
+
+ROLLUP_SEVIYELERI = [('Mağaza', 'Mağaza Kodu'), ('BS', 'BS'), ('SM', 'SM'), ('Bölge', None)]
+
+
+def build_rollup_cube(store_df, period_col='Envanter Dönemi'):
+    """
+    Dönem bazlı toplam küpü (uzun format): Seviye, Dönem, Anahtar + toplanabilir kolonlar
+    store_df: mağaza(-dönem) satırları (VIEW özeti veya analyze_region çıktısı)
+    """
+    if len(store_df) == 0:
+        return pd.DataFrame()
+
+    if 'SM' not in store_df.columns and 'Satış Müdürü' in store_df.columns:
+        store_df = store_df.assign(SM=store_df['Satış Müdürü'])
+    if period_col in store_df.columns:
+        store_df = store_df.assign(Dönem=store_df[period_col].astype(str))
+    else:
+        store_df = store_df.assign(Dönem='-')
+
+    parcalar = []
+    for seviye, kolon in ROLLUP_SEVIYELERI:
+        if kolon is not None and kolon not in store_df.columns:
+            continue
+        if kolon is None:
+            sums = _rollup_sums(store_df.assign(Anahtar='TOPLAM'), ['Dönem', 'Anahtar'])
+        else:
+            sums = _rollup_sums(store_df.assign(Anahtar=store_df[kolon]), ['Dönem', 'Anahtar'])
+        sums.insert(0, 'Seviye', seviye)
+        parcalar.append(sums)
+    return pd.concat(parcalar, ignore_index=True)
+
+
+def cube_slice(cube, seviye, donemler=None):
+    """
+    Küpten seviye dilimi (seçilen dönemler toplanır) - aggregate_by_group ile aynı çıktı
+    Anahtar kolonu seviye kolon adıyla döner (SM, BS, Mağaza Kodu)
+    """
+    if len(cube) == 0:
+        return pd.DataFrame()
+    sub = cube[cube['Seviye'] == seviye]
+    if donemler:
+        sub = sub[sub['Dönem'].isin([str(d) for d in donemler])]
+    if len(sub) == 0:
+        return pd.DataFrame()
+
+    grouped = sub.drop(columns=['Seviye', 'Dönem']).groupby('Anahtar').sum().reset_index()
+    kolon = dict(ROLLUP_SEVIYELERI)[seviye] or 'Bölge'
+    return _rollup_finish(grouped.rename(columns={'Anahtar': kolon}))
+
+
+def cube_totals(cube, donemler=None):
+    """
+    Bölge toplamları (üst metrikler + risk dağılımı) - küpün Bölge diliminden
+    Küp boşsa / seçilen dönemde veri yoksa tüm anahtarlar 0 döner
+    """
+    bolge = cube_slice(cube, 'Bölge', donemler)
+    if len(bolge) == 0:
+        bolge = pd.DataFrame([dict.fromkeys(
+            ['Satış', 'Fark', 'Fire', 'Toplam Açık', 'Toplam Gün', 'Kritik Mağaza', 'Riskli Mağaza',
+             'Dikkat Mağaza', 'Temiz Mağaza', '10TL Adet', '10TL Tutar'], 0)])
+    row = bolge.iloc[0]
+    satis, gun = row['Satış'], row['Toplam Gün']
+    return {
+        'satis': satis,
+        'fark': row['Fark'],
+        'fire': row['Fire'],
+        'acik': row['Toplam Açık'],
+        'gun': gun,
+        'fark_oran': abs(row['Fark']) / satis * 100 if satis > 0 else 0,
+        'fire_oran': abs(row['Fire']) / satis * 100 if satis > 0 else 0,
+        'toplam_oran': abs(row['Toplam Açık']) / satis * 100 if satis > 0 else 0,
+        'gunluk_fark': row['Fark'] / gun if gun > 0 else 0,
+        'gunluk_fire': row['Fire'] / gun if gun > 0 else 0,
+        'kritik': int(row['Kritik Mağaza']),
+        'riskli': int(row['Riskli Mağaza']),
+        'dikkat': int(row['Dikkat Mağaza']),
+        'temiz': int(row['Temiz Mağaza']),
+        'kasa_adet': row['10TL Adet'],
+        'kasa_tutar': row['10TL Tutar'],
+    }
+
+
+# ==================== DÖNEM TRENDİ ====================
+# VIEW özet satırları (mağaza × dönem) üzerinde tek geçiş: dönem sırasına göre
+# mağaza bazlı fark (Δ), hareketli ortalama (Ort) ve risk eğilimi (dönem başına eğim)
+
+TREND_METRIKLERI = ['Fark %', 'Fire %', 'Sigara', 'İç Hırs.', 'Risk Puan']
+
+
+def build_trend_frame(summary_df, period_col='Envanter Dönemi', window=3):
+    """
+    Mağaza-dönem trend tablosu
+    Aynı mağaza-dönem için birden fazla satır varsa tutarlar toplanıp oranlar yeniden hesaplanır
+    Dönüş: Mağaza Kodu, Dönem + metrikler + '<metrik> Δ' (önceki döneme göre) + '<metrik> Ort' (hareketli ortalama)
+    """
+    if len(summary_df) == 0 or period_col not in summary_df.columns:
+        return pd.DataFrame()
+
+    df = summary_df.assign(Dönem=summary_df[period_col].astype(str))
+    ilk = {c: 'first' for c in ['Mağaza Adı', 'SM', 'BS'] if c in df.columns}
+    trend = df.groupby(['Mağaza Kodu', 'Dönem'], sort=True).agg(**{
+        **{c: (c, f) for c, f in ilk.items()},
+        'Satış': ('Satış', 'sum'),
+        'Fark': ('Fark', 'sum'),
+        'Fire': ('Fire', 'sum'),
+        'Sigara': ('Sigara', 'sum'),
+        'İç Hırs.': ('İç Hırs.', 'sum'),
+        'Risk Puan': ('Risk Puan', 'mean'),
+    }).reset_index()
+
+    satis = trend['Satış'].where(trend['Satış'] != 0)
+    trend['Fark %'] = (trend['Fark'].abs() / satis * 100).fillna(0)
+    trend['Fire %'] = (trend['Fire'].abs() / satis * 100).fillna(0)
+
+    # Mağaza içinde dönem sırası zaten artan (groupby sort) - shift/rolling tek geçişte
+    magaza = trend.groupby('Mağaza Kodu', sort=False)
+    for col in TREND_METRIKLERI:
+        trend[f'{col} Δ'] = magaza[col].diff()
+        trend[f'{col} Ort'] = magaza[col].rolling(window, min_periods=1).mean().reset_index(level=0, drop=True)
+    # Eğim için genel dönem sırası (eksik dönemi olan mağazada aralık korunur)
+    trend['Dönem No'] = pd.factorize(trend['Dönem'], sort=True)[0]
+    trend['Dönem Sayısı'] = magaza.cumcount() + 1
+    return trend
+
+
+def _trend_slope(trend, col):
+    """Mağaza başına en küçük kareler eğimi (dönem sırasına göre, vektörel)"""
+    x = trend['Dönem No'].astype(float)
+    y = trend[col].astype(float)
+    g = pd.DataFrame({'Mağaza Kodu': trend['Mağaza Kodu'], 'x': x, 'y': y, 'xy': x * y, 'xx': x * x})
+    toplam = g.groupby('Mağaza Kodu', sort=False).agg(
+        n=('x', 'count'), sx=('x', 'sum'), sy=('y', 'sum'), sxy=('xy', 'sum'), sxx=('xx', 'sum'))
+    payda = toplam['n'] * toplam['sxx'] - toplam['sx'] ** 2
+    return ((toplam['n'] * toplam['sxy'] - toplam['sx'] * toplam['sy']) / payda.where(payda != 0)).fillna(0)
+
+
+def deteriorating_stores(trend, top=20):
+    """
+    En hızlı kötüleşen mağazalar: son dönem değerleri + son Δ + dönem başına eğim
+    Sıralama: Risk Puan eğimi, eşitlikte Toplam (Fark % + Fire %) eğimi
+    """
+    if len(trend) == 0:
+        return pd.DataFrame()
+
+    son = trend.groupby('Mağaza Kodu', sort=False).tail(1).set_index('Mağaza Kodu')
+    son = son[son['Dönem Sayısı'] > 1]  # tek dönemli mağazalarda trend yok
+    if len(son) == 0:
+        return pd.DataFrame()
+
+    kayip = trend.assign(**{'Kayıp %': trend['Fark %'] + trend['Fire %']})
+    tablo = son[[c for c in ['Mağaza Adı', 'SM', 'BS'] if c in son.columns] + ['Dönem']].copy()
+    tablo['Dönem Sayısı'] = son['Dönem Sayısı']
+    for col in TREND_METRIKLERI:
+        tablo[col] = son[col]
+        tablo[f'{col} Δ'] = son[f'{col} Δ']
+    tablo['Risk Eğilim'] = _trend_slope(trend, 'Risk Puan').reindex(tablo.index)
+    tablo['Kayıp Eğilim'] = _trend_slope(kayip, 'Kayıp %').reindex(tablo.index)
+
+    tablo = tablo.sort_values(['Risk Eğilim', 'Kayıp Eğilim'], ascending=False)
+    return tablo.head(top).reset_index()
+
+
+# ==================== WHAT-IF PUANLAMA ====================
+# Mağaza özellik matrisi (metrikler + risk sayıları) bir kez hesaplanır, puanlama ayrı
+# Ağırlık/eşik değişince sadece score_stores + aggregate_by_group çalışır
+
+def score_region(features, risk_config):
+    """Özellik matrisini puanla, risk puanına göre sırala"""
+    if len(features) == 0:
+        return pd.DataFrame()
+    scored = pd.concat([features, score_stores(features, risk_config)], axis=1)
+    return scored.sort_values('Risk Puan', ascending=False)
+
+
+def rescore(features, risk_config):
+    """Mağaza, SM ve BS seviyesinde yeniden puanla → (store_df, sm_df, bs_df)"""
+    store_df = score_region(features, risk_config)
+    if len(store_df) == 0:
+        return store_df, pd.DataFrame(), pd.DataFrame()
+    return store_df, aggregate_by_group(store_df, 'SM'), aggregate_by_group(store_df, 'BS')
+
+
+def risk_config_table(risk_config):
+    """risk_weights kademelerini düzenlenebilir tabloya çevir (Kriter, Kolon, Seviye, Eşik, Puan)"""
+    rw = risk_config.get('risk_weights', {})
+    rows = []
+    for anahtar, kolon, kademeler in RISK_KADEMELERI:
+        for seviye, esik, puan, _ in kademeler:
+            cfg = rw.get(anahtar, {}).get(seviye, {})
+            rows.append({
+                'Kriter': anahtar,
+                'Kolon': kolon,
+                'Seviye': seviye,
+                'Eşik': float(cfg.get('threshold', esik)),
+                'Puan': int(cfg.get('points', puan)),
+            })
+    return pd.DataFrame(rows)
+
+
+def risk_config_from_table(table, base=None):
+    """Düzenlenmiş kademe tablosundan yeni risk config üret (base kopyalanır, değiştirilmez)"""
+    config = copy.deepcopy(base) if base else {}
+    rw = config.setdefault('risk_weights', {})
+    for row in table.itertuples(index=False):
+        rw.setdefault(row.Kriter, {})[row.Seviye] = {'threshold': float(row.Eşik), 'points': int(row.Puan)}
+    return config
+
+
+# ==================== ÜRÜN AİLESİ ====================
+# Blok indeksi: (İlk 2 kelime, Marka, Ürün Grubu) → satır pozisyonları
+# Gramaj kümelemesi sadece blok içinde yapılır (tüm tabloya mask kurulmaz)
+
+def get_first_two_words(text):
+    """İlk 2 kelimeyi al"""
+    if pd.isna(text):
+        return ""
+    words = str(text).strip().split()
+    return " ".join(words[:2]).upper() if len(words) >= 2 else str(text).upper()
+
+
+def get_last_word(text):
+    """Son kelimeyi (marka) al"""
+    if pd.isna(text):
+        return ""
+    words = str(text).strip().split()
+    return words[-1].upper() if words else ""
+
+
+def extract_quantity(text):
+    """Gramaj/ML çıkar: '750 ML' → 750, 'ML'"""
+    if pd.isna(text):
+        return None, None
+    
+    text = str(text).upper()
+    
+    match = GRAMAJ_PATTERN.search(text)
+    if match:
+        value = float(match.group(1).replace(',', '.'))
+        unit = match.group(2)
+        
+        # Normalize units to base (ML, G)
+        if unit in ['LT', 'L']:
+            value = value * 1000  # to ML
+            unit = 'ML'
+        elif unit == 'KG':
+            value = value * 1000  # to G
+            unit = 'G'
+        elif unit == 'GR':
+            unit = 'G'
+        
+        return value, unit
+    
+    return None, None
+
+
+def parse_product_names(names):
+    """
+    Ürün adlarından İlk2Kelime, Marka, Gramaj, GramajBirim (vektörel)
+    Sadece tekil isimler işlenir, sonuç satırlara geri yayılır
+    (300 mağaza × aynı ürün → isim başına 1 kez parse)
+    """
+    codes, uniq = pd.factorize(names, use_na_sentinel=True)
+    u = pd.Series(uniq, dtype=object).astype(str)
+    buyuk = u.str.upper()
+
+    # İlk 2 kelime / son kelime - boşluklara göre böl
+    words = u.str.strip().str.split()
+    n_words = words.str.len().to_numpy()
+    ilk2 = np.where(n_words >= 2, words.str[:2].str.join(' ').str.upper(), buyuk)
+    marka = words.str[-1].str.upper().fillna('').to_numpy(dtype=object)
+
+    # Gramaj: ilk eşleşme, birimler ML / G tabanına çevrilir
+    m = buyuk.str.extract(GRAMAJ_PATTERN)
+    deger = m[0].str.replace(',', '.', regex=False).astype(float).to_numpy()
+    birim = m[1].to_numpy(dtype=object)
+    carpan = np.where(np.isin(birim, ['LT', 'L', 'KG']), 1000.0, 1.0)
+    birim = np.select([np.isin(birim, ['LT', 'L']), np.isin(birim, ['KG', 'GR'])], ['ML', 'G'], default=birim)
+    birim = np.where(pd.isna(deger), None, birim).astype(object)
+
+    # Tekil sonuçları satırlara yay - NaN isim (kod -1) → boş
+    ilk2 = np.append(ilk2.astype(object), '')[codes]
+    marka = np.append(marka, '')[codes]
+    gramaj = np.append(deger * carpan, np.nan)[codes]
+    birim = np.append(birim, None)[codes]
+
+    index = names.index if isinstance(names, pd.Series) else None
+    return pd.DataFrame({'İlk2Kelime': ilk2, 'Marka': marka, 'Gramaj': gramaj, 'GramajBirim': birim}, index=index)
+
+
+def add_name_features(df):
+    """Ürün adı kolonlarını ekle - çok mağazalı veride mağazalara bölmeden önce 1 kez çağrılır"""
+    df = df.drop(columns=[c for c in ISIM_COLS if c in df.columns])
+    return pd.concat([df, parse_product_names(df['Malzeme Adı'])], axis=1)
+
+
+def is_quantity_similar(qty1, unit1, qty2, unit2, tolerance=0.30):
+    """Gramaj benzer mi? Aynı boyut kategorisinde mi?"""
+    if qty1 is None or qty2 is None:
+        return True  # Gramaj bulunamadıysa benzer say
+    
+    if unit1 != unit2:
+        return False  # Farklı birim (ML vs G) benzer değil
+    
+    if qty1 == 0 or qty2 == 0:
+        return True
+    
+    # Oran kontrolü: max 3x fark olabilir
+    ratio = max(qty1, qty2) / min(qty1, qty2)
+    if ratio > 3:
+        return False  # 3 kattan fazla fark varsa benzer değil
+    
+    # Boyut kategorileri
+    def get_size_category(qty, unit):
+        if unit == 'ML':
+            if qty <= 400: return 'S'      # Küçük: 0-400ml
+            elif qty <= 1000: return 'M'   # Orta: 400-1000ml
+            else: return 'L'               # Büyük: 1000ml+
+        elif unit == 'G':
+            if qty <= 100: return 'S'      # Küçük: 0-100g
+            elif qty <= 400: return 'M'    # Orta: 100-400g
+            else: return 'L'               # Büyük: 400g+
+        return 'M'
+    
+    cat1 = get_size_category(qty1, unit1)
+    cat2 = get_size_category(qty2, unit2)
+    
+    # Sadece aynı kategorideyse benzer
+    return cat1 == cat2
+
+
+
+def _size_category(qty, unit):
+    """Boyut kategorisi (vektörel): ML 400/1000, G 100/400 sınırları, diğer birimler 'M'"""
+    qty = np.asarray(qty, dtype=float)
+    unit = np.asarray(unit, dtype=object)
+    with np.errstate(invalid='ignore'):
+        ml = np.select([qty <= 400, qty <= 1000], ['S', 'M'], default='L')
+        g = np.select([qty <= 100, qty <= 400], ['S', 'M'], default='L')
+    return np.where(unit == 'ML', ml, np.where(unit == 'G', g, 'M'))
+
+
+def _similar_to(i, qty, unit, cat):
+    """is_quantity_similar(blok[i], blok[j]) - blok içindeki tüm j'ler için tek seferde"""
+    same_unit = unit == unit[i]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.maximum(qty, qty[i]) / np.minimum(qty, qty[i])
+    sifir = (qty == 0) | (qty[i] == 0)
+    return same_unit & (sifir | (~(ratio > 3) & (cat == cat[i])))
+
+
+def find_product_families(df):
+    """
+    Benzer ürün ailesi analizi
+    Kural: İlk 2 kelime + Son kelime (marka) + Mal Grubu + Gramaj (±%30) aynıysa = AİLE
+    """
+    isimler = df['Malzeme Adı']
+    parsed = df[ISIM_COLS] if all(c in df.columns for c in ISIM_COLS) else parse_product_names(isimler)
+    ilk2 = parsed['İlk2Kelime']
+    marka = parsed['Marka']
+    qty = parsed['Gramaj'].to_numpy(dtype=float)
+    unit = parsed['GramajBirim'].to_numpy(dtype=object)
+    cat = _size_category(qty, unit)
+
+    fark = df['Fark Miktarı'].to_numpy()
+    kismi = df['Kısmi Envanter Miktarı'].to_numpy()
+    onceki = df['Önceki Fark Miktarı'].to_numpy()
+    urun_grubu = df['Ürün Grubu'].to_numpy()
+    adlar = isimler.to_numpy()
+
+    keys = pd.DataFrame({'ilk2': ilk2.to_numpy(), 'marka': marka.to_numpy(), 'grup': urun_grubu})
+    bloklar = keys.groupby(['ilk2', 'marka', 'grup'], sort=False, dropna=True).indices
+
+    families = []
+    for (blok_ilk2, blok_marka, blok_grup), pos in bloklar.items():
+        if len(pos) <= 1 or not blok_ilk2 or not blok_marka:
+            continue
+
+        b_qty, b_unit, b_cat = qty[pos], unit[pos], cat[pos]
+        processed = np.zeros(len(pos), dtype=bool)
+
+        # Blok içinde sırayla: işlenmemiş her ürün kendine benzeyenlerle aile kurar
+        for i in range(len(pos)):
+            if processed[i]:
+                continue
+            uyeler = np.flatnonzero(_similar_to(i, b_qty, b_unit, b_cat))
+            processed[uyeler] = True
+
+            if len(uyeler) <= 1:
+                continue
+
+            aile_pos = pos[uyeler]
+            aile_fark = fark[aile_pos]
+            if np.abs(aile_fark).sum() <= 0:
+                continue
+
+            toplam_fark = aile_fark.sum()
+            toplam_kismi = kismi[aile_pos].sum()
+            toplam_onceki = onceki[aile_pos].sum()
+            aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
+
+            if abs(aile_toplami) <= 2:
+                sonuc = "KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL"
+                risk = "DÜŞÜK"
+            elif aile_toplami < -2:
+                sonuc = "AİLEDE NET AÇIK VAR"
+                risk = "ORTA"
+            else:
+                sonuc = "AİLEDE FAZLA VAR"
+                risk = "DÜŞÜK"
+
+            urunler = adlar[aile_pos[:5]].tolist()
+            farklar = aile_fark[:5].tolist()
+
+            families.append((pos[i], {
+                'Mal Grubu': blok_grup,
+                'İlk 2 Kelime': blok_ilk2,
+                'Marka': blok_marka,
+                'Ürün Sayısı': len(uyeler),
+                'Toplam Fark': toplam_fark,
+                'Toplam Kısmi': toplam_kismi,
+                'Toplam Önceki': toplam_onceki,
+                'AİLE TOPLAMI': aile_toplami,
+                'Sonuç': sonuc,
+                'Risk': risk,
+                'Ürünler': ' | '.join([f"{u[:25]}({f})" for u, f in zip(urunler, farklar)])
+            }))
+
+    # Aileler ilk ürünün tablodaki sırasına göre (eski satır satır taramayla aynı sıra)
+    families.sort(key=lambda x: x[0])
+    result_df = pd.DataFrame([f for _, f in families])
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
+
+    return result_df
+
+
+# ==================== TOPLU (ÇOK MAĞAZA) TESPİT ====================
+
+# Toplu tespitte çalışan dedektörler - anahtarlar app.py'deki tablo isimleriyle aynı
+MAGAZA_DEDEKTORLERI = {
+    'internal_df': (_internal_theft_rows, _internal_theft_finish),
+    'chronic_df': (_chronic_products_rows, _chronic_products_finish),
+    'chronic_fire_df': (_chronic_fire_rows, _chronic_fire_finish),
+    'fire_manip_df': (_fire_manipulation_rows, _fire_manipulation_finish),
+    'external_df': (_external_theft_rows, _external_theft_finish),
+}
+
+
+def detect_all_stores(df, magaza_col='Mağaza Kodu', kasa_kodlari=None):
+    """
+    Tüm dedektörleri çok mağazalı veri üzerinde TEK geçişte çalıştır
+    Dönüş: {mağaza_kodu: {'internal_df': ..., 'chronic_df': ..., ..., 'cigarette_df', 'family_df',
+            'kasa_df', 'kasa_summary'}}
+    Her mağazanın tabloları, o mağaza için tek tek çağrılan dedektörlerle aynıdır
+    Sigara / aile / kasa tablolarında sadece ilgili satırlar (sigara, çok üyeli aile bloğu, kasa kodu)
+    mağazalara bölünür - mağaza başına tüm veri taranmaz
+    """
+    if kasa_kodlari is None:
+        kasa_kodlari = KASA_AKTIVITESI_KODLARI
+
+    df = _ensure_features(df)
+    magazalar = df[magaza_col].dropna().unique().tolist()
+    sonuc = {mag: {name: pd.DataFrame() for name in MAGAZA_DEDEKTORLERI} for mag in magazalar}
+
+    for name, (rows_fn, finish_fn) in MAGAZA_DEDEKTORLERI.items():
+        mask, result_df = rows_fn(df)
+        if result_df is None:
+            continue
+
+        # Eşleşen satırların mağaza kodu - tablo satırlarıyla aynı sırada
+        mag_kodlari = df.loc[mask, magaza_col].to_numpy()
+        for mag, idx in pd.Series(np.arange(len(result_df))).groupby(mag_kodlari, sort=False):
+            if mag in sonuc:
+                sonuc[mag][name] = finish_fn(result_df.iloc[idx.to_numpy()].reset_index(drop=True).infer_objects())
+
+    for mag, tablolar in _store_tables(df, magazalar, magaza_col, kasa_kodlari).items():
+        sonuc[mag].update(tablolar)
+
+    return sonuc
+
+
+def _store_tables(df, magazalar, magaza_col, kasa_kodlari):
+    """Sigara açığı, ürün ailesi ve kasa aktivitesi tabloları - mağaza başına sadece ilgili satırlarla"""
+    tablolar = {mag: {'cigarette_df': pd.DataFrame(), 'family_df': pd.DataFrame()} for mag in magazalar}
+
+    sigara = df[df['SIGARA'].to_numpy(dtype=bool)]
+    for mag, sub in sigara.groupby(magaza_col, sort=False):
+        if mag in tablolar:
+            tablolar[mag]['cigarette_df'] = detect_cigarette_shortage(sub)
+
+    # Aile adayları: (mağaza, İlk2Kelime, Marka, Ürün Grubu) bloğunda 1'den fazla ürün olan satırlar
+    if not all(c in df.columns for c in ISIM_COLS):
+        df = add_name_features(df)
+    blok = pd.DataFrame({
+        'magaza': df[magaza_col].to_numpy(), 'ilk2': df['İlk2Kelime'].to_numpy(),
+        'marka': df['Marka'].to_numpy(), 'grup': df['Ürün Grubu'].to_numpy(), 'n': 1,
+    })
+    boyut = blok.groupby(['magaza', 'ilk2', 'marka', 'grup'], sort=False, dropna=True)['n'].transform('size')
+    aday = (boyut.to_numpy() > 1) & (blok['ilk2'].fillna('') != '').to_numpy() & (blok['marka'].fillna('') != '').to_numpy()
+    for mag, sub in df[aday].groupby(magaza_col, sort=False):
+        if mag in tablolar:
+            tablolar[mag]['family_df'] = find_product_families(sub)
+
+    _, eslesen, _, _ = _kasa_rows(df, kasa_kodlari)
+    kasa = dict(tuple(df[eslesen.to_numpy()].groupby(magaza_col, sort=False)))
+    for mag in magazalar:
+        tablolar[mag]['kasa_df'], tablolar[mag]['kasa_summary'] = check_kasa_activity_products(
+            kasa.get(mag, df.iloc[:0]), kasa_kodlari
+        )
+    return tablolar
+
@@ -0,0 +1,603 @@
+# ==================== SUPABASE TOPLU OKUMA ====================
+# Keyset pagination: WHERE id > son_id ORDER BY id LIMIT n
+# .range(offset, ...) her sayfada OFFSET taraması yapar (sayfa arttıkça yavaşlar),
+# keyset'te her sayfa index üzerinden doğrudan başlar → toplam okuma doğrusal
+
+import csv
+import io
+import json
+import os
+import random
+import re
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Sayfa boyutu: PostgREST max-rows (Supabase varsayılanı 1000) değerini aşmamalı,
+# aksi halde sunucu sayfayı keser ve okuma erken biter
+PAGE_SIZE = int(os.environ.get('SUPABASE_PAGE_SIZE', 1000))
+
+# Tel formatı: 'json' (varsayılan) veya 'csv' (Accept: text/csv + pd.read_csv)
+WIRE_FORMAT = os.environ.get('SUPABASE_WIRE_FORMAT', 'json').lower()
+
+# CSV okumada sabit tipler (envanter_veri ve surekli_envanter kolonları)
+# Metin kolonları str: '0012' gibi kodlar sayıya dönmez; tutar/miktar float64
+_METIN = ['magaza_kodu', 'magaza_tanim', 'satis_muduru', 'bolge_sorumlusu', 'depolama_kosulu_grubu',
+          'depolama_kosulu', 'envanter_donemi', 'envanter_tarihi', 'envanter_baslangic_tarihi',
+          'mal_grubu_tanimi', 'malzeme_kodu', 'malzeme_tanimi']
+_SAYI = ['satis_fiyati', 'fark_miktari', 'fark_tutari', 'kismi_envanter_miktari', 'kismi_envanter_tutari',
+         'fire_miktari', 'fire_tutari', 'onceki_fark_miktari', 'onceki_fire_miktari', 'satis_miktari',
+         'satis_hasilati', 'iptal_satir_miktari']
+CSV_DTYPES = {**{c: str for c in _METIN}, **{c: 'float64' for c in _SAYI}, 'id': 'int64'}
+
+
+def apply_filters(query, filters=None):
+    """[(metod, kolon, değer), ...] filtrelerini sorguya uygula: ('eq', 'magaza_kodu', '5001')"""
+    for method, col, value in filters or []:
+        query = getattr(query, method)(col, value)
+    return query
+
+
+def fetch_keyset(client, table, columns, filters=None, page_size=None, key='id', max_rows=None):
+    """
+    Tabloyu key kolonuna göre sıralı, keyset sayfalarıyla oku
+    columns: virgülle ayrılmış kolon listesi (key yoksa eklenir, dönüşte çıkarılır)
+    max_rows: üst sınır (sonsuz döngü / aşırı veri koruması)
+    Dönüş: satır dict listesi
+    """
+    page_size = page_size or PAGE_SIZE
+    kolonlar = [c.strip() for c in columns.split(',')]
+    key_ekli = key not in kolonlar
+    if key_ekli:
+        kolonlar.append(key)
+    select = ','.join(kolonlar)
+
+    all_data = []
+    last_key = None
+    while max_rows is None or len(all_data) < max_rows:
+        query = apply_filters(client.table(table).select(select), filters)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        result = query.order(key).limit(page_size).execute()
+
+        if not result.data:
+            break
+
+        last_key = result.data[-1][key]
+        if key_ekli:
+            for row in result.data:
+                row.pop(key, None)
+        all_data.extend(result.data)
+
+        # Son sayfa: page_size'dan az satır
+        if len(result.data) < page_size:
+            break
+
+    return all_data if max_rows is None else all_data[:max_rows]
+
+
+def page_frame(rows, column_mapping=None, dtypes=None):
+    """
+    JSON sayfasını tipli DataFrame parçasına çevir
+    Sayı kolonları float64'e, kolon adları column_mapping ile uygulama adlarına çevrilir
+    """
+    df = pd.DataFrame(rows)
+    dtypes = CSV_DTYPES if dtypes is None else dtypes
+    for col in df.columns:
+        if dtypes.get(col) != 'float64' or df[col].dtype == 'float64':
+            continue
+        if df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        df[col] = df[col].astype('float64')
+    return df.rename(columns=column_mapping) if column_mapping else df
+
+
+def fetch_keyset_frame(client, table, columns, filters=None, page_size=None, key='id', max_rows=None,
+                       column_mapping=None, dtypes=None):
+    """
+    fetch_keyset'in kolonlu versiyonu: her JSON sayfası gelir gelmez tipli parçaya çevrilir,
+    dict listesi birikmez; parçalar sonda tek concat ile birleştirilir (tepe bellek ≈ son tablo)
+    Dönüş: DataFrame (key sırası, column_mapping uygulanmış)
+    """
+    page_size = page_size or PAGE_SIZE
+    kolonlar = [c.strip() for c in columns.split(',')]
+    key_ekli = key not in kolonlar
+    if key_ekli:
+        kolonlar.append(key)
+    select = ','.join(kolonlar)
+
+    chunks = []
+    toplam = 0
+    last_key = None
+    while max_rows is None or toplam < max_rows:
+        query = apply_filters(client.table(table).select(select), filters)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        rows = query.order(key).limit(page_size).execute().data
+
+        if not rows:
+            break
+
+        last_key = rows[-1][key]
+        chunk = page_frame(rows, column_mapping, dtypes)
+        if key_ekli:
+            chunk = chunk.drop(columns=[(column_mapping or {}).get(key, key)])
+        chunks.append(chunk)
+        toplam += len(chunk)
+
+        # Son sayfa: page_size'dan az satır
+        if len(chunk) < page_size:
+            break
+
+    return _concat_chunks(chunks, max_rows)
+
+
+def _concat_chunks(chunks, max_rows=None):
+    """Parçaları tek seferde birleştir (boşsa boş DataFrame)"""
+    if not chunks:
+        return pd.DataFrame()
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return df if max_rows is None else df.iloc[:max_rows]
+
+
+def parse_csv_page(text, dtypes=None):
+    """
+    PostgREST CSV yanıtını DataFrame'e çevir (sadece boş alan NULL sayılır)
+    Boş gövde veya sadece başlık satırı → boş DataFrame
+    """
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('utf-8')
+    if not text or not text.strip():
+        return pd.DataFrame()
+    dtypes = CSV_DTYPES if dtypes is None else dtypes
+    header = next(csv.reader(io.StringIO(text)))
+    return pd.read_csv(
+        io.StringIO(text),
+        dtype={c: t for c, t in dtypes.items() if c in header},
+        keep_default_na=False, na_values=[''],
+    )
+
+
+def fetch_keyset_csv(client, table, columns, filters=None, page_size=None, key='id', max_rows=None,
+                     column_mapping=None, dtypes=None):
+    """
+    fetch_keyset'in CSV versiyonu: sayfalar text/csv olarak istenir, read_csv ile tipli parse edilir
+    JSON dict listesi oluşmaz - daha küçük yanıt, daha hızlı decode
+    İstemcide .csv() yoksa (eski postgrest-py / farklı istemci) JSON sayfalarına düşülür,
+    yanıt metin yerine JSON gelirse o sayfa page_frame ile çevrilir
+    Dönüş: DataFrame (key sırası)
+    """
+    page_size = page_size or PAGE_SIZE
+    kolonlar = [c.strip() for c in columns.split(',')]
+    key_ekli = key not in kolonlar
+    if key_ekli:
+        kolonlar.append(key)
+    select = ','.join(kolonlar)
+
+    if not hasattr(client.table(table).select(select), 'csv'):
+        return fetch_keyset_frame(client, table, columns, filters, page_size, key, max_rows,
+                                  column_mapping, dtypes)
+
+    chunks = []
+    toplam = 0
+    last_key = None
+    while max_rows is None or toplam < max_rows:
+        query = apply_filters(client.table(table).select(select), filters)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        data = query.order(key).limit(page_size).csv().execute().data
+        if isinstance(data, (str, bytes, bytearray)) or data is None:
+            page = parse_csv_page(data, dtypes)
+        else:
+            page = page_frame(data, dtypes=dtypes)
+
+        if len(page) == 0:
+            break
+
+        last_key = page[key].iloc[-1]
+        last_key = last_key.item() if hasattr(last_key, 'item') else last_key
+        if key_ekli:
+            page = page.drop(columns=[key])
+        chunks.append(page.rename(columns=column_mapping) if column_mapping else page)
+        toplam += len(page)
+
+        if len(page) < page_size:
+            break
+
+    return _concat_chunks(chunks, max_rows)
+
+
+# ==================== EŞZAMANLI OKUMA ====================
+# Anahtar uzayı id aralıklarına bölünür (dönem/mağaza filtreleri her bölüme eklenir),
+# her bölüm keyset ile sınırlı bir thread havuzunda okunur, sonuç bölüm sırasıyla birleştirilir
+# progress(tamamlanan, toplam) ana thread'den çağrılır (Streamlit bileşenleri thread-safe değil)
+
+FETCH_WORKERS = int(os.environ.get('SUPABASE_FETCH_WORKERS', 4))
+
+
+def key_bounds(client, table, filters=None, key='id'):
+    """Filtrelenmiş tablodaki en küçük ve en büyük anahtar (kayıt yoksa None, None)"""
+    ilk = apply_filters(client.table(table).select(key), filters).order(key).limit(1).execute()
+    if not ilk.data:
+        return None, None
+    son = apply_filters(client.table(table).select(key), filters).order(key, desc=True).limit(1).execute()
+    return ilk.data[0][key], son.data[0][key]
+
+
+def id_partitions(client, table, filters=None, n=16, key='id'):
+    """Sayısal anahtar uzayını n eşit aralığa böl → [[('gte', key, a), ('lt', key, b)], ...]"""
+    alt, ust = key_bounds(client, table, filters, key)
+    if alt is None:
+        return []
+    adim = max(1, -(-(ust - alt + 1) // n))
+    return [[('gte', key, a), ('lt', key, a + adim)] for a in range(alt, ust + 1, adim)]
+
+
+def fetch_concurrent(client, table, columns, partitions, filters=None, page_size=None, key='id',
+                     max_rows=None, max_workers=None, progress=None, wire='json', column_mapping=None):
+    """
+    Bölümleri eşzamanlı oku, bölüm sırasıyla birleştir
+    partitions: her biri ek filtre listesi (id_partitions)
+    progress: progress(tamamlanan_bolum, toplam_bolum) - ana thread'de çağrılır
+    wire: 'json' (sayfa başına tipli parça) veya 'csv'
+    Dönüş: DataFrame (bölüm sırası, bölüm içinde key sırası)
+    """
+    fetch = fetch_keyset_csv if wire == 'csv' else fetch_keyset_frame
+    parcalar = _run_partitions(fetch, client, table, columns, partitions, filters,
+                               page_size, key, max_rows, max_workers, progress, column_mapping)
+    return _concat_chunks([p for p in parcalar if len(p) > 0], max_rows)
+
+
+def _run_partitions(fetch, client, table, columns, partitions, filters, page_size, key, max_rows,
+                    max_workers, progress, column_mapping=None):
+    """Bölümleri thread havuzunda fetch ile oku → bölüm sırasında sonuç listesi"""
+    if not partitions:
+        return []
+
+    parcalar = [None] * len(partitions)
+    with ThreadPoolExecutor(max_workers=max_workers or FETCH_WORKERS) as pool:
+        futures = {
+            pool.submit(fetch, client, table, columns, list(filters or []) + bolum,
+                        page_size, key, max_rows, column_mapping): i
+            for i, bolum in enumerate(partitions)
+        }
+        for tamamlanan, future in enumerate(as_completed(futures), start=1):
+            parcalar[futures[future]] = future.result()
+            if progress is not None:
+                progress(tamamlanan, len(partitions))
+    return parcalar
+
+
+# ==================== MEVCUT ENVANTER KONTROLÜ ====================
+# (Mağaza, Dönem, Depolama Grubu) anahtarlarının varlığı tek RPC çağrısıyla (ENVANTER_MEVCUT_RPC.sql)
+# RPC kurulu değilse hata çağırana gider - çağıran kullanıcıyı uyarıp existing_inventory_keys_per_key'e
+# düşer (anahtar başına limit(1) sorgusu, eski davranış)
+
+EXISTS_RPC = 'envanter_mevcut_anahtarlar'
+
+
+def existing_inventory_keys(client, keys, chunk_size=1000):
+    """
+    keys: [(magaza_kodu, envanter_donemi, depolama_kosulu_grubu), ...] (str)
+    Dönüş: envanter_veri'de zaten bulunan anahtarların set'i
+    RPC yoksa / hata verirse exception fırlatır
+    """
+    keys = list(keys)
+    mevcut = set()
+    for i in range(0, len(keys), chunk_size):
+        parca = keys[i:i + chunk_size]
+        result = client.rpc(EXISTS_RPC, {
+            'p_magaza': [k[0] for k in parca],
+            'p_donem': [k[1] for k in parca],
+            'p_depolama': [k[2] for k in parca],
+        }).execute()
+        mevcut.update(
+            (r['magaza_kodu'], r['envanter_donemi'], r['depolama_kosulu_grubu'])
+            for r in result.data or []
+        )
+    return mevcut
+
+
+def existing_inventory_keys_per_key(client, keys, table='envanter_veri'):
+    """RPC'siz yedek: anahtar başına limit(1) sorgusu (hata veren anahtar mevcut sayılmaz - eski davranış)"""
+    mevcut = set()
+    for magaza, donem, depolama in keys:
+        try:
+            result = client.table(table).select('id').eq('magaza_kodu', magaza).eq(
+                'envanter_donemi', donem
+            ).eq('depolama_kosulu_grubu', depolama).limit(1).execute()
+            if result.data:
+                mevcut.add((magaza, donem, depolama))
+        except Exception:
+            pass
+    return mevcut
+
+
+# ==================== KAYIT SERİLEŞTİRME ====================
+# DataFrame → insert/upsert kayıtları: satır satır iterrows + isinstance yerine kolon bazlı dönüşüm
+# Tarih → 'YYYY-MM-DD', NaN/NaT → None, numpy sayılar → Python int/float
+# Kayıtlar hazır kolonlardan tek geçişte kurulur: to_dict('records') her hücrede tip kutulaması
+# yaptığı için (100k × 25 kolonda ~2 sn) kolonlar zaten Python tipindeyken zip ile kurmak ~4x hızlı
+# Karışık tipli object kolonlar (nadir) eski değer bazlı kurala düşer
+
+_TR_ONDALIK = r'-?\d+,\d+'
+
+
+def _serialize_value(val, parse_decimals=False):
+    """Tek değer dönüşümü (eski satır bazlı kural) - sadece karışık tipli kolonlarda kullanılır"""
+    if pd.isna(val):
+        return None
+    if isinstance(val, pd.Timestamp):
+        return val.strftime('%Y-%m-%d')
+    if isinstance(val, np.integer):
+        return int(val)
+    if isinstance(val, np.floating):
+        return float(val)
+    if parse_decimals and isinstance(val, str):
+        val = val.strip()
+        if re.fullmatch(_TR_ONDALIK, val):
+            return float(val.replace(',', '.'))
+    return val
+
+
+def _serialize_column(s, parse_decimals=False):
+    """Bir kolonu JSON'a uygun Python değerlerinden oluşan object dizisine çevir"""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime('%Y-%m-%d').astype(object).where(s.notna(), None).to_numpy()
+
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_object_dtype(s):
+        # astype(object): int64 → int, float64 → float, bool → bool (Python tipleri)
+        return s.astype(object).where(s.notna(), None).to_numpy()
+
+    tip = pd.api.types.infer_dtype(s, skipna=True)
+    if tip == 'string':
+        out = s.astype(object)
+        if parse_decimals:
+            out = out.str.strip()
+            ondalik = out.str.fullmatch(_TR_ONDALIK, na=False)
+            if ondalik.any():
+                out = out.copy()
+                out[ondalik] = out[ondalik].str.replace(',', '.', regex=False).astype(float)
+        return out.where(s.notna(), None).to_numpy()
+    if tip == 'empty':
+        return np.full(len(s), None, dtype=object)
+
+    return np.array([_serialize_value(v, parse_decimals) for v in s.to_numpy(object)], dtype=object)
+
+
+def serialize_records(df, column_mapping, parse_decimals=False):
+    """
+    DataFrame'i Supabase kayıt listesine çevir
+    column_mapping: {excel_kolonu: db_kolonu} - df'te olmayan kolonlar kayda girmez
+    parse_decimals: metinleri kırp, Türkçe ondalıkları sayıya çevir ('0,5' → 0.5)
+    """
+    kolonlar = {
+        db_col: _serialize_column(df[excel_col], parse_decimals)
+        for excel_col, db_col in column_mapping.items() if excel_col in df.columns
+    }
+    if not kolonlar:
+        return [{} for _ in range(len(df))]
+    anahtarlar = list(kolonlar)
+    return [dict(zip(anahtarlar, satir)) for satir in zip(*kolonlar.values())]
+
+
+# ==================== EŞZAMANLI TOPLU YAZMA ====================
+# Sabit 500 satırlık sıralı batch yerine: batch'ler JSON gövde boyutuna göre kesilir
+# (geniş satırlar küçük, dar satırlar büyük batch), sınırlı thread havuzunda eşzamanlı gönderilir,
+# hata alan batch artan beklemeyle tekrar denenir; yine de yazılamayan kayıtlar kaybolmaz, geri döner
+# progress(yazilan_satir, toplam_satir) ana thread'den çağrılır
+
+WRITE_WORKERS = int(os.environ.get('SUPABASE_WRITE_WORKERS', 4))
+# PostgREST gövde sınırının (varsayılan ~1-2 MB, proxy'ye göre değişir) güvenli tarafında
+BATCH_BYTES = int(os.environ.get('SUPABASE_BATCH_BYTES', 512 * 1024))
+MAX_BATCH_ROWS = int(os.environ.get('SUPABASE_MAX_BATCH_ROWS', 5000))
+WRITE_RETRIES = 3
+_JSON = json.JSONEncoder(default=str)  # json.dumps(default=...) her çağrıda yeni encoder kurar
+
+
+def byte_batches(records, max_bytes=None, max_rows=None):
+    """Kayıtları JSON boyutu max_bytes'ı (ve satır sayısı max_rows'u) aşmayan batch'lere böl"""
+    max_bytes = max_bytes or BATCH_BYTES
+    max_rows = max_rows or MAX_BATCH_ROWS
+    batch, boyut = [], 2  # '[' + ']'
+    for rec in records:
+        n = len(_JSON.encode(rec)) + 2  # ', ' ayırıcı
+        if batch and (boyut + n > max_bytes or len(batch) >= max_rows):
+            yield batch
+            batch, boyut = [], 2
+        batch.append(rec)
+        boyut += n
+    if batch:
+        yield batch
+
+
+# İstek sunucuya hiç ulaşmadan oluşan hatalar (bağlantı reddi, DNS, bağlantı/havuz zaman aşımı)
+# Sadece bunlarda insert tekrar denenir: okuma zaman aşımı / 5xx sonrası batch sunucuda yazılmış
+# olabilir, tekrar göndermek çift kayıt üretir (v_magaza_ozet'te Fark/Fire iki kat)
+_GONDERIM_ONCESI_HATALAR = (ConnectionRefusedError, socket.gaierror)
+try:
+    import httpx
+    _GONDERIM_ONCESI_HATALAR += (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+except ImportError:
+    pass
+
+
+def _retry_safe(error, on_conflict=None, idempotent=False):
+    """Batch tekrar gönderilebilir mi: upsert / idempotent hedef her zaman, insert sadece gönderim öncesi hatada"""
+    return bool(on_conflict) or idempotent or isinstance(error, _GONDERIM_ONCESI_HATALAR)
+
+
+def _send_batch(client, table, batch, on_conflict=None, retries=None, backoff=0.5, idempotent=False):
+    """Tek batch'i gönder, güvenliyse backoff * 2^deneme (+ jitter) bekleyip tekrar dene"""
+    retries = WRITE_RETRIES if retries is None else retries
+    for deneme in range(retries + 1):
+        try:
+            query = client.table(table)
+            # returning='minimal': yazılan satırlar yanıtta geri gönderilmez (yanıt gövdesi boş)
+            if on_conflict:
+                query = query.upsert(batch, on_conflict=on_conflict, returning='minimal')
+            else:
+                query = query.insert(batch, returning='minimal')
+            query.execute()
+            return None
+        except Exception as e:
+            if deneme == retries or not _retry_safe(e, on_conflict, idempotent):
+                return str(e)
+            time.sleep(backoff * (2 ** deneme) * (1 + random.random() / 2))
+
+
+def write_batches(client, table, records, on_conflict=None, max_bytes=None, max_rows=None,
+                  max_workers=None, retries=None, backoff=0.5, progress=None, idempotent=False):
+    """
+    Kayıtları boyut bazlı batch'lerle eşzamanlı yaz
+    on_conflict: verilirse upsert (her hatada tekrar denenir), yoksa insert (sadece gönderim öncesi
+    hatalarda tekrar denenir - yanıtı alınamayan batch tekrar gönderilmez, hatali_kayitlar'a düşer)
+    idempotent: çift yazılan satırlar sonradan elenen hedefler (staging) için insert de her hatada denenir
+    Dönüş: {'yazilan', 'hatali_kayitlar', 'hatalar', 'batch', 'sure', 'hiz'} - hiz: satır/sn
+    """
+    baslangic = time.perf_counter()
+    batches = list(byte_batches(records, max_bytes, max_rows))
+    toplam = sum(len(b) for b in batches)
+    yazilan, hatali, hatalar = 0, [], []
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=max_workers or WRITE_WORKERS) as pool:
+            futures = {
+                pool.submit(_send_batch, client, table, batch, on_conflict, retries, backoff, idempotent): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                hata = future.result()
+                if hata is None:
+                    yazilan += len(batch)
+                else:
+                    hatali.extend(batch)
+                    hatalar.append(hata)
+                if progress is not None:
+                    progress(yazilan + len(hatali), toplam)
+
+    sure = time.perf_counter() - baslangic
+    return {
+        'yazilan': yazilan,
+        'hatali_kayitlar': hatali,
+        'hatalar': hatalar,
+        'batch': len(batches),
+        'sure': sure,
+        'hiz': yazilan / sure if sure > 0 else 0.0,
+    }
+
+
+# ==================== İKİYE BÖLEREK TEKRAR DENEME ====================
+# Hata alan batch satır satır değil ikiye bölünerek tekrar gönderilir:
+# N satırda tek bozuk kayıt ~2·log2(N) ek istekle bulunur, sağlam yarılar tek istekte yazılır
+# Bölme sadece veri/kısıt hatalarında yapılır (SQLSTATE 22xxx / 23xxx); ağ, yetki, zaman aşımı gibi
+# veriden bağımsız hatalarda kalan kayıtlar bölünmeden topluca reddedilir
+# İki yarının aynı veri hatasını vermesi sistemik hata sayılmaz: farklı yarılara düşen iki bozuk satır
+# aynı NOT NULL / 22P02 mesajını verir, sağlam satırlar ancak bölmeye devam edilerek yazılır
+
+_VERI_HATASI = re.compile(r'\b2[23][0-9A-Z]{3}\b')
+
+
+def _data_error(hata):
+    """Hata mesajı Postgres veri (22xxx) veya kısıt (23xxx) hatası mı"""
+    return bool(_VERI_HATASI.search(hata or ''))
+
+
+def bisect_write(client, table, records, on_conflict=None, backoff=0.5):
+    """
+    Kayıtları tek istekte yaz (hata olursa backoff ile 1 kez daha); yine hata olursa
+    batch'i yarılara bölüp tekrar dene (tek kayda inene kadar)
+    Dönüş: (yazilan, reddedilen_kayitlar, hatalar) - hatalar[i] reddedilen_kayitlar[i]'nin hata mesajı
+    """
+    records = list(records)
+    if not records:
+        return 0, [], []
+
+    hata = _send_batch(client, table, records, on_conflict, retries=1, backoff=backoff)
+    if hata is None:
+        return len(records), [], []
+    if not _data_error(hata):
+        return 0, records, [hata] * len(records)
+
+    yazilan, reddedilen, hatalar = 0, [], []
+    yigin = [(records, hata)]  # hata almış, bölünecek parçalar
+    while yigin:
+        parca, hata = yigin.pop()
+        if len(parca) == 1:
+            reddedilen.append(parca[0])
+            hatalar.append(hata)
+            continue
+
+        orta = len(parca) // 2
+        yarilar = [parca[:orta], parca[orta:]]
+        sonuclar = [_send_batch(client, table, y, on_conflict, retries=0) for y in yarilar]
+        yazilan += sum(len(y) for y, h in zip(yarilar, sonuclar) if h is None)
+
+        bolunecek = []
+        for y, h in zip(yarilar, sonuclar):
+            if h is None:
+                continue
+            if _data_error(h):
+                bolunecek.append((y, h))
+            else:
+                reddedilen.extend(y)
+                hatalar.extend([h] * len(y))
+        yigin.extend(reversed(bolunecek))  # önce ilk yarı işlenir
+    return yazilan, reddedilen, hatalar
+
+
+# ==================== STAGING ÜZERİNDEN TOPLU YÜKLEME ====================
+# Büyük yüklemeler önce envanter_veri_staging'e yazılır (UNLOGGED, index yok),
+# ardından tek RPC ile sunucuda, tek transaction'da envanter_veri'ye aktarılır (ENVANTER_TOPLU_YUKLEME.sql)
+# Yarım kalan yükleme envanter_veri'ye hiç geçmez; v_magaza_ozet sonda bir kez refresh edilir
+
+STAGING_TABLE = 'envanter_veri_staging'
+MERGE_RPC = 'envanter_staging_birlestir'
+STAGING_MIN_ROWS = int(os.environ.get('SUPABASE_STAGING_MIN_ROWS', 50_000))
+
+
+def _clear_staging(client, staging_table, yukleme_id):
+    try:
+        client.table(staging_table).delete().eq('yukleme_id', yukleme_id).execute()
+    except Exception as e:
+        print(f"Staging temizlenemedi ({yukleme_id}): {str(e)[:100]}")
+
+
+def staged_load(client, records, staging_table=STAGING_TABLE, merge_rpc=MERGE_RPC, refresh=True, **kwargs):
+    """
+    Kayıtları staging tablosuna yaz (write_batches), tamamı yazıldıysa sunucuda birleştir
+    kwargs: write_batches parametreleri (max_bytes, max_workers, retries, progress, ...)
+    Dönüş: write_batches sonucu + 'birlesen' (envanter_veri'ye eklenen satır sayısı)
+    Staging tablosu / RPC kurulu değilse Exception fırlatır (çağıran doğrudan yazmaya düşer)
+    """
+    baslangic = time.perf_counter()
+    # Tablo yoksa her batch'i tekrar denemeden önce hızlıca hata ver
+    client.table(staging_table).select('yukleme_id').limit(1).execute()
+
+    yukleme_id = uuid.uuid4().hex
+    # Tekrar gönderilen batch staging'de çift satır bırakabilir; birleştirme RPC'si anahtar başına
+    # tek satır aldığı için (DISTINCT ON) staging yazımı her hatada güvenle tekrar denenir
+    sonuc = write_batches(client, staging_table, [{**r, 'yukleme_id': yukleme_id} for r in records],
+                          idempotent=True, **kwargs)
+    sonuc['birlesen'] = 0
+
+    if sonuc['hatali_kayitlar']:
+        # Eksik yükleme birleştirilmez: ya hepsi ya hiçbiri
+        _clear_staging(client, staging_table, yukleme_id)
+        return sonuc
+
+    try:
+        result = client.rpc(merge_rpc, {'p_yukleme_id': yukleme_id, 'p_refresh': refresh}).execute()
+    except Exception:
+        _clear_staging(client, staging_table, yukleme_id)
+        raise
+
+    sonuc['birlesen'] = int(result.data or 0)
+    sonuc['sure'] = time.perf_counter() - baslangic
+    sonuc['hiz'] = sonuc['birlesen'] / sonuc['sure'] if sonuc['sure'] > 0 else 0.0
+    return sonuc
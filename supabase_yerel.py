@@ -0,0 +1,243 @@
+# ==================== YEREL SUPABASE (SQLite) ====================
+# Yazma/okuma yollarını Supabase olmadan denemek için supabase-py istemcisinin küçük bir alt kümesi
+# table(t).select/insert/upsert/delete + eq/in_/gt/gte/lt/lte/order/limit, rpc(ad, parametreler)
+# RPC'ler SQL dosyalarındaki fonksiyonların Python/SQLite ile yeniden yazılmış karşılığı:
+#   envanter_mevcut_anahtarlar (ENVANTER_MEVCUT_RPC.sql), envanter_staging_birlestir (ENVANTER_TOPLU_YUKLEME.sql),
+#   refresh_magaza_ozet (sadece sayaç)
+# DİKKAT: SQL dosyalarındaki PL/pgSQL burada ÇALIŞTIRILMAZ, sadece mantığı taklit edilir.
+# information_schema kolon listesi, LIKE envanter_veri, eski staging satırlarının DELETE'i ve
+# Postgres tip/izin davranışı test edilmez - SQL değişiklikleri gerçek Postgres'te ayrıca denenmeli
+# Tablolar ilk yazmada kayıt anahtarlarından oluşturulur, yeni anahtarlar kolon olarak eklenir
+
+import sqlite3
+import threading
+import time
+
+from supabase_io import EXISTS_RPC, MERGE_RPC, STAGING_TABLE
+
+ENV_KEY = ('magaza_kodu', 'envanter_donemi', 'depolama_kosulu_grubu')
+SATIR_KEY = ENV_KEY + ('malzeme_kodu',)
+
+
+class APIError(Exception):
+    """PostgREST hata yanıtı karşılığı"""
+
+
+class _Sonuc:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Sorgu:
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.islem, self.kolonlar, self.kayitlar = 'select', '*', None
+        self.kosullar, self.parametreler = [], []
+        self.sira, self.limit_ = None, None
+
+    def select(self, columns='*', count=None):
+        self.islem, self.kolonlar = 'select', columns
+        return self
+
+    def insert(self, json, returning=None, **kwargs):
+        self.islem, self.kayitlar = 'insert', json if isinstance(json, list) else [json]
+        return self
+
+    def upsert(self, json, on_conflict=None, returning=None, **kwargs):
+        # Unique anahtar tanımı yok: upsert yerelde insert gibi davranır
+        return self.insert(json)
+
+    def delete(self):
+        self.islem = 'delete'
+        return self
+
+    def _kosul(self, col, op, value):
+        self.kosullar.append(f'"{col}" {op} ?')
+        self.parametreler.append(value)
+        return self
+
+    def eq(self, col, value):
+        return self._kosul(col, '=', value)
+
+    def gt(self, col, value):
+        return self._kosul(col, '>', value)
+
+    def gte(self, col, value):
+        return self._kosul(col, '>=', value)
+
+    def lt(self, col, value):
+        return self._kosul(col, '<', value)
+
+    def lte(self, col, value):
+        return self._kosul(col, '<=', value)
+
+    def in_(self, col, values):
+        values = list(values)
+        self.kosullar.append(f'"{col}" IN ({",".join("?" * len(values))})' if values else '0')
+        self.parametreler.extend(values)
+        return self
+
+    def order(self, col, desc=False):
+        self.sira = f'"{col}"' + (' DESC' if desc else '')
+        return self
+
+    def limit(self, n):
+        self.limit_ = n
+        return self
+
+    def execute(self):
+        if self.islem == 'insert':
+            return _Sonuc(self.db.insert(self.table, self.kayitlar))
+
+        where = f" WHERE {' AND '.join(self.kosullar)}" if self.kosullar else ''
+        if self.islem == 'delete':
+            return _Sonuc(self.db.execute(f'DELETE FROM "{self.table}"{where}', self.parametreler))
+
+        kolonlar = '*' if self.kolonlar.strip() == '*' else ', '.join(
+            f'"{c.strip()}"' for c in self.kolonlar.split(',')
+        )
+        sql = f'SELECT {kolonlar} FROM "{self.table}"{where}'
+        if self.sira:
+            sql += f' ORDER BY {self.sira}'
+        if self.limit_ is not None:
+            sql += f' LIMIT {int(self.limit_)}'
+        return _Sonuc(self.db.select(sql, self.parametreler))
+
+
+class _RPC:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params or {}
+
+    def execute(self):
+        fonksiyon = self.db.rpcler.get(self.name)
+        if fonksiyon is None:
+            raise APIError(f"PGRST202: function {self.name} not found")
+        return _Sonuc(fonksiyon(**self.params))
+
+
+class YerelSupabase:
+    """
+    SQLite üzerinde supabase-py benzeri istemci (varsayılan: bellek içi)
+    staging=False: staging tablosu kurulu olmayan veritabanı (doğrudan yazmaya düşüşü denemek için)
+    save_to_supabase / staged_load / fetch_keyset gibi fonksiyonlar doğrudan bu istemciyle çalışır
+    """
+
+    def __init__(self, path=':memory:', latency=0.0, staging=True):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.latency = latency  # istek başına simüle edilen ağ gecikmesi (sn)
+        self.istek = 0
+        self.refresh_sayisi = 0
+        self.rpcler = {
+            EXISTS_RPC: self._mevcut_anahtarlar,
+            MERGE_RPC: self._staging_birlestir,
+            'refresh_magaza_ozet': self._refresh,
+        }
+        if staging:
+            # ENVANTER_TOPLU_YUKLEME.sql STEP 1 karşılığı (veri kolonları ilk yazmada eklenir)
+            with self.conn:
+                self._tablo_hazirla(STAGING_TABLE, ['yukleme_id', 'yukleme_zamani'])
+
+    def table(self, name):
+        return _Sorgu(self, name)
+
+    def rpc(self, name, params=None):
+        return _RPC(self, name, params)
+
+    # ---------- SQLite yardımcıları ----------
+
+    def _bekle(self):
+        self.istek += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _kolonlar(self, table):
+        return [r['name'] for r in self.conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def _tablo_hazirla(self, table, kolonlar):
+        """Tablo yoksa oluştur, eksik kolonları ekle (SQLite dinamik tipli)"""
+        mevcut = self._kolonlar(table)
+        if not mevcut:
+            self.conn.execute(f'CREATE TABLE "{table}" (id INTEGER PRIMARY KEY AUTOINCREMENT)')
+            mevcut = ['id']
+        for col in kolonlar:
+            if col not in mevcut:
+                self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+                mevcut.append(col)
+
+    def insert(self, table, kayitlar):
+        self._bekle()
+        if not kayitlar:
+            return []
+        kolonlar = list(dict.fromkeys(k for r in kayitlar for k in r))
+        liste = ', '.join(f'"{c}"' for c in kolonlar)
+        with self.lock, self.conn:
+            self._tablo_hazirla(table, kolonlar)
+            self.conn.executemany(
+                f'INSERT INTO "{table}" ({liste}) VALUES ({", ".join("?" * len(kolonlar))})',
+                [tuple(r.get(c) for c in kolonlar) for r in kayitlar],
+            )
+        return []
+
+    def select(self, sql, parametreler=()):
+        self._bekle()
+        with self.lock:
+            try:
+                return [dict(r) for r in self.conn.execute(sql, parametreler)]
+            except sqlite3.OperationalError as e:
+                raise APIError(str(e))
+
+    def execute(self, sql, parametreler=()):
+        self._bekle()
+        with self.lock, self.conn:
+            try:
+                self.conn.execute(sql, parametreler)
+            except sqlite3.OperationalError as e:
+                raise APIError(str(e))
+        return []
+
+    # ---------- RPC karşılıkları ----------
+
+    def _mevcut_anahtarlar(self, p_magaza, p_donem, p_depolama):
+        self._bekle()
+        if 'magaza_kodu' not in self._kolonlar('envanter_veri'):
+            return []
+        with self.lock:
+            mevcut = {
+                tuple(r) for r in self.conn.execute(
+                    # Supabase'de anahtar kolonları TEXT: karşılaştırma metin olarak
+                    'SELECT DISTINCT ' + ', '.join(f'CAST({c} AS TEXT)' for c in ENV_KEY) + ' FROM envanter_veri'
+                )
+            }
+        return [dict(zip(ENV_KEY, k)) for k in zip(p_magaza, p_donem, p_depolama) if k in mevcut]
+
+    def _staging_birlestir(self, p_yukleme_id, p_refresh=True):
+        """ENVANTER_TOPLU_YUKLEME.sql envanter_staging_birlestir ile aynı adımlar, tek transaction"""
+        self._bekle()
+        with self.lock, self.conn:
+            kolonlar = [c for c in self._kolonlar(STAGING_TABLE) if c not in ('id', 'yukleme_id', 'yukleme_zamani')]
+            if not kolonlar:
+                return 0
+            self._tablo_hazirla('envanter_veri', kolonlar)
+            liste = ', '.join(f'"{c}"' for c in kolonlar)
+            # DISTINCT ON (SATIR_KEY) karşılığı: anahtar başına staging'deki ilk satır
+            eklenen = self.conn.execute(
+                f'INSERT INTO envanter_veri ({liste}) '
+                f'SELECT {liste} FROM {STAGING_TABLE} s '
+                f'WHERE s.yukleme_id = ? AND s.id IN ('
+                f'  SELECT MIN(id) FROM {STAGING_TABLE} WHERE yukleme_id = ? GROUP BY {", ".join(SATIR_KEY)}'
+                f') AND NOT EXISTS ('
+                f'  SELECT 1 FROM envanter_veri e WHERE '
+                + ' AND '.join(f'e.{c} = s.{c}' for c in ENV_KEY) + ')',
+                (p_yukleme_id, p_yukleme_id),
+            ).rowcount
+            self.conn.execute(f'DELETE FROM {STAGING_TABLE} WHERE yukleme_id = ?', (p_yukleme_id,))
+        if eklenen > 0 and p_refresh:
+            self.refresh_sayisi += 1
+        return eklenen
+
+    def _refresh(self):
+        self._bekle()
+        self.refresh_sayisi += 1
+        return None
@@ -9,6 +9,8 @@ from datetime import datetime
 import json
 import os
 
+from supabase_io import WIRE_FORMAT, fetch_keyset, fetch_keyset_csv, serialize_records, write_batches
+
 # ==================== SAYFA AYARI ====================
 st.set_page_config(
     page_title="Sürekli Envanter Analizi",
@@ -239,47 +241,21 @@ def save_to_supabase(df):
         return 0, 0, "Supabase bağlantısı yok"
 
     try:
-        records = []
-        for _, row in df.iterrows():
-            record = {}
-            for excel_col, db_col in COLUMN_MAPPING.items():
-                if excel_col in row.index:
-                    val = row[excel_col]
-                    if pd.isna(val):
-                        val = None
-                    elif isinstance(val, pd.Timestamp):
-                        val = val.strftime('%Y-%m-%d')
-                    elif isinstance(val, (np.integer, np.int64)):
-                        val = int(val)
-                    elif isinstance(val, (np.floating, np.float64)):
-                        val = float(val) if not np.isnan(val) else None
-                    elif isinstance(val, str):
-                        val = val.strip()
-                        # Türkçe ondalık formatındaki sayıları çevir (ör: "0,0" -> 0.0)
-                        import re
-                        if re.match(r'^-?\d+,\d+$', val):
-                            try:
-                                val = float(val.replace(',', '.'))
-                            except:
-                                pass
-                    record[db_col] = val
-            records.append(record)
-
-        # Batch upsert
-        batch_size = 500
-        inserted = 0
-        updated = 0
+        # Kolon bazlı dönüşüm: tarih → ISO, NaN → None, Türkçe ondalık metin → float
+        records = serialize_records(df, COLUMN_MAPPING, parse_decimals=True)
 
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i+batch_size]
-            try:
-                result = supabase.table(TABLE_NAME).upsert(
-                    batch,
-                    on_conflict='magaza_kodu,malzeme_kodu,envanter_donemi,envanter_sayisi'
-                ).execute()
-                inserted += len(result.data) if result.data else 0
-            except Exception as e:
-                st.warning(f"Batch {i//batch_size + 1} hatası: {str(e)[:100]}")
+        # Boyut bazlı batch'ler, eşzamanlı upsert - hata alan batch tekrar denenir
+        sonuc = write_batches(
+            supabase, TABLE_NAME, records,
+            on_conflict='magaza_kodu,malzeme_kodu,envanter_donemi,envanter_sayisi'
+        )
+        inserted = sonuc['yazilan']
+        updated = 0
+        st.caption(f"⚡ {inserted:,} satır {sonuc['sure']:.1f} sn'de yazıldı "
+                   f"({sonuc['hiz']:,.0f} satır/sn, {sonuc['batch']} batch)")
+        if sonuc['hatali_kayitlar']:
+            st.warning(f"⚠️ {len(sonuc['hatali_kayitlar']):,} satır yazılamadı "
+                       f"({len(sonuc['hatalar'])} batch): {sonuc['hatalar'][0][:100]}")
 
         return inserted, updated, "OK"
 
@@ -379,26 +355,18 @@ def get_gm_ozet_data(donemler):
         return None
 
     try:
-        # Seçili dönemlerdeki tüm verileri çek
-        all_data = []
-        batch_size = 1000
+        # Seçili dönemlerdeki tüm verileri çek (keyset pagination - OFFSET taraması yok)
+        columns = 'magaza_kodu,magaza_tanim,satis_muduru,depolama_kosulu,fark_tutari,fire_tutari,satis_hasilati'
+        if WIRE_FORMAT == 'csv':
+            # text/csv + read_csv (sabit dtype) - JSON dict listesi oluşmaz
+            parcalar = [fetch_keyset_csv(supabase, TABLE_NAME, columns, [('eq', 'envanter_donemi', donem)])
+                        for donem in donemler]
+            df = pd.concat(parcalar, ignore_index=True)
+            return df if len(df) > 0 else None
 
+        all_data = []
         for donem in donemler:
-            offset = 0
-            while True:
-                result = supabase.table(TABLE_NAME).select(
-                    'magaza_kodu,magaza_tanim,satis_muduru,depolama_kosulu,fark_tutari,fire_tutari,satis_hasilati'
-                ).eq(
-                    'envanter_donemi', donem
-                ).limit(batch_size).offset(offset).execute()
-
-                if result.data:
-                    all_data.extend(result.data)
-                    if len(result.data) < batch_size:
-                        break
-                    offset += batch_size
-                else:
-                    break
+            all_data.extend(fetch_keyset(supabase, TABLE_NAME, columns, [('eq', 'envanter_donemi', donem)]))
 
         if all_data:
             df = pd.DataFrame(all_data)
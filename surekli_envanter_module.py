@@ -9,6 +9,8 @@ from datetime import datetime
 import json
 import os
 
+from supabase_io import bisect_write
+
 # ==================== JSON'DAN VERİ YÜKLEME ====================
 
 def load_json_data(filename):
@@ -176,35 +178,24 @@ def prepare_detay_kayitlar(df):
     
     return records
 
-def save_detay_to_supabase(supabase_client, records):
-    """Detay kayıtlarını Supabase'e kaydet (upsert)"""
+def save_detay_to_supabase(supabase_client, records, reddedilen=None):
+    """
+    Detay kayıtlarını Supabase'e kaydet (upsert)
+    Toplu upsert hata verirse batch ikiye bölünerek tekrar denenir (satır satır yerine)
+    reddedilen: verilirse yazılamayan kayıtlar (kayit, hata_mesaji) olarak bu listeye eklenir
+    Dönüş: (inserted, skipped)
+    """
     if not records:
         return 0, 0
     
-    inserted = 0
-    skipped = 0
+    inserted, rejected, errors = bisect_write(
+        supabase_client, 'surekli_envanter_detay', records,
+        on_conflict='magaza_kodu,malzeme_kodu,envanter_donemi,envanter_sayisi'
+    )
+    if reddedilen is not None:
+        reddedilen.extend(zip(rejected, errors))
     
-    # Batch upsert
-    try:
-        result = supabase_client.table('surekli_envanter_detay').upsert(
-            records,
-            on_conflict='magaza_kodu,malzeme_kodu,envanter_donemi,envanter_sayisi'
-        ).execute()
-        inserted = len(result.data) if result.data else 0
-    except Exception as e:
-        print(f"Supabase hata: {e}")
-        # Tek tek dene
-        for rec in records:
-            try:
-                supabase_client.table('surekli_envanter_detay').upsert(
-                    rec,
-                    on_conflict='magaza_kodu,malzeme_kodu,envanter_donemi,envanter_sayisi'
-                ).execute()
-                inserted += 1
-            except:
-                skipped += 1
-    
-    return inserted, skipped
+    return inserted, len(rejected)
 
 def get_onceki_envanter(supabase_client, magaza_kodu, malzeme_kodu, envanter_donemi, envanter_sayisi):
     """Bir önceki envanter sayısındaki kaydı getir"""
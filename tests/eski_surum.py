@@ -0,0 +1,916 @@
+# ==================== ESKİ (iterrows) SÜRÜM ====================
+# Vektörel envanter_engine fonksiyonlarının eşdeğerlik testleri için referans
+# Fonksiyon gövdeleri vektörleştirme öncesi app.py'den (baseline) değiştirilmeden alındı;
+# sadece puanlama döngüleri (analyze_region / get_sm_summary_from_view içindeki) fonksiyona çıkarıldı
+
+import pandas as pd
+import numpy as np
+
+
+def analyze_inventory(df):
+    """Veriyi analiz için hazırla"""
+    df = df.copy()
+    
+    # DUPLICATE TEMİZLEME - Doğru key ile
+    # Aynı mağaza + dönem + depolama + malzeme sadece 1 kez olmalı
+    dup_key = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
+    dup_key = [c for c in dup_key if c in df.columns]
+    if dup_key:
+        # Envanter tarihi varsa en yeniyi tut
+        if 'Envanter Tarihi' in df.columns:
+            df['Envanter Tarihi'] = pd.to_datetime(df['Envanter Tarihi'], errors='coerce')
+            df = df.sort_values('Envanter Tarihi', ascending=False)
+        df = df.drop_duplicates(subset=dup_key, keep='first')
+    
+    col_mapping = {
+        'Mağaza Kodu': 'Mağaza Kodu',
+        'Mağaza Tanım': 'Mağaza Adı',
+        'Malzeme Kodu': 'Malzeme Kodu',
+        'Malzeme Tanımı': 'Malzeme Adı',
+        'Mal Grubu Tanımı': 'Ürün Grubu',
+        'Ürün Grubu Tanımı': 'Ana Grup',
+        'Fark Miktarı': 'Fark Miktarı',
+        'Fark Tutarı': 'Fark Tutarı',
+        'Kısmi Envanter Miktarı': 'Kısmi Envanter Miktarı',
+        'Kısmi Envanter Tutarı': 'Kısmi Envanter Tutarı',
+        'Önceki Fark Miktarı': 'Önceki Fark Miktarı',
+        'Önceki Fark Tutarı': 'Önceki Fark Tutarı',
+        'Önceki Fire Miktarı': 'Önceki Fire Miktarı',
+        'Önceki Fire Tutarı': 'Önceki Fire Tutarı',
+        'İptal Satır Miktarı': 'İptal Satır Miktarı',
+        'İptal Satır Tutarı': 'İptal Satır Tutarı',
+        'Fire Miktarı': 'Fire Miktarı',
+        'Fire Tutarı': 'Fire Tutarı',
+        'Satış Miktarı': 'Satış Miktarı',
+        'Satış Hasılatı': 'Satış Tutarı',
+        'Satış Fiyatı': 'Birim Fiyat',
+        'Fark+Fire+Kısmi Envanter Tutarı': 'NET_ENVANTER_ETKİ_TUTARI',
+        'Envanter Dönemi': 'Envanter Dönemi',
+        'Envanter Tarihi': 'Envanter Tarihi',
+    }
+    
+    for old_col, new_col in col_mapping.items():
+        if old_col in df.columns:
+            df[new_col] = df[old_col]
+    
+    numeric_cols = ['Fark Miktarı', 'Fark Tutarı', 'Kısmi Envanter Miktarı', 'Kısmi Envanter Tutarı',
+                    'Önceki Fark Miktarı', 'Önceki Fark Tutarı', 'İptal Satır Miktarı', 'İptal Satır Tutarı',
+                    'Fire Miktarı', 'Fire Tutarı', 'Satış Miktarı', 'Satış Tutarı', 'Önceki Fire Miktarı', 
+                    'Önceki Fire Tutarı', 'Birim Fiyat']
+    
+    for col in numeric_cols:
+        if col not in df.columns:
+            df[col] = 0
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    
+    if 'NET_ENVANTER_ETKİ_TUTARI' not in df.columns:
+        df['NET_ENVANTER_ETKİ_TUTARI'] = df['Fark Tutarı'] + df['Fire Tutarı'] + df['Kısmi Envanter Tutarı']
+    
+    df['TOPLAM_MIKTAR'] = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
+    
+    return df
+
+
+def is_balanced(row):
+    """Dengelenmiş mi? Fark + Kısmi + Önceki = 0"""
+    toplam = row['Fark Miktarı'] + row['Kısmi Envanter Miktarı'] + row['Önceki Fark Miktarı']
+    return abs(toplam) <= 0.01
+
+
+def get_first_two_words(text):
+    """İlk 2 kelimeyi al"""
+    if pd.isna(text):
+        return ""
+    words = str(text).strip().split()
+    return " ".join(words[:2]).upper() if len(words) >= 2 else str(text).upper()
+
+
+def get_last_word(text):
+    """Son kelimeyi (marka) al"""
+    if pd.isna(text):
+        return ""
+    words = str(text).strip().split()
+    return words[-1].upper() if words else ""
+
+
+def extract_quantity(text):
+    """Gramaj/ML çıkar: '750 ML' → 750, 'ML'"""
+    import re
+    if pd.isna(text):
+        return None, None
+    
+    text = str(text).upper()
+    
+    # Patterns: 750ML, 750 ML, 1.5L, 1,5 LT, 220G, 220 G, 1KG
+    patterns = [
+        r'(\d+[.,]?\d*)\s*(ML|LT|L|G|GR|KG|MG)\b',
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            value = float(match.group(1).replace(',', '.'))
+            unit = match.group(2)
+            
+            # Normalize units to base (ML, G)
+            if unit in ['LT', 'L']:
+                value = value * 1000  # to ML
+                unit = 'ML'
+            elif unit == 'KG':
+                value = value * 1000  # to G
+                unit = 'G'
+            elif unit == 'GR':
+                unit = 'G'
+            
+            return value, unit
+    
+    return None, None
+
+
+def is_quantity_similar(qty1, unit1, qty2, unit2, tolerance=0.30):
+    """Gramaj benzer mi? Aynı boyut kategorisinde mi?"""
+    if qty1 is None or qty2 is None:
+        return True  # Gramaj bulunamadıysa benzer say
+    
+    if unit1 != unit2:
+        return False  # Farklı birim (ML vs G) benzer değil
+    
+    if qty1 == 0 or qty2 == 0:
+        return True
+    
+    # Oran kontrolü: max 3x fark olabilir
+    ratio = max(qty1, qty2) / min(qty1, qty2)
+    if ratio > 3:
+        return False  # 3 kattan fazla fark varsa benzer değil
+    
+    # Boyut kategorileri
+    def get_size_category(qty, unit):
+        if unit == 'ML':
+            if qty <= 400: return 'S'      # Küçük: 0-400ml
+            elif qty <= 1000: return 'M'   # Orta: 400-1000ml
+            else: return 'L'               # Büyük: 1000ml+
+        elif unit == 'G':
+            if qty <= 100: return 'S'      # Küçük: 0-100g
+            elif qty <= 400: return 'M'    # Orta: 100-400g
+            else: return 'L'               # Büyük: 400g+
+        return 'M'
+    
+    cat1 = get_size_category(qty1, unit1)
+    cat2 = get_size_category(qty2, unit2)
+    
+    # Sadece aynı kategorideyse benzer
+    return cat1 == cat2
+
+
+def detect_internal_theft(df):
+    """
+    İÇ HIRSIZLIK TESPİTİ:
+    - Satış Fiyatı >= 100 TL
+    - Dengelenmemiş (Fark + Kısmi + Önceki ≠ 0)
+    - |Toplam| ≈ İptal Satır, fark büyüdükçe risk AZALIR
+    """
+    results = []
+    
+    for idx, row in df.iterrows():
+        # Dengelenmiş ise atla
+        if is_balanced(row):
+            continue
+        
+        satis_fiyati = row.get('Birim Fiyat', 0) or 0
+        if satis_fiyati < 100:
+            continue
+        
+        fark = row['Fark Miktarı']
+        kismi = row['Kısmi Envanter Miktarı']
+        onceki = row['Önceki Fark Miktarı']
+        iptal = row['İptal Satır Miktarı']
+        
+        toplam = fark + kismi + onceki
+        
+        if toplam >= 0 or iptal <= 0:
+            continue
+        
+        fark_mutlak = abs(abs(toplam) - iptal)
+        
+        if fark_mutlak == 0:
+            risk = "ÇOK YÜKSEK"
+            esitlik = "TAM EŞİT"
+        elif fark_mutlak <= 2:
+            risk = "YÜKSEK"
+            esitlik = "YAKIN (±2)"
+        elif fark_mutlak <= 5:
+            risk = "ORTA"
+            esitlik = "YAKIN (±5)"
+        elif fark_mutlak <= 10:
+            risk = "DÜŞÜK-ORTA"
+            esitlik = f"FARK: {fark_mutlak}"
+        else:
+            continue
+        
+        results.append({
+            'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+            'Malzeme Adı': row.get('Malzeme Adı', ''),
+            'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
+            'Satış Fiyatı': satis_fiyati,
+            'Fark Miktarı': fark,
+            'Kısmi Env.': kismi,
+            'Önceki Fark': onceki,
+            'TOPLAM': toplam,
+            'İptal Satır': iptal,
+            'Fark': fark_mutlak,
+            'Durum': esitlik,
+            'Fark Tutarı (TL)': row['Fark Tutarı'],
+            'Risk': risk
+        })
+    
+    result_df = pd.DataFrame(results)
+    
+    if len(result_df) > 0:
+        # DUPLICATE TEMİZLEME - Aynı malzeme kodu sadece 1 kez görünsün
+        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+        
+        # Risk sıralaması
+        risk_order = {'ÇOK YÜKSEK': 0, 'YÜKSEK': 1, 'ORTA': 2, 'DÜŞÜK-ORTA': 3}
+        result_df['_risk_sort'] = result_df['Risk'].map(risk_order)
+        result_df = result_df.sort_values(['_risk_sort', 'Fark Tutarı (TL)'], ascending=[True, True])
+        result_df = result_df.drop('_risk_sort', axis=1)
+    
+    return result_df
+
+
+def detect_chronic_products(df):
+    """Kronik açık - her iki dönemde de Fark < 0"""
+    results = []
+    
+    for idx, row in df.iterrows():
+        if is_balanced(row):
+            continue
+        
+        if row['Önceki Fark Miktarı'] < 0 and row['Fark Miktarı'] < 0:
+            results.append({
+                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+                'Malzeme Adı': row.get('Malzeme Adı', ''),
+                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
+                'Bu Dönem Fark': row['Fark Miktarı'],
+                'Bu Dönem Tutar': row['Fark Tutarı'],
+                'Önceki Fark': row['Önceki Fark Miktarı'],
+                'Önceki Tutar': row['Önceki Fark Tutarı'],
+                'Toplam Tutar': row['Fark Tutarı'] + row['Önceki Fark Tutarı']
+            })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        # DUPLICATE TEMİZLEME
+        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+        result_df = result_df.sort_values('Bu Dönem Tutar', ascending=True)
+    
+    return result_df
+
+
+def detect_chronic_fire(df):
+    """Kronik Fire - her iki dönemde de fire var VE dengelenmemiş"""
+    results = []
+    
+    for idx, row in df.iterrows():
+        onceki_fire = row.get('Önceki Fire Miktarı', 0) or 0
+        bu_fire = row['Fire Miktarı']
+        
+        # Her iki dönemde de fire varsa
+        if onceki_fire != 0 and bu_fire != 0:
+            # Önceki Fark + Fark = 0 ise dengelenmiş, kronik değil
+            onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
+            bu_fark = row['Fark Miktarı']
+            
+            if abs(onceki_fark + bu_fark) <= 0.01:
+                continue  # Dengelenmiş, kronik fire değil
+            
+            results.append({
+                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+                'Malzeme Adı': row.get('Malzeme Adı', ''),
+                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
+                'Bu Dönem Fire': bu_fire,
+                'Bu Dönem Fire Tutarı': row['Fire Tutarı'],
+                'Önceki Fire': onceki_fire,
+                'Önceki Fire Tutarı': row.get('Önceki Fire Tutarı', 0),
+                'Toplam Fire Tutarı': row['Fire Tutarı'] + row.get('Önceki Fire Tutarı', 0)
+            })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        # DUPLICATE TEMİZLEME
+        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+        result_df = result_df.sort_values('Bu Dönem Fire Tutarı', ascending=True)
+    
+    return result_df
+
+
+def detect_fire_manipulation(df):
+    """Fire manipülasyonu: Fire var AMA Fark+Kısmi > 0 VE dengelenmemiş"""
+    results = []
+    
+    for idx, row in df.iterrows():
+        fark = row['Fark Miktarı']
+        kismi = row['Kısmi Envanter Miktarı']
+        onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
+        fire = row['Fire Miktarı']
+        
+        fark_kismi = fark + kismi
+        
+        # Önceki Fark + Fark = 0 ise dengelenmiş, manipülasyon değil
+        if abs(onceki_fark + fark) <= 0.01:
+            continue
+        
+        if fire < 0 and fark_kismi > 0:
+            results.append({
+                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+                'Malzeme Adı': row.get('Malzeme Adı', ''),
+                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
+                'Fark Miktarı': fark,
+                'Kısmi Env.': kismi,
+                'Önceki Fark': onceki_fark,
+                'Fark + Kısmi': fark_kismi,
+                'Fire Miktarı': fire,
+                'Fire Tutarı': row['Fire Tutarı'],
+                'Sonuç': 'FAZLA FİRE GİRİLMİŞ'
+            })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        # DUPLICATE TEMİZLEME
+        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+        result_df = result_df.sort_values('Fire Tutarı', ascending=True)
+    
+    return result_df
+
+
+def detect_cigarette_shortage(df):
+    """
+    Sigara açığı - Tüm sigaraların TOPLAM (Fark + Kısmi + Önceki) değerine bakılır
+    Eğer toplam < 0 ise sigara açığı var demektir
+    
+    NET = Fark Miktarı + Kısmi Envanter Miktarı + Önceki Fark Miktarı
+    
+    Sigara tespiti kuralları:
+    - Mal Grubu Tanımı veya Ürün Grubu içinde 'SİGARA' veya 'TÜTÜN' geçenler
+    - MAKARON tek başına sigara DEĞİLDİR (bilinçli olarak dışarıda tutulur)
+    - "MAKARON JEL KALEM" gibi ürünler yanlışlıkla yakalanmasın diye MAKARON dahil edilmez
+    """
+    
+    # Sigara kontrolü yapılacak kolonları belirle (öncelik sırasına göre)
+    # NOT: Malzeme Adı dahil değil - sadece kategori bazlı filtre yapılır
+    check_cols = []
+    for col in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup']:
+        if col in df.columns:
+            check_cols.append(col)
+    
+    if not check_cols:
+        return pd.DataFrame()
+    
+    # Sigara mask oluştur - CONTAINS kullan (eşitlik değil!)
+    sigara_mask = pd.Series([False] * len(df), index=df.index)
+    
+    for col in check_cols:
+        # Türkçe karakterleri normalize et
+        col_values = df[col].fillna('').astype(str).str.upper()
+        col_values = col_values.str.replace('İ', 'I', regex=False)
+        col_values = col_values.str.replace('Ş', 'S', regex=False)
+        col_values = col_values.str.replace('Ğ', 'G', regex=False)
+        col_values = col_values.str.replace('Ü', 'U', regex=False)
+        col_values = col_values.str.replace('Ö', 'O', regex=False)
+        col_values = col_values.str.replace('Ç', 'C', regex=False)
+        col_values = col_values.str.replace('ı', 'I', regex=False)
+        
+        # SIGARA veya TUTUN içeren satırları bul
+        # NOT: MAKARON tek başına dahil DEĞİL - sadece SIGARA veya TUTUN varsa
+        mask = col_values.str.contains('SIGARA|TUTUN', case=False, na=False, regex=True)
+        sigara_mask = sigara_mask | mask
+    
+    # MAKARON'u açıkça dışarıda tut (eğer SIGARA/TUTUN yoksa)
+    # Bu satır gereksiz görünebilir ama gelecekte güvenlik sağlar
+    # Şu an mask zaten sadece SIGARA|TUTUN içerenleri yakalar
+    
+    sigara_df = df[sigara_mask].copy()
+    
+    if len(sigara_df) == 0:
+        return pd.DataFrame()
+    
+    # Net hesapla: Fark + Kısmi + Önceki
+    toplam_fark = sigara_df['Fark Miktarı'].fillna(0).sum()
+    toplam_kismi = sigara_df['Kısmi Envanter Miktarı'].fillna(0).sum()
+    toplam_onceki = sigara_df['Önceki Fark Miktarı'].fillna(0).sum()
+    net_toplam = toplam_fark + toplam_kismi + toplam_onceki
+    
+    # Eğer net toplam < 0 ise açık var
+    if net_toplam >= 0:
+        return pd.DataFrame()
+    
+    # Açık varsa, detay göster
+    results = []
+    for idx, row in sigara_df.iterrows():
+        fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
+        kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
+        onceki = row['Önceki Fark Miktarı'] if pd.notna(row['Önceki Fark Miktarı']) else 0
+        urun_net = fark + kismi + onceki
+        
+        # Sadece 0 olmayan kayıtları göster
+        if fark != 0 or kismi != 0 or onceki != 0:
+            results.append({
+                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+                'Malzeme Adı': row.get('Malzeme Adı', ''),
+                'Fark': fark,
+                'Kısmi': kismi,
+                'Önceki': onceki,
+                'Ürün Toplam': urun_net,
+                'Risk': 'SİGARA'
+            })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        # DUPLICATE TEMİZLEME
+        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+        result_df = result_df.sort_values('Ürün Toplam', ascending=True)
+        # En sona toplam satırı ekle
+        toplam_row = pd.DataFrame([{
+            'Malzeme Kodu': '*** TOPLAM ***',
+            'Malzeme Adı': f'SİGARA AÇIĞI: {abs(net_toplam):.0f} adet',
+            'Fark': toplam_fark,
+            'Kısmi': toplam_kismi,
+            'Önceki': toplam_onceki,
+            'Ürün Toplam': net_toplam,
+            'Risk': '⚠️ AÇIK VAR'
+        }])
+        result_df = pd.concat([result_df, toplam_row], ignore_index=True)
+    
+    return result_df
+
+
+def find_product_families(df):
+    """
+    Benzer ürün ailesi analizi
+    Kural: İlk 2 kelime + Son kelime (marka) + Mal Grubu + Gramaj (±%30) aynıysa = AİLE
+    """
+    df_copy = df.copy()
+    df_copy['İlk2Kelime'] = df_copy['Malzeme Adı'].apply(get_first_two_words)
+    df_copy['Marka'] = df_copy['Malzeme Adı'].apply(get_last_word)
+    df_copy['Gramaj'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[0])
+    df_copy['GramajBirim'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[1])
+    
+    families = []
+    processed_indices = set()
+    
+    # Her ürün için potansiyel aile bul
+    for idx, row in df_copy.iterrows():
+        if idx in processed_indices:
+            continue
+        
+        ilk2 = row['İlk2Kelime']
+        marka = row['Marka']
+        urun_grubu = row['Ürün Grubu']
+        gramaj = row['Gramaj']
+        birim = row['GramajBirim']
+        
+        if not ilk2 or not marka:
+            continue
+        
+        # Aynı grup içinde benzer ürünleri bul
+        family_mask = (
+            (df_copy['İlk2Kelime'] == ilk2) & 
+            (df_copy['Marka'] == marka) & 
+            (df_copy['Ürün Grubu'] == urun_grubu)
+        )
+        
+        potential_family = df_copy[family_mask]
+        
+        if len(potential_family) <= 1:
+            continue
+        
+        # Gramaj kontrolü - benzer gramajlı olanları filtrele
+        family_members = []
+        for fam_idx, fam_row in potential_family.iterrows():
+            if is_quantity_similar(gramaj, birim, fam_row['Gramaj'], fam_row['GramajBirim']):
+                family_members.append(fam_idx)
+                processed_indices.add(fam_idx)
+        
+        if len(family_members) <= 1:
+            continue
+        
+        family_df = df_copy.loc[family_members]
+        
+        toplam_fark = family_df['Fark Miktarı'].sum()
+        toplam_kismi = family_df['Kısmi Envanter Miktarı'].sum()
+        toplam_onceki = family_df['Önceki Fark Miktarı'].sum()
+        aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
+        
+        if family_df['Fark Miktarı'].abs().sum() > 0:
+            if abs(aile_toplami) <= 2:
+                sonuc = "KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL"
+                risk = "DÜŞÜK"
+            elif aile_toplami < -2:
+                sonuc = "AİLEDE NET AÇIK VAR"
+                risk = "ORTA"
+            else:
+                sonuc = "AİLEDE FAZLA VAR"
+                risk = "DÜŞÜK"
+            
+            urunler = family_df['Malzeme Adı'].tolist()
+            farklar = family_df['Fark Miktarı'].tolist()
+            
+            families.append({
+                'Mal Grubu': urun_grubu,
+                'İlk 2 Kelime': ilk2,
+                'Marka': marka,
+                'Ürün Sayısı': len(family_members),
+                'Toplam Fark': toplam_fark,
+                'Toplam Kısmi': toplam_kismi,
+                'Toplam Önceki': toplam_onceki,
+                'AİLE TOPLAMI': aile_toplami,
+                'Sonuç': sonuc,
+                'Risk': risk,
+                'Ürünler': ' | '.join([f"{u[:25]}({f})" for u, f in zip(urunler[:5], farklar[:5])])
+            })
+    
+    result_df = pd.DataFrame(families)
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
+    
+    return result_df
+
+
+def detect_external_theft(df):
+    """Dış hırsızlık - açık var ama fire/iptal yok"""
+    results = []
+    
+    for idx, row in df.iterrows():
+        if is_balanced(row):
+            continue
+        
+        if row['Fark Miktarı'] < 0 and row['Fire Miktarı'] == 0 and row['İptal Satır Miktarı'] == 0:
+            if abs(row['Fark Tutarı']) > 50:
+                results.append({
+                    'Malzeme Kodu': row.get('Malzeme Kodu', ''),
+                    'Malzeme Adı': row.get('Malzeme Adı', ''),
+                    'Ürün Grubu': row.get('Ürün Grubu', ''),
+                    'Fark Miktarı': row['Fark Miktarı'],
+                    'Fark Tutarı': row['Fark Tutarı'],
+                    'Önceki Fark': row['Önceki Fark Miktarı'],
+                    'Risk': 'DIŞ HIRSIZLIK / SAYIM HATASI'
+                })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('Fark Tutarı', ascending=True)
+    
+    return result_df
+
+
+def check_kasa_activity_products(df, kasa_kodlari):
+    """
+    10 TL Ürünleri Kontrolü
+    Fiyat değişikliği olan ürünlerde manipülasyon riski
+    Toplam adet ve tutar etkisini hesapla
+    FORMÜL: Fark + Kısmi (Önceki dahil değil)
+    """
+    results = []
+    
+    toplam_adet = 0
+    toplam_tutar = 0
+    eslesen_urun = 0
+    
+    for idx, row in df.iterrows():
+        # Kod eşleştirme - hem string hem int formatını dene
+        kod_raw = row.get('Malzeme Kodu', '')
+        kod_str = str(kod_raw).replace('.0', '').strip()  # Float'tan gelen .0'ı kaldır
+        
+        if kod_str in kasa_kodlari:
+            eslesen_urun += 1
+            fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
+            kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
+            toplam = fark + kismi  # Önceki dahil değil!
+            
+            # Tutar hesabı - Fark + Kısmi tutarları
+            fark_tutari = row.get('Fark Tutarı', 0) or 0
+            kismi_tutari = row.get('Kısmi Envanter Tutarı', 0) or 0
+            urun_toplam_tutar = fark_tutari + kismi_tutari  # Önceki dahil değil!
+            
+            toplam_adet += toplam
+            toplam_tutar += urun_toplam_tutar
+            
+            if toplam != 0:  # Sadece sıfır olmayanları göster
+                if toplam > 0:
+                    durum = "FAZLA (+)"
+                else:
+                    durum = "AÇIK (-)"
+                
+                results.append({
+                    'Malzeme Kodu': kod_str,
+                    'Malzeme Adı': row.get('Malzeme Adı', ''),
+                    'Fark': fark,
+                    'Kısmi': kismi,
+                    'TOPLAM': toplam,
+                    'Tutar': urun_toplam_tutar,
+                    'Durum': durum
+                })
+    
+    result_df = pd.DataFrame(results)
+    if len(result_df) > 0:
+        # Önce fazla (+) olanlar, sonra açık (-) olanlar
+        result_df['_sort'] = result_df['TOPLAM'].apply(lambda x: 0 if x > 0 else 1)
+        result_df = result_df.sort_values(['_sort', 'TOPLAM'], ascending=[True, False])
+        result_df = result_df.drop('_sort', axis=1)
+    
+    # Özet bilgileri de döndür
+    summary = {
+        'toplam_urun': eslesen_urun,
+        'sorunlu_urun': len(results),
+        'toplam_adet': toplam_adet,
+        'toplam_tutar': toplam_tutar
+    }
+    
+    return result_df, summary
+
+
+def aggregate_by_group(store_df, group_col):
+    """SM veya BS bazında gruplama - Satış Ağırlıklı Ortalama Risk"""
+    if group_col not in store_df.columns:
+        return pd.DataFrame()
+    
+    # Kolon isimlerini kontrol et (VIEW vs analyze_region uyumu)
+    kronik_col = 'Kronik' if 'Kronik' in store_df.columns else 'Kr.Açık'
+    kasa_adet_col = 'Kasa Adet' if 'Kasa Adet' in store_df.columns else '10TL Adet'
+    kasa_tutar_col = 'Kasa Tutar' if 'Kasa Tutar' in store_df.columns else '10TL Tutar'
+    
+    # Eksik kolonları 0 ile doldur
+    if kronik_col not in store_df.columns:
+        store_df[kronik_col] = 0
+    if kasa_adet_col not in store_df.columns:
+        store_df[kasa_adet_col] = 0
+    if kasa_tutar_col not in store_df.columns:
+        store_df[kasa_tutar_col] = 0
+    if 'Gün' not in store_df.columns:
+        store_df['Gün'] = 1
+    
+    # Temel metrikler
+    agg_dict = {
+        'Mağaza Kodu': 'count',
+        'Satış': 'sum',
+        'Fark': 'sum',
+        'Fire': 'sum',
+        'Toplam Açık': 'sum',
+        'İç Hırs.': 'sum',
+        kronik_col: 'sum',
+        'Sigara': 'sum',
+        kasa_adet_col: 'sum',
+        kasa_tutar_col: 'sum',
+        'Gün': 'sum',
+    }
+    
+    grouped = store_df.groupby(group_col).agg(agg_dict).reset_index()
+    
+    grouped.columns = [group_col, 'Mağaza Sayısı', 'Satış', 'Fark', 'Fire', 'Toplam Açık',
+                       'İç Hırs.', 'Kronik', 'Sigara', '10TL Adet', '10TL Tutar', 'Toplam Gün']
+    
+    # Satış Ağırlıklı Ortalama Risk Puanı hesapla
+    for idx, row in grouped.iterrows():
+        grup_magazalar = store_df[store_df[group_col] == row[group_col]]
+        
+        # Ağırlıklı ortalama
+        toplam_agirlik = grup_magazalar['Satış'].sum()
+        if toplam_agirlik > 0:
+            agirlikli_risk = (grup_magazalar['Risk Puan'] * grup_magazalar['Satış']).sum() / toplam_agirlik
+        else:
+            agirlikli_risk = grup_magazalar['Risk Puan'].mean()
+        
+        grouped.at[idx, 'Risk Puan'] = agirlikli_risk
+        
+        # Kritik ve Riskli mağaza sayıları
+        kritik_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('KRİTİK')])
+        riskli_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('RİSKLİ')])
+        grouped.at[idx, 'Kritik Mağaza'] = kritik_count
+        grouped.at[idx, 'Riskli Mağaza'] = riskli_count
+    
+    # Oranlar
+    grouped['Fark %'] = abs(grouped['Fark']) / grouped['Satış'] * 100
+    grouped['Fark %'] = grouped['Fark %'].fillna(0)
+    
+    grouped['Fire %'] = abs(grouped['Fire']) / grouped['Satış'] * 100
+    grouped['Fire %'] = grouped['Fire %'].fillna(0)
+    
+    grouped['Toplam %'] = abs(grouped['Toplam Açık']) / grouped['Satış'] * 100
+    grouped['Toplam %'] = grouped['Toplam %'].fillna(0)
+    
+    # Günlük fark ve fire
+    grouped['Günlük Fark'] = grouped['Fark'] / grouped['Toplam Gün']
+    grouped['Günlük Fark'] = grouped['Günlük Fark'].fillna(0)
+    grouped['Günlük Fire'] = grouped['Fire'] / grouped['Toplam Gün']
+    grouped['Günlük Fire'] = grouped['Günlük Fire'].fillna(0)
+    
+    # Risk seviyesi (ağırlıklı ortalama risk puanına göre)
+    def get_risk_level(puan):
+        if puan >= 60:
+            return "🔴 KRİTİK"
+        elif puan >= 40:
+            return "🟠 RİSKLİ"
+        elif puan >= 20:
+            return "🟡 DİKKAT"
+        else:
+            return "🟢 TEMİZ"
+    
+    grouped['Risk'] = grouped['Risk Puan'].apply(get_risk_level)
+    
+    # Risk puanına göre sırala (yüksekten düşüğe)
+    grouped = grouped.sort_values('Risk Puan', ascending=False)
+    
+    return grouped
+
+
+def store_risk_scores(store_metrics, RISK_CONFIG):
+    """analyze_region içindeki mağaza puanlama döngüsü (sayımlar store_metrics kolonlarından)"""
+    results = []
+    
+    # Risk config'i al
+    rw = RISK_CONFIG.get('risk_weights', {})
+    rl = RISK_CONFIG.get('risk_levels', {})
+    max_score = RISK_CONFIG.get('max_risk_score', 100)
+    
+    for _, row in store_metrics.iterrows():
+        # Risk değerlerini al
+        ic_hrs = row['İç Hırs.']
+        kr_acik = row['Kr.Açık']
+        sig_acik = row['Sigara']
+        fire_man = row['Fire Man.']
+        kasa_adet = row['10TL Adet']
+        
+        # Risk puanı hesapla (config'den ağırlıklar)
+        risk_puan = 0
+        risk_nedenler = []
+        toplam_oran = row['Toplam %']
+        
+        # Toplam oran bazlı risk
+        to = rw.get('toplam_oran', {})
+        if toplam_oran > to.get('high', {}).get('threshold', 2):
+            risk_puan += to.get('high', {}).get('points', 40)
+            risk_nedenler.append(f"Toplam %{toplam_oran:.1f}")
+        elif toplam_oran > to.get('medium', {}).get('threshold', 1.5):
+            risk_puan += to.get('medium', {}).get('points', 25)
+            risk_nedenler.append(f"Toplam %{toplam_oran:.1f}")
+        elif toplam_oran > to.get('low', {}).get('threshold', 1):
+            risk_puan += to.get('low', {}).get('points', 15)
+        
+        # İç hırsızlık
+        ih = rw.get('ic_hirsizlik', {})
+        if ic_hrs > ih.get('high', {}).get('threshold', 50):
+            risk_puan += ih.get('high', {}).get('points', 30)
+            risk_nedenler.append(f"İç hırs. {ic_hrs}")
+        elif ic_hrs > ih.get('medium', {}).get('threshold', 30):
+            risk_puan += ih.get('medium', {}).get('points', 20)
+            risk_nedenler.append(f"İç hırs. {ic_hrs}")
+        elif ic_hrs > ih.get('low', {}).get('threshold', 15):
+            risk_puan += ih.get('low', {}).get('points', 10)
+        
+        # Sigara açığı
+        sg = rw.get('sigara', {})
+        if sig_acik > sg.get('high', {}).get('threshold', 5):
+            risk_puan += sg.get('high', {}).get('points', 35)
+            risk_nedenler.append(f"🚬 SİGARA {sig_acik:.0f}")
+        elif sig_acik > sg.get('low', {}).get('threshold', 0):
+            risk_puan += sg.get('low', {}).get('points', 20)
+            risk_nedenler.append(f"🚬 Sigara {sig_acik:.0f}")
+        
+        # Kronik açık
+        kr = rw.get('kronik', {})
+        if kr_acik > kr.get('high', {}).get('threshold', 100):
+            risk_puan += kr.get('high', {}).get('points', 15)
+            risk_nedenler.append(f"Kronik {kr_acik}")
+        elif kr_acik > kr.get('low', {}).get('threshold', 50):
+            risk_puan += kr.get('low', {}).get('points', 10)
+        
+        # Fire manipülasyonu
+        fm = rw.get('fire_manipulasyon', {})
+        if fire_man > fm.get('high', {}).get('threshold', 10):
+            risk_puan += fm.get('high', {}).get('points', 20)
+            risk_nedenler.append(f"Fire man. {fire_man}")
+        elif fire_man > fm.get('low', {}).get('threshold', 5):
+            risk_puan += fm.get('low', {}).get('points', 10)
+        
+        # 10 TL ürünleri
+        kt = rw.get('kasa_10tl', {})
+        if kasa_adet > kt.get('high', {}).get('threshold', 20):
+            risk_puan += kt.get('high', {}).get('points', 15)
+            risk_nedenler.append(f"10TL +{kasa_adet:.0f}")
+        elif kasa_adet > kt.get('low', {}).get('threshold', 10):
+            risk_puan += kt.get('low', {}).get('points', 10)
+        
+        # Risk puanını sınırla
+        risk_puan = min(risk_puan, max_score)
+        
+        # Risk seviyesi (config'den eşikler)
+        if risk_puan >= rl.get('kritik', 60):
+            risk_seviye = "🔴 KRİTİK"
+        elif risk_puan >= rl.get('riskli', 40):
+            risk_seviye = "🟠 RİSKLİ"
+        elif risk_puan >= rl.get('dikkat', 20):
+            risk_seviye = "🟡 DİKKAT"
+        else:
+            risk_seviye = "🟢 TEMİZ"
+        
+        results.append({
+            'Risk Puan': risk_puan,
+            'Risk': risk_seviye,
+            'Risk Nedenleri': " | ".join(risk_nedenler) if risk_nedenler else "-"
+        })
+    
+    return pd.DataFrame(results, index=store_metrics.index)
+
+
+def view_risk_scores(df):
+    """get_sm_summary_from_view içindeki bölge ortalamasına göre puanlama (df'e Risk Puan / Risk ekler)"""
+    # Bölge ortalamalarını hesapla (VIEW'den)
+    bolge_ort = {
+        'kayip_oran': df['Toplam %'].mean() if len(df) > 0 else 1,
+        'ic_hirsizlik': df['İç Hırs.'].mean() if len(df) > 0 else 10,
+        'kronik': df['Kronik'].mean() if len(df) > 0 else 50,
+        'sigara': df['Sigara'].mean() if len(df) > 0 else 0,
+    }
+    
+    # Risk puanı hesapla (tam formül)
+    def calc_risk_score(row):
+        """
+        Risk puanı hesaplama (0-100)
+        Ağırlıklar:
+        - Kayıp Oranı: %30 (bölge ortalamasına göre)
+        - Sigara Açığı: %30
+        - İç Hırsızlık: %30 (bölge ortalamasına göre)
+        - Kronik Açık: %5
+        - 10TL Ürünleri: %5
+        """
+        puan = 0
+        
+        # Kayıp Oranı (30 puan) - Bölge ortalamasına göre
+        kayip_oran = row.get('Toplam %', 0)
+        if bolge_ort['kayip_oran'] > 0:
+            kayip_ratio = kayip_oran / bolge_ort['kayip_oran']
+            kayip_puan = min(30, kayip_ratio * 15)
+        else:
+            kayip_puan = min(30, kayip_oran * 20)
+        puan += kayip_puan
+        
+        # Sigara Açığı (30 puan) - Her sigara kritik
+        sigara_count = row.get('Sigara', 0)
+        if sigara_count > 10:
+            sigara_puan = 30
+        elif sigara_count > 5:
+            sigara_puan = 25
+        elif sigara_count > 0:
+            sigara_puan = sigara_count * 4
+        else:
+            sigara_puan = 0
+        puan += sigara_puan
+        
+        # İç Hırsızlık (30 puan) - Bölge ortalamasına göre
+        ic_hirsizlik_count = row.get('İç Hırs.', 0)
+        if bolge_ort['ic_hirsizlik'] > 0:
+            ic_ratio = ic_hirsizlik_count / bolge_ort['ic_hirsizlik']
+            ic_puan = min(30, ic_ratio * 15)
+        else:
+            ic_puan = min(30, ic_hirsizlik_count * 0.5)
+        puan += ic_puan
+        
+        # Kronik Açık (5 puan)
+        kronik_count = row.get('Kronik', 0)
+        if bolge_ort['kronik'] > 0:
+            kronik_ratio = kronik_count / bolge_ort['kronik']
+            kronik_puan = min(5, kronik_ratio * 2.5)
+        else:
+            kronik_puan = min(5, kronik_count * 0.05)
+        puan += kronik_puan
+        
+        # 10TL Ürünleri (5 puan) - Fazla = şüpheli
+        kasa_adet = abs(row.get('Kasa Adet', 0))
+        if kasa_adet > 20:
+            kasa_puan = 5
+        elif kasa_adet > 10:
+            kasa_puan = 3
+        elif kasa_adet > 0:
+            kasa_puan = 1
+        else:
+            kasa_puan = 0
+        puan += kasa_puan
+        
+        return min(100, max(0, puan))
+    
+    df['Risk Puan'] = df.apply(calc_risk_score, axis=1)
+    
+    # Risk seviyesi (puana göre)
+    def get_risk_level(puan):
+        if puan >= 60:
+            return '🔴 KRİTİK'
+        elif puan >= 40:
+            return '🟠 RİSKLİ'
+        elif puan >= 20:
+            return '🟡 DİKKAT'
+        else:
+            return '🟢 TEMİZ'
+    
+    df['Risk'] = df['Risk Puan'].apply(get_risk_level)
+    
+    return df
@@ -0,0 +1,91 @@
+# ==================== İKİYE BÖLEREK YAZMA ====================
+# bisect_write: sadece bozuk satırlar reddedilmeli, istek sayısı ~2·log2(N) sınırında kalmalı
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import bisect_write
+from surekli_envanter_module import save_detay_to_supabase
+
+NOT_NULL = 'null value in column "malzeme_kodu" violates not-null constraint (23502)'
+YETKI = 'permission denied for table surekli_envanter_detay (42501)'
+
+
+class _Sorgu:
+    def __init__(self, client, table):
+        self.client, self.table, self.kayitlar = client, table, []
+
+    def insert(self, json, **kwargs):
+        self.kayitlar = json
+        return self
+
+    def upsert(self, json, on_conflict=None, **kwargs):
+        return self.insert(json)
+
+    def execute(self):
+        self.client.istek += 1
+        if self.client.sistemik:
+            raise Exception(self.client.sistemik)
+        if any(r['malzeme_kodu'] is None for r in self.kayitlar):
+            raise Exception(NOT_NULL)
+        self.client.yazilan.extend(self.kayitlar)
+
+
+class _Client:
+    """Bozuk satır (malzeme_kodu None) içeren batch'i reddeden sahte PostgREST istemcisi"""
+
+    def __init__(self, sistemik=None):
+        self.istek, self.yazilan, self.sistemik = 0, [], sistemik
+
+    def table(self, name):
+        return _Sorgu(self, name)
+
+
+def _kayitlar(n, bozuk=()):
+    return [{'id': i, 'malzeme_kodu': None if i in bozuk else str(1000 + i)} for i in range(n)]
+
+
+def test_tek_bozuk_satir():
+    client = _Client()
+    yazilan, reddedilen, hatalar = bisect_write(client, 't', _kayitlar(1024, {700}), backoff=0)
+
+    assert [r['id'] for r in reddedilen] == [700]
+    assert hatalar == [NOT_NULL]
+    assert yazilan == 1023 and len(client.yazilan) == 1023
+    assert client.istek == 1 + 2 * 10
+
+
+def test_farkli_yarilarda_ayni_mesajli_iki_bozuk_satir():
+    client = _Client()
+    yazilan, reddedilen, hatalar = bisect_write(client, 't', _kayitlar(1000, {0, 600}), backoff=0)
+
+    assert sorted(r['id'] for r in reddedilen) == [0, 600]
+    assert hatalar == [NOT_NULL, NOT_NULL]
+    assert yazilan == 998 and len(client.yazilan) == 998
+    assert client.istek <= 1 + 2 * 2 * math.ceil(math.log2(1000))
+
+
+def test_sistemik_hata_bolunmez():
+    # Upsert güvenle tekrar denenir: 1 deneme + 1 tekrar, ardından bölmeden topluca ret
+    client = _Client(sistemik=YETKI)
+    yazilan, reddedilen, hatalar = bisect_write(client, 't', _kayitlar(1000), on_conflict='id', backoff=0)
+
+    assert yazilan == 0 and len(reddedilen) == 1000
+    assert set(hatalar) == {YETKI}
+    assert client.istek == 2
+
+
+def test_save_detay_iki_deger_doner():
+    client = _Client()
+    assert save_detay_to_supabase(client, []) == (0, 0)
+
+    reddedilen = []
+    assert save_detay_to_supabase(client, _kayitlar(64, {5}), reddedilen=reddedilen) == (63, 1)
+    assert [(r['id'], h) for r, h in reddedilen] == [(5, NOT_NULL)]
+
+    # Liste verilmezse eski 2'li dönüş aynen korunur
+    inserted, skipped = save_detay_to_supabase(_Client(), _kayitlar(8))
+    assert (inserted, skipped) == (8, 0)
@@ -0,0 +1,163 @@
+# ==================== ESKİ SÜRÜM EŞDEĞERLİĞİ ====================
+# Vektörel dedektörler / puanlama, vektörleştirme öncesi iterrows sürümüyle (eski_surum.py) aynı satırları döndürmeli
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import envanter_engine as E
+import eski_surum as eski
+
+DEDEKTORLER = ['detect_internal_theft', 'detect_chronic_products', 'detect_chronic_fire',
+               'detect_fire_manipulation', 'detect_external_theft', 'detect_cigarette_shortage']
+
+GRUPLAR = ['DETERJAN', 'SİGARA', 'TÜTÜN MAMÜLLERİ', 'ŞAMPUAN', 'İÇECEK', 'çikolata', None]
+KELIMELER = ['ULTRA', 'KOLA', 'GOFRET']
+MARKALAR = ['DOMESTOS', 'ÜLKER', 'MARLBORO']
+GRAMAJ = ['750ML', '750 ML', '1.5L', '1,5 LT', '220G', '220 GR', '1KG', '330ML', '', '100 G', '90G', '0G']
+
+
+def _yukleme(n_magaza=2, n_sku=150, seed=0):
+    """Küçük çok mağazalı yükleme: aile adayları, kasa kodları, dengelenmiş satırlar ve tekrar eden satırlar"""
+    rng = np.random.default_rng(seed)
+    kodlar = rng.choice(np.arange(10000000, 30000000), size=n_sku, replace=False).astype(object)
+    kodlar[:20] = [int(k) for k in sorted(E.KASA_AKTIVITESI_KODLARI)[:20]]
+    adlar = [f"{' '.join(rng.choice(KELIMELER, size=2))} {rng.choice(GRAMAJ)} {rng.choice(MARKALAR)}".replace('  ', ' ')
+             for _ in range(n_sku)]
+    adlar[3] = None
+    gruplar = rng.choice(len(GRUPLAR), size=n_sku)
+
+    satirlar = []
+    for m in range(n_magaza):
+        for i in range(n_sku):
+            fiyat = float(rng.choice([5, 10, 99.99, 100, 400]))
+            fark, kismi, onceki = int(rng.integers(-8, 6)), int(rng.integers(-2, 3)), int(rng.integers(-5, 5))
+            if rng.random() < 0.2:
+                onceki = -(fark + kismi)
+            fire, onceki_fire = int(rng.choice([0, 0, -1, -3, 2])), int(rng.choice([0, -1, -2]))
+            iptal = int(rng.choice([0, 1, 2, 5, 11, abs(fark + kismi + onceki)]))
+            satirlar.append({
+                'Mağaza Kodu': f"{7900 + m}", 'Mağaza Tanım': f"MAĞAZA {m}",
+                'Depolama Koşulu Grubu': 'Kuru', 'Envanter Dönemi': 202512,
+                'Envanter Tarihi': pd.Timestamp('2025-12-20'),
+                'Mal Grubu Tanımı': GRUPLAR[gruplar[i]], 'Ürün Grubu Tanımı': 'GIDA',
+                'Malzeme Kodu': kodlar[i], 'Malzeme Tanımı': adlar[i], 'Satış Fiyatı': fiyat,
+                'Fark Miktarı': fark, 'Fark Tutarı': fark * fiyat,
+                'Kısmi Envanter Miktarı': kismi, 'Kısmi Envanter Tutarı': kismi * fiyat,
+                'Önceki Fark Miktarı': onceki, 'Önceki Fark Tutarı': onceki * fiyat,
+                'Önceki Fire Miktarı': onceki_fire, 'Önceki Fire Tutarı': onceki_fire * fiyat,
+                'İptal Satır Miktarı': iptal, 'İptal Satır Tutarı': iptal * fiyat,
+                'Fire Miktarı': fire, 'Fire Tutarı': fire * fiyat,
+            })
+    df = pd.DataFrame(satirlar)
+    return pd.concat([df, df.iloc[:5]], ignore_index=True)
+
+
+def _magazalar(df):
+    return [df[df['Mağaza Kodu'] == m] for m in df['Mağaza Kodu'].unique()] + [df.iloc[:0]]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('ad', DEDEKTORLER)
+def test_dedektorler(ad, seed):
+    df = eski.analyze_inventory(_yukleme(seed=seed))
+    for magaza in _magazalar(df):
+        pd.testing.assert_frame_equal(getattr(E, ad)(magaza), getattr(eski, ad)(magaza))
+
+
+def test_analyze_inventory_sonrasi_ayni_satirlar():
+    # Feature frame'li (analyze_inventory) veri ile de aynı sonuç
+    raw = _yukleme(n_magaza=1, seed=7)
+    yeni, eski_df = E.analyze_inventory(raw), eski.analyze_inventory(raw)
+    for ad in DEDEKTORLER:
+        pd.testing.assert_frame_equal(getattr(E, ad)(yeni), getattr(eski, ad)(eski_df))
+
+
+def test_kronik_fire_nan_onceki_fire():
+    # Eski `or 0`: NaN önceki fire sıfır değil sayılır, tabloda NaN olarak görünür
+    df = eski.analyze_inventory(_yukleme(n_magaza=1, seed=3))
+    df.loc[df.index[::4], 'Önceki Fire Miktarı'] = np.nan
+    df.loc[df.index[1::9], 'Fire Miktarı'] = np.nan
+    yeni, beklenen = E.detect_chronic_fire(df), eski.detect_chronic_fire(df)
+    assert beklenen['Önceki Fire'].isna().any()
+    pd.testing.assert_frame_equal(yeni, beklenen)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_urun_aileleri_ve_isim_ayristirma(seed):
+    df = eski.analyze_inventory(_yukleme(seed=seed))
+    for magaza in _magazalar(df):
+        pd.testing.assert_frame_equal(E.find_product_families(magaza), eski.find_product_families(magaza))
+
+    parsed = E.parse_product_names(df['Malzeme Adı'])
+    assert parsed['İlk2Kelime'].tolist() == df['Malzeme Adı'].apply(eski.get_first_two_words).tolist()
+    assert parsed['Marka'].tolist() == df['Malzeme Adı'].apply(eski.get_last_word).tolist()
+    qty = [eski.extract_quantity(ad) for ad in df['Malzeme Adı']]
+    np.testing.assert_array_equal(parsed['Gramaj'].to_numpy(dtype=float),
+                                  np.array([np.nan if q is None else q for q, _ in qty], dtype=float))
+    assert [u if isinstance(u, str) else None for u in parsed['GramajBirim']] == [u for _, u in qty]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_kasa_aktivitesi(seed):
+    df = eski.analyze_inventory(_yukleme(seed=seed))
+    for magaza in _magazalar(df):
+        tablo, ozet = E.check_kasa_activity_products(magaza, E.KASA_AKTIVITESI_KODLARI)
+        eski_tablo, eski_ozet = eski.check_kasa_activity_products(magaza, E.KASA_AKTIVITESI_KODLARI)
+        pd.testing.assert_frame_equal(tablo, eski_tablo)
+        assert ozet.keys() == eski_ozet.keys()
+        for k in ozet:
+            assert ozet[k] == pytest.approx(eski_ozet[k])
+
+
+def _magaza_ozeti(n=60, seed=0):
+    """Bölge özeti satırları (build_region_features / VIEW kolonları)"""
+    rng = np.random.default_rng(seed)
+    satis = rng.choice([0.0, 5e4, 2e5, 1e6], n)
+    fark = -rng.exponential(3000, n)
+    fire = -rng.exponential(2000, n)
+    return pd.DataFrame({
+        'Mağaza Kodu': [str(7900 + i) for i in range(n)],
+        'SM': rng.choice(['SM A', 'SM B', 'SM C'], n),
+        'BS': rng.choice(['BS 1', 'BS 2', 'BS 3', 'BS 4'], n),
+        'Satış': satis, 'Fark': fark, 'Fire': fire, 'Toplam Açık': fark + fire,
+        'Toplam %': rng.exponential(1.5, n),
+        'İç Hırs.': rng.integers(0, 80, n), 'Kr.Açık': rng.integers(0, 150, n),
+        'Sigara': rng.choice([0.0, 0.0, 2.0, 7.0], n), 'Fire Man.': rng.integers(0, 15, n),
+        '10TL Adet': rng.integers(-30, 30, n).astype(float), '10TL Tutar': rng.normal(0, 300, n),
+        'Gün': rng.integers(1, 40, n),
+    })
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_magaza_risk_puani(seed):
+    ozet = _magaza_ozeti(seed=seed)
+    for config in [{}, {'risk_weights': {'toplam_oran': {'high': {'threshold': 1, 'points': 33}},
+                                         'sigara': {'low': {'threshold': 3, 'points': 7}}},
+                        'risk_levels': {'kritik': 30, 'riskli': 20, 'dikkat': 5}, 'max_risk_score': 50}]:
+        pd.testing.assert_frame_equal(E.score_stores(ozet, config), eski.store_risk_scores(ozet, config),
+                                      check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_bolge_ortalamasina_gore_puan(seed):
+    ozet = _magaza_ozeti(seed=seed).rename(columns={'Kr.Açık': 'Kronik', '10TL Adet': 'Kasa Adet'})
+    ozet = ozet.astype({'İç Hırs.': float, 'Kronik': float})
+    ozet.loc[ozet.index[::7], ['Sigara', 'Kronik']] = np.nan
+    beklenen = eski.view_risk_scores(ozet.copy())
+    puan = E.score_relative_to_region(ozet, E.region_averages(ozet))
+    np.testing.assert_allclose(puan.to_numpy(), beklenen['Risk Puan'].astype(float).to_numpy(), rtol=1e-12)
+    assert (E.risk_level_labels(puan) == beklenen['Risk'].to_numpy()).all()
+
+
+@pytest.mark.parametrize('grup', ['SM', 'BS'])
+def test_sm_bs_toplamlari(grup):
+    ozet = _magaza_ozeti()
+    ozet = pd.concat([ozet, E.score_stores(ozet, {})], axis=1)
+    beklenen = eski.aggregate_by_group(ozet.copy(), grup)
+    pd.testing.assert_frame_equal(E.aggregate_by_group(ozet, grup)[beklenen.columns], beklenen, check_dtype=False)
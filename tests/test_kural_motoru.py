@@ -0,0 +1,63 @@
+# ==================== KURAL MOTORU ====================
+# Bölge özeti risk sayıları kural motorundan gelir: eşik config'den okunur, sonuç eski sayımla aynı
+
+import copy
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from envanter_engine import (
+    BOLGE_SAYIM_KURALLARI, RULE_CONFIG, analyze_inventory, compile_rules, region_rule_counts,
+    rule_counts_by_store,
+)
+
+
+def _bolge(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return analyze_inventory(pd.DataFrame({
+        'Mağaza Kodu': rng.choice(['5001', '5002', '5003'], n),
+        'Malzeme Kodu': [str(10000 + i) for i in range(n)],
+        'Malzeme Tanımı': 'URUN',
+        'Satış Fiyatı': rng.choice([20.0, 99.0, 100.0, 250.0], n),
+        'Fark Miktarı': rng.integers(-3, 3, n).astype(float),
+        'Fark Tutarı': rng.integers(-300, 300, n).astype(float),
+        'Kısmi Envanter Miktarı': rng.integers(-1, 2, n).astype(float),
+        'Kısmi Envanter Tutarı': 0.0,
+        'Önceki Fark Miktarı': rng.integers(-3, 3, n).astype(float),
+        'Önceki Fark Tutarı': 0.0,
+        'Fire Miktarı': rng.integers(-2, 1, n).astype(float),
+        'Fire Tutarı': 0.0,
+        'Önceki Fire Miktarı': rng.integers(-2, 1, n).astype(float),
+        'İptal Satır Miktarı': rng.integers(0, 3, n).astype(float),
+    }))
+
+
+def test_bolge_sayimlari_eski_ifadelerle_ayni():
+    df = _bolge()
+    sayim = region_rule_counts(df)
+    g = df.groupby('Mağaza Kodu')
+    beklenen = {
+        'İç Hırs.': df[(df['Satış Fiyatı'] >= 100) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size(),
+        'Kr.Açık': df[(df['Önceki Fark Miktarı'] < 0) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size(),
+        'Kr.Fire': df[(df['Önceki Fire Miktarı'] < 0) & (df['Fire Miktarı'] < 0)].groupby('Mağaza Kodu').size(),
+        'Fire Man.': df[df['Fire Miktarı'].abs() > (df['Fark Miktarı'] + df['Kısmi Envanter Miktarı']).abs()]
+                     .groupby('Mağaza Kodu').size(),
+    }
+    for kolon, seri in beklenen.items():
+        assert sayim[kolon].to_dict() == seri.reindex(list(g.groups)).fillna(0).astype(int).to_dict()
+
+
+def test_fiyat_esigi_configden():
+    df = _bolge()
+    config = copy.deepcopy(RULE_CONFIG)
+    config['ic_hirsizlik']['min_satis_fiyati'] = 250
+    rules = compile_rules(config)
+    ad = BOLGE_SAYIM_KURALLARI['İç Hırs.']
+    sayim = rule_counts_by_store(df, {ad: rules[ad]})[ad]
+    beklenen = df[(df['Satış Fiyatı'] >= 250) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size()
+    assert sayim.to_dict() == beklenen.to_dict()
+    assert sayim.sum() < region_rule_counts(df)['İç Hırs.'].sum()
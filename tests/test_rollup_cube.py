@@ -0,0 +1,38 @@
+# ==================== DÖNEM KÜPÜ ====================
+# cube_totals: boş küp / veri olmayan dönem seçimi KeyError yerine sıfır toplamlar döndürmeli
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from envanter_engine import build_rollup_cube, cube_totals
+
+
+def _magazalar():
+    return pd.DataFrame({
+        'Mağaza Kodu': ['5001', '5002'],
+        'BS': ['BS1', 'BS1'],
+        'SM': ['SM1', 'SM1'],
+        'Envanter Dönemi': ['202401', '202401'],
+        'Satış': [1000.0, 3000.0],
+        'Fark': [-10.0, -30.0],
+        'Fire': [-5.0, -15.0],
+        'Toplam Açık': [-15.0, -45.0],
+        'İç Hırs.': [1, 0],
+        'Kronik': [2, 1],
+        'Sigara': [0, 0],
+        'Gün': [10, 20],
+        'Risk Puan': [80.0, 10.0],
+        'Risk': ['🔴 KRİTİK', '✅ TEMİZ'],
+    })
+
+
+def test_bos_kupte_sifir_toplamlar():
+    dolu = cube_totals(build_rollup_cube(_magazalar()))
+    for cube, donemler in [(pd.DataFrame(), None), (build_rollup_cube(_magazalar()), ['209912'])]:
+        toplamlar = cube_totals(cube, donemler)
+        assert set(toplamlar) == set(dolu)
+        assert all(v == 0 for v in toplamlar.values())
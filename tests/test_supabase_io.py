@@ -0,0 +1,119 @@
+# ==================== SUPABASE OKUMA YARDIMCILARI ====================
+# Yerel SQLite istemcisiyle (supabase_yerel) mevcut envanter kontrolü, sahte yanıtlarla CSV sayfaları
+
+import csv
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_io import (
+    EXISTS_RPC, existing_inventory_keys, existing_inventory_keys_per_key, fetch_keyset_csv, fetch_keyset_frame,
+)
+from supabase_yerel import APIError, YerelSupabase
+
+ANAHTARLAR = [('7901', '202512', 'Kuru'), ('7901', '202512', 'Soğuk'), ('7902', '202601', 'Kuru')]
+
+
+def _db():
+    db = YerelSupabase()
+    db.table('envanter_veri').insert([
+        {'magaza_kodu': m, 'envanter_donemi': d, 'depolama_kosulu_grubu': g, 'malzeme_kodu': '1'}
+        for m, d, g in ANAHTARLAR[:2]
+    ]).execute()
+    return db
+
+
+def test_mevcut_anahtarlar_rpc_ile():
+    assert existing_inventory_keys(_db(), ANAHTARLAR) == set(ANAHTARLAR[:2])
+
+
+def test_rpc_yoksa_hata_cagirana_gider():
+    # Sessiz düşüş yok: çağıran uyarı gösterip anahtar başına kontrole geçer
+    db = _db()
+    del db.rpcler[EXISTS_RPC]
+    with pytest.raises(APIError):
+        existing_inventory_keys(db, ANAHTARLAR)
+    assert existing_inventory_keys_per_key(db, ANAHTARLAR) == set(ANAHTARLAR[:2])
+
+
+# ==================== CSV SAYFALARI ====================
+# PostgREST text/csv yanıtı: tırnaklı metin, boş alan = NULL, son sayfa boş gövde
+
+class _CsvSorgu:
+    def __init__(self, client):
+        self.client, self.son, self.n = client, None, None
+
+    def select(self, columns):
+        self.kolonlar = columns.split(',')
+        return self
+
+    def gt(self, col, value):
+        self.son = value
+        return self
+
+    def order(self, col):
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    def csv(self):
+        return self
+
+    def execute(self):
+        satirlar = [r for r in self.client.satirlar if self.son is None or r['id'] > self.son][:self.n]
+        self.client.istek += 1
+        if not satirlar:
+            return type('Yanit', (), {'data': self.client.bos_yanit})()
+        buf = io.StringIO()
+        yazici = csv.writer(buf, lineterminator='\n')
+        yazici.writerow(self.kolonlar)
+        for r in satirlar:
+            yazici.writerow(['' if r[k] is None else r[k] for k in self.kolonlar])
+        return type('Yanit', (), {'data': buf.getvalue()})()
+
+
+class _CsvClient:
+    def __init__(self, satirlar, bos_yanit=''):
+        self.satirlar, self.bos_yanit, self.istek = satirlar, bos_yanit, 0
+
+    def table(self, name):
+        return _CsvSorgu(self)
+
+
+CSV_SATIRLAR = [
+    {'id': 1, 'malzeme_kodu': '0012', 'malzeme_tanimi': 'ÜLKER, ÇİKOLATA "SÜTLÜ" 80G', 'fark_tutari': '12.50'},
+    {'id': 2, 'malzeme_kodu': '0340', 'malzeme_tanimi': 'NA', 'fark_tutari': '-0.333'},
+    {'id': 5, 'malzeme_kodu': '7', 'malzeme_tanimi': 'İKİ\nSATIR', 'fark_tutari': None},
+    {'id': 9, 'malzeme_kodu': '8', 'malzeme_tanimi': None, 'fark_tutari': '1e3'},
+]
+
+
+@pytest.mark.parametrize('bos_yanit', ['', 'id,malzeme_kodu,malzeme_tanimi,fark_tutari\n', None])
+def test_csv_sayfalari_tipli_parse(bos_yanit):
+    client = _CsvClient(CSV_SATIRLAR, bos_yanit)
+    df = fetch_keyset_csv(client, 'envanter_veri', 'malzeme_kodu,malzeme_tanimi,fark_tutari', page_size=2,
+                          column_mapping={'malzeme_kodu': 'Malzeme Kodu'})
+
+    assert client.istek == 3  # 2 dolu sayfa + boş son sayfa
+    assert list(df.columns) == ['Malzeme Kodu', 'malzeme_tanimi', 'fark_tutari']
+    assert df['Malzeme Kodu'].tolist() == ['0012', '0340', '7', '8']
+    assert df['malzeme_tanimi'].tolist()[:3] == ['ÜLKER, ÇİKOLATA "SÜTLÜ" 80G', 'NA', 'İKİ\nSATIR']
+    assert pd.isna(df['malzeme_tanimi'].iloc[3])
+    assert df['fark_tutari'].dtype == 'float64'
+    np.testing.assert_array_equal(df['fark_tutari'].to_numpy(), [12.5, -0.333, np.nan, 1000.0])
+
+
+def test_csv_yoksa_json_sayfalari():
+    # supabase_yerel istemcisinde .csv() yok: JSON sayfalarıyla aynı sonuç
+    db = _db()
+    kolonlar = 'magaza_kodu,depolama_kosulu_grubu'
+    pd.testing.assert_frame_equal(fetch_keyset_csv(db, 'envanter_veri', kolonlar, page_size=1),
+                                  fetch_keyset_frame(db, 'envanter_veri', kolonlar, page_size=1))
@@ -0,0 +1,105 @@
+# ==================== ÜRÜN ADI / MASTER REGRESYON ====================
+# Adı boş satırlar master'da olsa bile aileye girmemeli (parse_product_names ile aynı boş değerler)
+# SIGARA satırın güncel kategorisinden gelmeli, master yazım hataları çağırana dönmeli
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import supabase_io
+from envanter_engine import ISIM_COLS, build_feature_frame, find_product_families, parse_product_names
+from urun_master import build_master_rows, upsert_product_master
+
+
+def _magaza(adlar):
+    n = len(adlar)
+    return pd.DataFrame({
+        'Malzeme Kodu': [f"{1000 + i}" for i in range(n)],
+        'Malzeme Adı': adlar,
+        'Ürün Grubu': 'ÇİKOLATA',
+        'Mal Grubu Tanımı': 'ÇİKOLATA',
+        'Fark Miktarı': [-3.0, 2.0] * (n // 2),
+        'Fark Tutarı': [-30.0, 20.0] * (n // 2),
+        'Kısmi Envanter Miktarı': 0.0,
+        'Kısmi Envanter Tutarı': 0.0,
+        'Önceki Fark Miktarı': 0.0,
+        'Önceki Fark Tutarı': 0.0,
+    })
+
+
+def test_bos_ad_master_ile_aileye_girmez():
+    dolu = _magaza(['ULKER CIKOLATA SUTLU 80 G ULKER', 'ULKER CIKOLATA FINDIK 80 G ULKER'] * 2)
+    master = build_master_rows(dolu)
+
+    # Aynı kodlar, bu yüklemede adlar boş
+    bos = dolu.copy()
+    bos['Malzeme Adı'] = np.nan
+    df = build_feature_frame(bos, master=master)
+
+    beklenen = parse_product_names(bos['Malzeme Adı'])
+    pd.testing.assert_frame_equal(df[ISIM_COLS], beklenen[ISIM_COLS], check_dtype=False)
+    assert len(find_product_families(df)) == 0
+
+
+def test_dolu_ad_master_ile_ayni_aile():
+    dolu = _magaza(['ULKER CIKOLATA SUTLU 80 G ULKER', 'ULKER CIKOLATA FINDIK 80 G ULKER'] * 2)
+    master = build_master_rows(dolu)
+    ile = find_product_families(build_feature_frame(dolu, master=master))
+    olmadan = find_product_families(build_feature_frame(dolu))
+    pd.testing.assert_frame_equal(ile, olmadan)
+
+
+def test_sigara_satirin_kategorisinden():
+    df = _magaza(['MARLBORO RED 20 LI', 'PARLIAMENT NIGHT BLUE 20 LI'] * 2)
+    df['Mal Grubu Tanımı'] = df['Ürün Grubu'] = 'SİGARA'
+    master = build_master_rows(df)
+    assert master['SIGARA'].all()
+
+    # Kategorisi değişen ürün master'daki eski bayrağı taşımaz
+    degisen = df.copy()
+    degisen.loc[:1, ['Mal Grubu Tanımı', 'Ürün Grubu']] = 'ÇİKOLATA'
+    assert build_feature_frame(degisen, master=master)['SIGARA'].tolist() == [False, False, True, True]
+
+    # Kategori boşsa master'daki bayrak kullanılır
+    bos = df.copy()
+    bos[['Mal Grubu Tanımı', 'Ürün Grubu']] = np.nan
+    assert build_feature_frame(bos, master=master)['SIGARA'].all()
+
+
+class _Sorgu:
+    def __init__(self, client):
+        self.client, self.kayitlar = client, []
+
+    def upsert(self, json, **kwargs):
+        self.kayitlar = json
+        return self
+
+    def execute(self):
+        if any(r['malzeme_kodu'] == self.client.bozuk for r in self.kayitlar):
+            raise Exception('value too long for type character varying(20) (22001)')
+        self.client.yazilan.extend(self.kayitlar)
+
+
+class _Client:
+    def __init__(self, bozuk):
+        self.bozuk, self.yazilan = bozuk, []
+
+    def table(self, name):
+        return _Sorgu(self)
+
+
+def test_master_yazim_hatasi_cagirana_doner(tmp_path, monkeypatch):
+    monkeypatch.setattr(supabase_io.time, 'sleep', lambda s: None)
+    df = _magaza(['ULKER CIKOLATA SUTLU 80 G ULKER', 'ULKER CIKOLATA FINDIK 80 G ULKER'] * 2)
+    client, sonuc = _Client(bozuk='1001'), {}
+    master = upsert_product_master(df, master=build_master_rows(df.iloc[:0]), path=str(tmp_path / 'm.parquet'),
+                                   supabase_client=client, sonuc=sonuc)
+
+    assert len(master) == 4
+    assert sonuc['yazilan'] + len(sonuc['hatali_kayitlar']) == 4
+    assert '1001' in [r['malzeme_kodu'] for r in sonuc['hatali_kayitlar']]
+    assert sonuc['hatalar'] and '22001' in sonuc['hatalar'][0]
@@ -0,0 +1,182 @@
+# ==================== ÜRÜN MASTER ====================
+# Malzeme Kodu bazlı sabit ürün bilgileri (mağazadan mağazaya değişmez)
+# Sigara/tütün bayrağı, 10 TL kasa aktivitesi, parse edilmiş gramaj/marka, kategori
+# Yerel: <veri dizini>/urun_master.parquet | Opsiyonel: Supabase urun_master tablosu
+
+import os
+
+import pandas as pd
+import numpy as np
+
+from envanter_engine import (
+    KASA_AKTIVITESI_KODLARI, ISIM_COLS, normalize_code, sigara_mask, parse_product_names,
+)
+from supabase_io import fetch_keyset, write_batches
+
+# ==================== SABİTLER ====================
+
+# Kaynak dizinine yazılmaz - ENVANTER_DATA_DIR ile değiştirilebilir (URUN_MASTER_PATH tam yolu ezer)
+DATA_DIR = os.environ.get(
+    'ENVANTER_DATA_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'envanter-risk-analizi')
+)
+MASTER_PATH = os.environ.get('URUN_MASTER_PATH', os.path.join(DATA_DIR, 'urun_master.parquet'))
+MASTER_TABLE = 'urun_master'
+
+# Index: KOD (normalize Malzeme Kodu)
+MASTER_COLS = ['Malzeme Adı', 'Ürün Grubu', 'Ana Grup', 'SIGARA', 'KASA_AKTIVITESI'] + ISIM_COLS
+
+# Supabase kolon eşleştirmesi
+MASTER_COLUMN_MAPPING = {
+    'KOD': 'malzeme_kodu',
+    'Malzeme Adı': 'malzeme_tanimi',
+    'Ürün Grubu': 'mal_grubu_tanimi',
+    'Ana Grup': 'urun_grubu_tanimi',
+    'SIGARA': 'sigara',
+    'KASA_AKTIVITESI': 'kasa_aktivitesi',
+    'İlk2Kelime': 'ilk2_kelime',
+    'Marka': 'marka',
+    'Gramaj': 'gramaj',
+    'GramajBirim': 'gramaj_birim',
+}
+
+
+def empty_master():
+    """Boş master tablosu"""
+    master = pd.DataFrame({col: pd.Series(dtype=object) for col in MASTER_COLS})
+    master.index.name = 'KOD'
+    return master
+
+
+# ==================== OKUMA / YAZMA ====================
+
+def load_product_master(path=None, supabase_client=None):
+    """
+    Master tabloyu yükle: önce yerel Parquet, yoksa Supabase
+    Parquet motoru (pyarrow) kurulu değilse veya dosya yoksa boş master döner
+    """
+    path = path or MASTER_PATH
+    try:
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+    except Exception as e:
+        print(f"Ürün master okunamadı: {e}")
+
+    if supabase_client is not None:
+        try:
+            return _load_master_from_supabase(supabase_client)
+        except Exception as e:
+            print(f"Supabase ürün master hata: {e}")
+
+    return empty_master()
+
+
+def save_product_master(master, path=None):
+    """Master tabloyu yerel Parquet olarak kaydet"""
+    path = path or MASTER_PATH
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        master.to_parquet(path)
+        return True
+    except Exception as e:
+        # pyarrow yoksa master sadece bellekte kalır
+        print(f"Ürün master kaydedilemedi: {e}")
+        return False
+
+
+def _load_master_from_supabase(supabase_client, page_size=None):
+    """Supabase urun_master tablosunu keyset sayfalarıyla oku (anahtar: malzeme_kodu)"""
+    reverse_mapping = {v: k for k, v in MASTER_COLUMN_MAPPING.items()}
+    all_data = fetch_keyset(supabase_client, MASTER_TABLE, ','.join(MASTER_COLUMN_MAPPING.values()),
+                            page_size=page_size, key='malzeme_kodu')
+
+    if not all_data:
+        return empty_master()
+
+    master = pd.DataFrame(all_data).rename(columns=reverse_mapping)
+    master = master.set_index('KOD')
+    return master.reindex(columns=MASTER_COLS)
+
+
+def _save_master_to_supabase(supabase_client, rows):
+    """
+    Yeni/değişen master satırlarını Supabase'e upsert et (write_batches: byte bazlı batch, paralel, retry)
+    Dönüş: write_batches sonucu - yazılamayan kayıtlar 'hatali_kayitlar' / 'hatalar' içinde
+    """
+    df = rows.reset_index()[list(MASTER_COLUMN_MAPPING)].rename(columns=MASTER_COLUMN_MAPPING)
+    df = df.astype(object).where(df.notna(), None)
+    return write_batches(supabase_client, MASTER_TABLE, df.to_dict('records'), on_conflict='malzeme_kodu')
+
+
+# ==================== MASTER GÜNCELLEME ====================
+
+def build_master_rows(df):
+    """
+    Yüklenen veriden master satırları üret (her Malzeme Kodu için 1 satır, son görülen)
+    Ham Excel (Mal Grubu Tanımı / Ürün Grubu Tanımı) veya analiz edilmiş veri kabul edilir
+    String işlemleri sadece tekil kodlar üzerinde yapılır
+    """
+    sub = df.drop_duplicates(subset=['Malzeme Kodu'], keep='last')
+    kod = normalize_code(sub['Malzeme Kodu'])
+    son = ~kod.duplicated(keep='last').to_numpy()
+    sub, kod = sub[son], kod[son]
+
+    def ilk_kolon(*cols):
+        for col in cols:
+            if col in sub.columns:
+                return sub[col].to_numpy()
+        return None
+
+    rows = pd.DataFrame({
+        'Malzeme Adı': ilk_kolon('Malzeme Adı', 'Malzeme Tanımı'),
+        'Ürün Grubu': ilk_kolon('Mal Grubu Tanımı', 'Ürün Grubu'),
+        'Ana Grup': ilk_kolon('Ürün Grubu Tanımı', 'Ana Grup'),
+    }, index=pd.Index(kod.to_numpy(), name='KOD'))
+
+    rows['SIGARA'] = sigara_mask(rows).to_numpy()
+    rows['KASA_AKTIVITESI'] = rows.index.isin(KASA_AKTIVITESI_KODLARI)
+
+    isim = parse_product_names(rows['Malzeme Adı'])
+    for col in ISIM_COLS:
+        rows[col] = isim[col]
+
+    return rows[MASTER_COLS]
+
+
+def upsert_product_master(df, master=None, path=None, supabase_client=None, sonuc=None):
+    """
+    Yüklenen veriyi master tabloya işle (yeni kodlar eklenir, mevcutlar güncellenir)
+    analyze_inventory'den ÖNCE çağrılır - böylece kategori değişen ürünlerin bayrakları güncel olur
+    Sadece değişen satırlar Supabase'e gönderilir
+    sonuc: verilirse Supabase yazım sonucu (write_batches dict'i) bu dict'e eklenir
+    Dönüş: güncel master
+    """
+    if master is None:
+        master = load_product_master(path)
+
+    rows = build_master_rows(df)
+    if len(rows) == 0:
+        return master
+
+    # Değişmeyen kodları atla - sadece yeni veya farklı olanlar yazılır
+    mevcut = master.reindex(rows.index)
+    degisen = ~rows.index.isin(master.index)
+    for col in ['Malzeme Adı', 'Ürün Grubu', 'Ana Grup', 'SIGARA']:
+        degisen |= (rows[col].astype(str).to_numpy() != mevcut[col].astype(str).to_numpy())
+    yeni = rows[degisen]
+
+    if len(yeni) == 0:
+        return master
+
+    if len(master) == 0:
+        master = yeni.copy()
+    else:
+        master = pd.concat([master[~master.index.isin(yeni.index)], yeni])
+    master.index.name = 'KOD'
+    save_product_master(master, path)
+
+    if supabase_client is not None:
+        yazim = _save_master_to_supabase(supabase_client, yeni)
+        if sonuc is not None:
+            sonuc.update(yazim)
+
+    return master